@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark du rendu de la page historique : cache des fragments de cartes froid vs chaud
+La liste et les compteurs viennent du cache des réponses (réchauffé) : seul le rendu est mesuré
+
+Usage : python Test/bench_history_render.py [--recipes 200] [--repeat 20]
+La base de test est créée puis détruite
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# Setup Django AVANT d'importer quoi que ce soit de Django
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cocktailaiser.settings')
+
+import django
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment
+
+from cocktails.models import CocktailRecipe, GenerationRequest
+
+FRAGMENTS_ALIAS = 'template_fragments'
+
+
+def populate(recipes: int):
+    user = User.objects.create(username='bench')
+    generation_request = GenerationRequest.objects.create(user=user, user_prompt='prompt')
+    CocktailRecipe.objects.bulk_create(
+        CocktailRecipe(
+            user=user, generation_request=generation_request,
+            name=f"Cocktail {i}", description='Un cocktail frais aux notes d\'agrumes ' * 3,
+            ingredients=[{'nom': name, 'quantite': '3 cl'} for name in ('Rhum', 'Citron vert', 'Menthe', 'Sucre')],
+            difficulty_level=('easy', 'medium', 'hard')[i % 3],
+            alcohol_content=('none', 'low', 'medium', 'high')[i % 4],
+        )
+        for i in range(recipes)
+    )
+    return user
+
+
+def measure(client, url, repeat: int, cold: bool):
+    timings = []
+    for _ in range(repeat):
+        if cold and FRAGMENTS_ALIAS in settings.CACHES:
+            caches[FRAGMENTS_ALIAS].clear()
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        user = populate(args.recipes)
+        client = Client()
+        client.force_login(user)
+        client.get('/history/')  # Cache des réponses et templates compilés
+
+        print(f"🖼️  Rendu de /history/ ({args.recipes} cocktails : 8 cartes en grille + première fenêtre du carousel)")
+        print(f"   {'page':<44}{'fragments froids':>18}{'fragments chauds':>18}")
+        for url in ('/history/?page_size=8', '/history/?page=3&page_size=8&sort=name_asc'):
+            client.get(url)
+            cold = measure(client, url, args.repeat, cold=True)
+            warm = measure(client, url, args.repeat, cold=False)
+            print(f"   {url:<44}{cold:>15.1f} ms{warm:>15.1f} ms")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark mémoire : traitement des réponses Stability AI en mémoire vs en flux
+Mesure avec tracemalloc le pic d'allocation par image pour SDXL (JSON base64) et SD3 (binaire)
+"""
+
+import base64
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+# Setup Django AVANT d'importer quoi que ce soit de Django
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cocktailaiser.settings')
+
+import django
+django.setup()
+
+from cocktails.services.image_store import ImageStore
+from cocktails.services.image_streaming import iter_base64_artifact
+
+CHUNK_SIZE = 64 * 1024
+IMAGE_SIZE = 1536 * 1024  # ~1,5 Mo, l'ordre de grandeur d'un PNG 1024x1024
+
+
+class FakeResponse:
+    """Réponse HTTP simulée exposant .content, .json() et .iter_content() comme requests"""
+
+    def __init__(self, body: bytes):
+        self._body = body
+
+    @property
+    def content(self) -> bytes:
+        # requests assemble le corps complet à partir des morceaux reçus
+        return b''.join(self.iter_content(CHUNK_SIZE))
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size: int):
+        view = memoryview(self._body)
+        for start in range(0, len(view), chunk_size):
+            yield bytes(view[start:start + chunk_size])
+
+
+def measure(label: str, func) -> int:
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"   {label:<28} pic: {peak / 1024:>8.0f} Kio")
+    return peak
+
+
+def fake_png() -> bytes:
+    # Contenu aléatoire à chaque appel : pas de déduplication entre les mesures
+    return b'\x89PNG\r\n\x1a\n' + os.urandom(IMAGE_SIZE)
+
+
+def sdxl_payload() -> bytes:
+    return json.dumps({'artifacts': [{
+        'base64': base64.b64encode(fake_png()).decode(), 'seed': 1, 'finishReason': 'SUCCESS',
+    }]}).encode()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as media_root:
+        store = ImageStore(media_root)
+
+        sdxl_bodies = [sdxl_payload(), sdxl_payload()]
+        sd3_bodies = [fake_png(), fake_png()]
+
+        def sdxl_buffered():
+            data = FakeResponse(sdxl_bodies[0]).json()
+            store.save(base64.b64decode(data['artifacts'][0]['base64']))
+
+        def sdxl_streamed():
+            store.save_stream(iter_base64_artifact(FakeResponse(sdxl_bodies[1]).iter_content(CHUNK_SIZE)))
+
+        def sd3_buffered():
+            store.save(FakeResponse(sd3_bodies[0]).content)
+
+        def sd3_streamed():
+            store.save_stream(FakeResponse(sd3_bodies[1]).iter_content(CHUNK_SIZE))
+
+        print("📊 Pic d'allocation par image (tracemalloc)")
+        print("=" * 50)
+        print(f"SDXL (JSON base64, {len(sdxl_bodies[0]) / 1024:.0f} Kio)")
+        before = measure('avant (json + b64decode)', sdxl_buffered)
+        after = measure('après (flux)', sdxl_streamed)
+        print(f"   ➜ réduction x{before / after:.0f}")
+
+        print(f"SD3 (binaire, {len(sd3_bodies[0]) / 1024:.0f} Kio)")
+        before = measure('avant (response.content)', sd3_buffered)
+        after = measure('après (flux)', sd3_streamed)
+        print(f"   ➜ réduction x{before / after:.0f}")
+
+
+if __name__ == "__main__":
+    main()
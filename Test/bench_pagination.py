@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la pagination de l'historique : OFFSET (?page=N) vs curseur (created_at, id)
+Mesure la latence de la page 1, 100 et 1000 d'un utilisateur possédant beaucoup de cocktails
+
+Usage : python Test/bench_pagination.py [--recipes 200000] [--page-size 10] [--repeat 5]
+La base de test est créée puis détruite (fichier temporaire pour SQLite)
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Setup Django AVANT d'importer quoi que ce soit de Django
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cocktailaiser.settings')
+
+import django
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import signals
+
+from cocktails.models import CocktailRecipe, GenerationRequest
+from cocktails.services import pagination
+
+BATCH_SIZE = 5000
+PAGES = [1, 100, 1000]
+
+
+def populate(recipes: int):
+    # Les statistiques, l'index de recherche et les images ne concernent pas ce benchmark
+    signals.post_save.receivers = []
+    signals.post_delete.receivers = []
+
+    user = User.objects.create(username='bench')
+    generation_request = GenerationRequest.objects.create(user=user, user_prompt='prompt')
+
+    started = time.perf_counter()
+    created = 0
+    while created < recipes:
+        CocktailRecipe.objects.bulk_create(
+            CocktailRecipe(
+                user=user,
+                generation_request=generation_request,
+                name=f"Cocktail {i:07d}",
+                description='Description',
+                ingredients=[],
+            )
+            for i in range(created, min(created + BATCH_SIZE, recipes))
+        )
+        created = min(created + BATCH_SIZE, recipes)
+        print(f"\r   {created:>9} recettes", end='', flush=True)
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    print(f"\r   {created} recettes créées en {time.perf_counter() - started:.0f}s")
+    return user
+
+
+def offset_page(queryset, page: int, page_size: int):
+    start = (page - 1) * page_size
+    return list(queryset.order_by('-created_at')[start:start + page_size])
+
+
+def cursors_to(queryset, page: int, page_size: int):
+    """Curseur menant à la page demandée (obtenu en amont, comme le ferait un client qui défile)"""
+    cursor = None
+    for _ in range(page - 1):
+        cursor = pagination.paginate(queryset, cursor=cursor, page_size=page_size).next_cursor
+    return cursor
+
+
+def measure(func, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=200_000)
+    parser.add_argument('--page-size', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'bench_pagination.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0)
+
+    try:
+        print(f"📄 Benchmark pagination ({connection.vendor}, {args.page_size} cocktails par page)")
+        user = populate(args.recipes)
+        queryset = CocktailRecipe.objects.filter(user=user)
+
+        print(f"\n   {'page':<8}{'OFFSET':>12}{'curseur':>12}{'COUNT(*)':>12}{'identiques':>12}")
+        for page in PAGES:
+            if (page - 1) * args.page_size >= args.recipes:
+                break
+            cursor = cursors_to(queryset, page, args.page_size)
+            before = measure(lambda: offset_page(queryset, page, args.page_size), args.repeat)
+            after = measure(
+                lambda: pagination.paginate(queryset, cursor=cursor, page_size=args.page_size), args.repeat
+            )
+            counting = measure(queryset.count, args.repeat)
+            same = (
+                [r.pk for r in offset_page(queryset, page, args.page_size)]
+                == [r.pk for r in pagination.paginate(queryset, cursor=cursor, page_size=args.page_size).items]
+            )
+            print(f"   {page:<8}{before:>9.2f} ms{after:>9.2f} ms{counting:>9.2f} ms{'oui' if same else 'non':>12}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
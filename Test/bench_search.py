@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la recherche de cocktails : icontains (ancienne implémentation) vs recherche plein texte
+(tsvector + GIN sur PostgreSQL, parcours par cocktails_search_rank() sur SQLite) sur une base de test
+de 1M recettes par défaut
+
+Usage : python Test/bench_search.py [--recipes 1000000] [--users 1000] [--repeat 5]
+La base de test est créée puis détruite (fichier temporaire pour SQLite)
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Setup Django AVANT d'importer quoi que ce soit de Django
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cocktailaiser.settings')
+
+import django
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Count, Q, Window, signals
+
+from cocktails.models import CocktailRecipe, GenerationRequest
+from cocktails.services import search
+
+BATCH_SIZE = 5000
+PAGE_SIZE = 10
+
+NAMES = ['Margarita', 'Mojito', 'Spritz', 'Negroni', 'Daiquiri', 'Paloma', 'Colada', 'Sour', 'Mule', 'Fizz',
+         'Tonic', 'Julep', 'Punch', 'Smash', 'Collins', 'Sangria', 'Bellini', 'Caipirinha', 'Cobbler', 'Flip']
+ADJECTIVES = ['épicé', 'glacé', 'fumé', 'tropical', 'pétillant', 'doré', 'amer', 'fruité', 'sauvage', 'velouté',
+              'ardent', 'boisé', 'floral', 'acidulé', 'soyeux', 'nocturne', 'solaire', 'mentholé', 'crémeux', 'sec']
+INGREDIENTS = ['Rhum blanc', 'Rhum ambré', 'Téquila', 'Mezcal', 'Gin', 'Vodka', 'Whisky', 'Cognac', 'Campari',
+               'Vermouth', 'Citron vert', 'Citron jaune', 'Menthe', 'Basilic', 'Gingembre', 'Piment', 'Ananas',
+               'Fraise', 'Framboise', 'Pamplemousse', 'Orange sanguine', 'Sirop d\'agave', 'Miel', 'Cannelle',
+               'Café', 'Crème de coco', 'Eau gazeuse', 'Tonic', 'Prosecco', 'Concombre']
+WORDS = ['frais', 'léger', 'intense', 'notes', 'agrumes', 'parfait', 'soirée', 'été', 'hiver', 'plage', 'terrasse',
+         'équilibre', 'douceur', 'amertume', 'fraîcheur', 'touche', 'finale', 'longue', 'bouche', 'arômes',
+         'classique', 'revisité', 'maison', 'festif', 'élégant', 'audacieux', 'subtil', 'généreux', 'vif', 'rond']
+
+QUERIES = ['margarita', 'epice', 'tequila piment', 'plage', 'ananas coco', 'gingembre', 'xylophone']
+
+
+def populate(recipes: int, users: int):
+    rng = random.Random(42)
+    # Les statistiques et les images ne concernent pas ce benchmark
+    signals.post_save.receivers = []
+    signals.post_delete.receivers = []
+
+    user_objects = User.objects.bulk_create(User(username=f"bench{i}") for i in range(users))
+    requests = GenerationRequest.objects.bulk_create(
+        (
+            GenerationRequest(user=user, user_prompt=' '.join(rng.choices(WORDS + ADJECTIVES, k=8)))
+            for user in user_objects
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+    started = time.perf_counter()
+    created = 0
+    while created < recipes:
+        batch = []
+        for i in range(created, min(created + BATCH_SIZE, recipes)):
+            generation_request = requests[i % users]
+            batch.append(CocktailRecipe(
+                user_id=generation_request.user_id,
+                generation_request=generation_request,
+                name=f"{rng.choice(NAMES)} {rng.choice(ADJECTIVES)}",
+                description=' '.join(rng.choices(WORDS + ADJECTIVES, k=25)),
+                ingredients=[{'nom': name, 'quantite': '3 cl'} for name in rng.sample(INGREDIENTS, 4)],
+            ))
+        CocktailRecipe.objects.bulk_create(batch)
+        created += len(batch)
+        print(f"\r   {created:>9} recettes", end='', flush=True)
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    print(f"\r   {created} recettes créées en {time.perf_counter() - started:.0f}s (index et triggers compris)")
+    return user_objects[0]
+
+
+def icontains_page(queryset, query):
+    queryset = queryset.filter(Q(name__icontains=query) | Q(description__icontains=query)).order_by('-created_at')
+    return queryset.count(), list(queryset[:PAGE_SIZE])
+
+
+def fulltext_page(queryset, query):
+    # Rangs SQLite recalculés à chaque mesure (à froid)
+    search._scan_ranks.__dict__.clear()
+    # Comme /api/history/ : total calculé par la requête de la page
+    queryset = search.search(queryset, query).annotate(search_total=Window(Count('pk')))
+    page = list(queryset[:PAGE_SIZE])
+    search.highlights(page, query)
+    return page[0].search_total if page else 0, page
+
+
+def measure(func, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--recipes', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if connection.vendor == 'sqlite':
+        # Base sur disque : 1M recettes ne tiennent pas confortablement en mémoire
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'bench_search.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0)
+
+    try:
+        print(f"🔎 Benchmark recherche ({connection.vendor}, moteur: {search.backend() or 'icontains'})")
+        user = populate(args.recipes, args.users)
+
+        scopes = [
+            ('utilisateur', CocktailRecipe.objects.filter(user=user)),
+            ('toute la base', CocktailRecipe.objects.all()),
+        ]
+        for label, queryset in scopes:
+            print(f"\n   Portée: {label}")
+            print(f"   {'recherche':<16}{'icontains':>12}{'plein texte':>14}{'résultats':>12}")
+            for query in QUERIES:
+                before, _ = measure(lambda: icontains_page(queryset, query), args.repeat)
+                after, (count, _) = measure(lambda: fulltext_page(queryset, query), args.repeat)
+                print(f"   {query:<16}{before:>9.1f} ms{after:>11.1f} ms{count:>12}")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Benchmark des cocktails similaires : matrice creuse SciPy de tout le corpus (tous les utilisateurs)
+construction, requêtes top-k et incréments selon la taille du corpus
+
+Usage : python Test/bench_similar.py [--recipes 100000 1000000] [--users 1000] [--repeat 50]
+La base de test est créée puis détruite (fichier temporaire pour SQLite)
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Setup Django AVANT d'importer quoi que ce soit de Django
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cocktailaiser.settings')
+
+import django
+django.setup()
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import signals
+
+from cocktails.models import CocktailIngredient, CocktailRecipe, GenerationRequest, Ingredient
+from cocktails.services import similarity
+from cocktails.services.similarity import similarity_index
+
+BATCH_SIZE = 5000
+
+# Quelques ingrédients très courants (sucre, glaçon...) et une longue traîne, comme dans les vrais historiques
+COMMON = ['Sucre', 'Glaçons', 'Citron vert', 'Eau gazeuse', 'Menthe']
+LONG_TAIL = [f"Ingrédient {i}" for i in range(2000)]
+
+
+def catalogue():
+    ids = {}
+    for name in COMMON + LONG_TAIL:
+        ids[name] = Ingredient.objects.create(name=name, canonical_name=name.lower()).pk
+    return ids
+
+
+def draw(rng):
+    return rng.sample(COMMON, 2) + rng.sample(LONG_TAIL, rng.randint(1, 5))
+
+
+def populate(users, total: int, ingredient_ids, rng):
+    """Cocktails et lignes du catalogue insérés directement (l'analyse des quantités ne compte pas ici)"""
+    requests = {user.pk: GenerationRequest.objects.create(user=user, user_prompt='prompt') for user in users}
+    created, recipe_ids = 0, []
+    while created < total:
+        with transaction.atomic():
+            recipes, lines = [], []
+            for i in range(created, min(created + BATCH_SIZE, total)):
+                user = rng.choice(users)
+                names = draw(rng)
+                recipe = CocktailRecipe(
+                    user=user, generation_request=requests[user.pk], name=f"Cocktail {i}",
+                    description='Description', ingredients=[{'nom': name} for name in names],
+                    ingredients_count=len(names),
+                )
+                recipes.append(recipe)
+                lines.extend(
+                    CocktailIngredient(
+                        recipe=recipe, ingredient_id=ingredient_ids[name], user=user, position=position, name=name,
+                    )
+                    for position, name in enumerate(names)
+                )
+            CocktailRecipe.objects.bulk_create(recipes)
+            CocktailIngredient.objects.bulk_create(lines, batch_size=BATCH_SIZE)
+        created += len(recipes)
+        recipe_ids.extend(recipe.pk for recipe in recipes)
+    return recipe_ids
+
+
+def measure(users, repeat: int, rng):
+    targets = []
+    for user in rng.sample(users, min(repeat, len(users))):
+        recipe_id = CocktailRecipe.objects.filter(user=user).values_list('pk', flat=True).first()
+        if recipe_id:
+            targets.append((user, recipe_id))
+    timings = []
+    for i in range(repeat):
+        user, recipe_id = targets[i % len(targets)]
+        started = time.perf_counter()
+        similarity.similar(user, recipe_id)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def measure_increment(users, ingredient_ids, rng, changes: int = 100):
+    """Cocktails créés par d'autres workers puis un incrément (version du corpus avancée)"""
+    before = CocktailRecipe.objects.count()
+    recipe_ids = populate(users, changes, ingredient_ids, rng)
+    assert CocktailRecipe.objects.count() == before + changes
+    similarity_index.bump(recipe_ids)
+    started = time.perf_counter()
+    similarity_index.refresh()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--recipes', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    if connection.vendor == 'sqlite':
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'bench_similar.sqlite3')
+    old_name = connection.creation.create_test_db(verbosity=0)
+
+    try:
+        # Statistiques, recherche et images ne concernent pas ce benchmark
+        signals.post_save.receivers = []
+        signals.post_delete.receivers = []
+        rng = random.Random(42)
+        users = [User.objects.create(username=f"bench{i}") for i in range(args.users)]
+        ingredient_ids = catalogue()
+
+        print(f"🍸 Cocktails similaires, {args.users} utilisateurs ({connection.vendor})")
+        print(f"   {'corpus':>10}{'construction':>14}{'médiane':>12}{'p95':>12}{'incrément':>12}")
+        populated = 0
+        for total in sorted(args.recipes):
+            populate(users, total - populated, ingredient_ids, rng)
+            populated = total
+
+            similarity_index.reset()
+            started = time.perf_counter()
+            similarity_index.refresh()
+            build = time.perf_counter() - started
+            median, p95 = measure(users, args.repeat, rng)
+            increment = measure_increment(users, ingredient_ids, rng)
+            populated += 100
+            print(f"   {total:>10}{build:>12.1f} s{median:>9.1f} ms{p95:>9.1f} ms{increment:>9.1f} ms")
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
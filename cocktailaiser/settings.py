@@ -66,7 +66,6 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
@@ -74,6 +73,14 @@ TEMPLATES = [
                 'django.contrib.messages.context_processors.messages',
                 'django.template.context_processors.media',
             ],
+            # Templates compilés une fois par processus, quel que soit DEBUG
+            # (en développement, l'autoreload vide ce cache quand un template change)
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
         },
     },
 ]
@@ -136,6 +143,52 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Stockage des images de cocktails : système de fichiers local (défaut) ou S3 compatible (AWS, MinIO)
+# En multi-nœuds, le S3 rend les images visibles de tous les nœuds ; MEDIA_ROOT sert alors de tampon local
+MEDIA_STORAGE_BACKEND = os.getenv('MEDIA_STORAGE_BACKEND', 'local')  # local, s3
+MEDIA_UPLOAD_ASYNC = os.getenv('MEDIA_UPLOAD_ASYNC', 'True').lower() == 'true'  # Envoi hors requête
+MEDIA_UPLOAD_WORKERS = int(os.getenv('MEDIA_UPLOAD_WORKERS', '4'))
+
+if MEDIA_STORAGE_BACKEND == 's3':
+    COCKTAIL_IMAGES_STORAGE = {
+        'BACKEND': 'storages.backends.s3.S3Storage',
+        'OPTIONS': {
+            'bucket_name': os.getenv('MEDIA_S3_BUCKET', 'cocktailaiser-media'),
+            'endpoint_url': os.getenv('MEDIA_S3_ENDPOINT_URL') or None,  # ex: http://minio:9000
+            'access_key': os.getenv('MEDIA_S3_ACCESS_KEY', ''),
+            'secret_key': os.getenv('MEDIA_S3_SECRET_KEY', ''),
+            'region_name': os.getenv('MEDIA_S3_REGION', '') or None,
+            'custom_domain': os.getenv('MEDIA_S3_CUSTOM_DOMAIN', '') or None,
+            'querystring_auth': os.getenv('MEDIA_S3_QUERYSTRING_AUTH', 'False').lower() == 'true',
+            'addressing_style': 'path',  # MinIO
+            'default_acl': None,
+            # Les images sont adressées par contenu : un même nom a toujours le même contenu
+            'file_overwrite': True,
+            'object_parameters': {'CacheControl': 'public, max-age=31536000, immutable'},
+        },
+    }
+else:
+    # Sans options : MEDIA_ROOT et MEDIA_URL (préfixé par SCRIPT_NAME) sont utilisés
+    COCKTAIL_IMAGES_STORAGE = {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    }
+
+# Service des images : Django vérifie l'accès, nginx transfère les octets via X-Accel-Redirect
+MEDIA_ACCESS_POLICY = os.getenv('MEDIA_ACCESS_POLICY', 'owner')  # public, authenticated, owner
+MEDIA_ACCEL_REDIRECT = os.getenv('MEDIA_ACCEL_REDIRECT', 'False').lower() == 'true'  # True derrière nginx
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv('MEDIA_ACCEL_REDIRECT_PREFIX', '/protected-media/')  # location internal nginx
+MEDIA_SIGNED_URL_EXPIRE = int(os.getenv('MEDIA_SIGNED_URL_EXPIRE', '300'))  # Redirections S3 des images privées (s)
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+    'cocktail_images': COCKTAIL_IMAGES_STORAGE,
+}
+
 # Login/Logout redirections
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
@@ -160,6 +213,67 @@ STABILITY_AI_BASE_URL = os.getenv('STABILITY_AI_BASE_URL', 'https://api.stabilit
 STABILITY_AI_ENABLED = os.getenv('STABILITY_AI_ENABLED', 'False').lower() == 'true'
 STABILITY_AI_COST_MODE = os.getenv('STABILITY_AI_COST_MODE', 'economic')  # economic, balanced, quality
 
+# Budget journalier de crédits Stability AI (0 = illimité)
+# Le mode coût descend automatiquement quality → balanced → economic → placeholder quand le budget s'épuise
+STABILITY_AI_DAILY_CREDIT_BUDGET = float(os.getenv('STABILITY_AI_DAILY_CREDIT_BUDGET', '0'))
+STABILITY_AI_USER_DAILY_CREDIT_BUDGET = float(os.getenv('STABILITY_AI_USER_DAILY_CREDIT_BUDGET', '0'))
+
+# Pipeline de dérivés d'images (thumb/card/full en WebP et JPEG)
+IMAGE_DERIVATIVES_ENABLED = os.getenv('IMAGE_DERIVATIVES_ENABLED', 'True').lower() == 'true'
+IMAGE_DERIVATIVES_ASYNC = os.getenv('IMAGE_DERIVATIVES_ASYNC', 'True').lower() == 'true'  # Pool de processus hors requête
+IMAGE_DERIVATIVES_WORKERS = int(os.getenv('IMAGE_DERIVATIVES_WORKERS', '2'))
+
+# Stockage adressé par contenu : délai avant suppression d'une image non référencée
+IMAGE_STORE_RELEASE_GRACE_SECONDS = int(os.getenv('IMAGE_STORE_RELEASE_GRACE_SECONDS', '300'))
+
+# Cache des images Stability AI (partagé entre workers via le système de fichiers)
+STABILITY_AI_IMAGE_CACHE_DIR = os.getenv('STABILITY_AI_IMAGE_CACHE_DIR', str(BASE_DIR / 'cache' / 'stability_images'))
+STABILITY_AI_IMAGE_CACHE_TTL = int(os.getenv('STABILITY_AI_IMAGE_CACHE_TTL', str(30 * 24 * 3600)))  # 30 jours
+STABILITY_AI_IMAGE_CACHE_MAX_ENTRIES = int(os.getenv('STABILITY_AI_IMAGE_CACHE_MAX_ENTRIES', '10000'))
+
+# Redis (production) : cache partagé entre workers ; sans REDIS_URL, mémoire locale du processus (développement)
+REDIS_URL = os.getenv('REDIS_URL', '')
+if REDIS_URL:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+
+# Cache des réponses de lecture par utilisateur (clés versionnées, invalidées par les écritures)
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', str(3600)))  # 1 heure
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '5000'))  # Mémoire locale uniquement
+
+# Fragments de templates ({% cache %}) : cartes de cocktails, clé (id, updated_at)
+TEMPLATE_FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv('TEMPLATE_FRAGMENT_CACHE_MAX_ENTRIES', '20000'))  # Mémoire locale uniquement
+
+CACHES = {
+    'default': SHARED_CACHE,
+    'responses': {
+        **SHARED_CACHE,
+        'LOCATION': REDIS_URL or 'responses',
+        'TIMEOUT': RESPONSE_CACHE_TTL,
+        'OPTIONS': {} if REDIS_URL else {'MAX_ENTRIES': RESPONSE_CACHE_MAX_ENTRIES},
+    },
+    'template_fragments': {
+        **SHARED_CACHE,
+        'LOCATION': REDIS_URL or 'template_fragments',
+        'OPTIONS': {} if REDIS_URL else {'MAX_ENTRIES': TEMPLATE_FRAGMENT_CACHE_MAX_ENTRIES},
+    },
+    'stability_images': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': STABILITY_AI_IMAGE_CACHE_DIR,
+        'TIMEOUT': STABILITY_AI_IMAGE_CACHE_TTL,
+        'OPTIONS': {
+            'MAX_ENTRIES': STABILITY_AI_IMAGE_CACHE_MAX_ENTRIES,
+            'CULL_FREQUENCY': 4,  # Éviction d'un quart des entrées quand le cache est plein
+        },
+    },
+}
+
 # Modèles disponibles pour l'utilisateur
 AVAILABLE_AI_MODELS = {
     'ollama': {
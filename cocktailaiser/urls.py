@@ -17,15 +17,13 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
-from django.conf.urls.static import static
+from cocktails.media_views import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('cocktails.auth_urls')),  # APIs d'authentification
     path('api/', include('cocktails.api_urls')),        # APIs des cocktails
+    # Images des cocktails : accès vérifié par Django, octets servis par nginx en production
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:path>", serve_media, name='media'),
     path('', include('cocktails.urls')),                # Interface web
 ]
-
-# Servir les fichiers media en développement
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import CocktailRecipe, GenerationRequest, CocktailTag, CocktailRecipeTag
+from .models import (
+    CocktailIngredient, CocktailRecipe, GenerationRequest, CocktailTag, CocktailRecipeTag, ImageCreditUsage,
+    Ingredient, UserCocktailStats,
+)
 
 @admin.register(GenerationRequest)
 class GenerationRequestAdmin(admin.ModelAdmin):
@@ -47,3 +50,32 @@ class CocktailTagAdmin(admin.ModelAdmin):
 class CocktailRecipeTagAdmin(admin.ModelAdmin):
     list_display = ['cocktail', 'tag']
     list_filter = ['tag']
+
+@admin.register(ImageCreditUsage)
+class ImageCreditUsageAdmin(admin.ModelAdmin):
+    list_display = ['day', 'user', 'credits', 'images', 'updated_at']
+    list_filter = ['day']
+    search_fields = ['user__username']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(UserCocktailStats)
+class UserCocktailStatsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'total', 'favorites', 'rated', 'updated_at']
+    search_fields = ['user__username']
+    readonly_fields = [field.name for field in UserCocktailStats._meta.fields]
+
+
+@admin.register(Ingredient)
+class IngredientAdmin(admin.ModelAdmin):
+    list_display = ['name', 'canonical_name', 'created_at']
+    search_fields = ['name', 'canonical_name']
+    readonly_fields = ['created_at']
+
+
+@admin.register(CocktailIngredient)
+class CocktailIngredientAdmin(admin.ModelAdmin):
+    list_display = ['recipe', 'ingredient', 'quantity', 'amount', 'unit', 'volume_ml']
+    list_filter = ['unit']
+    search_fields = ['name', 'ingredient__canonical_name', 'recipe__name']
+    raw_id_fields = ['recipe', 'ingredient', 'user']
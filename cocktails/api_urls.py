@@ -27,6 +27,22 @@ urlpatterns = [
     path('cocktails/<uuid:pk>/favorite/', api_views.toggle_favorite, name='toggle_favorite'),
     path('favorites/', api_views.user_favorites, name='user_favorites'),
     
+    # Export en flux de l'historique complet (NDJSON / CSV)
+    path('export/', api_views.export_history, name='export_history'),
+    
+    # Import en masse (NDJSON / CSV)
+    path('import/', api_views.import_cocktails, name='import_cocktails'),
+    
+    # Ingrédients : catalogue de l'utilisateur et cocktails réalisables
+    path('ingredients/', api_views.user_ingredients, name='user_ingredients'),
+    path('ingredients/makeable/', api_views.makeable_cocktails, name='makeable_cocktails'),
+    
     # Statistiques utilisateur
     path('stats/', api_views.user_stats, name='user_stats'),
+    
+    # Budget de crédits Stability AI (staff)
+    path('images/budget/', api_views.image_credit_budget, name='image_credit_budget'),
+    
+    # Taux de succès du cache des réponses (staff)
+    path('cache/stats/', api_views.response_cache_stats, name='response_cache_stats'),
 ]
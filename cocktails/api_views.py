@@ -2,52 +2,140 @@
 Vues API sécurisées pour les cocktails avec JWT
 """
 
+import uuid
+
 from django.contrib.auth.models import User
-from django.db.models import Count, Q
+from django.db.models import Count, Window
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import api_view, permission_classes, action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.pagination import PageNumberPagination
-from datetime import datetime, timedelta
 import logging
 
 from .models import CocktailRecipe, GenerationRequest
-from .serializers import CocktailRecipeSerializer, GenerationRequestSerializer
+from .serializers import (
+    BulkFavoriteSerializer, BulkIdsSerializer, BulkRateSerializer, CocktailRecipeListSerializer,
+    CocktailRecipeSerializer, GenerationRequestSerializer, SimilarCocktailSerializer, fieldset_params,
+)
 from .services.ai_factory import ai_service
+from .services import bulk, ingredients as ingredient_catalogue, similarity
+from .services.conditional import (
+    conditional, recipe_validators, similar_validators, user_list_validators, user_stats_validators,
+)
+from .services.credit_governor import credit_governor
+from .services.export import EXPORT_FORMATS, parse_since, stream_export
+from .services.importer import import_recipes, read_rows
+from .services.pagination import (
+    DEFAULT_ORDERING, InvalidCursor, KeysetPagination, page_payload, paginate, parse_page_size, wants_count,
+)
+from .services.response_cache import response_cache
+from .services.search import highlights, search as search_recipes
+from .services.user_stats import ALCOHOL_LEVELS, DIFFICULTY_LEVELS, created_since, get_stats
 
 logger = logging.getLogger(__name__)
 
+FAVORITES_PAGE_SIZE = 50
+
+# Filtres sur les colonnes dénormalisées des ingrédients : paramètre -> lookup
+INGREDIENTS_SUMMARY_FILTERS = {
+    'min_ingredients': 'ingredients_count__gte',
+    'max_ingredients': 'ingredients_count__lte',
+    'cost_tier': 'cost_tier',
+}
+
+
+def filter_ingredients_summary(queryset, params):
+    """?min_ingredients=&max_ingredients=&cost_tier=1|2|3 ; retourne (queryset, au moins un filtre appliqué)"""
+    filters = {}
+    for param, lookup in INGREDIENTS_SUMMARY_FILTERS.items():
+        value = params.get(param, '')
+        if value == '':
+            continue
+        try:
+            filters[lookup] = int(value)
+        except ValueError:
+            raise ValidationError({param: "Nombre entier attendu"})
+    return queryset.filter(**filters), bool(filters)
+
 
 class CocktailRecipeViewSet(viewsets.ModelViewSet):
     """ViewSet pour les recettes de cocktails avec sécurité JWT"""
     
     serializer_class = CocktailRecipeSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
+    
+    def get_serializer_class(self):
+        """Serializer allégé pour la liste, complet pour le détail et les écritures"""
+        if self.action == 'list':
+            return CocktailRecipeListSerializer
+        return CocktailRecipeSerializer
+    
+    def get_fieldset(self):
+        """?fields= / ?expand= ne s'appliquent qu'en lecture"""
+        if self.request.method != 'GET':
+            return {}
+        return fieldset_params(self.request)
     
     def get_queryset(self):
-        """Retourne seulement les cocktails de l'utilisateur connecté"""
-        return CocktailRecipe.objects.filter(user=self.request.user).order_by('-created_at')
+        """Retourne seulement les cocktails de l'utilisateur connecté (filtres ?min_ingredients=... en liste)"""
+        queryset = CocktailRecipe.objects.filter(user=self.request.user).order_by('-created_at')
+        self.summary_filtered = False
+        if self.action == 'list':
+            queryset, self.summary_filtered = filter_ingredients_summary(queryset, self.request.query_params)
+        return self.get_serializer_class().setup_queryset(queryset, **self.get_fieldset())
+    
+    def get_serializer(self, *args, **kwargs):
+        kwargs.update(self.get_fieldset())
+        return super().get_serializer(*args, **kwargs)
+    
+    def get_keyset_count(self):
+        """Total de la liste paginée, lu dans les statistiques matérialisées (COUNT si filtrée)"""
+        if self.summary_filtered:
+            return self.get_queryset().count()
+        return get_stats(self.request.user).total
+    
+    @method_decorator(conditional(user_list_validators))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @method_decorator(conditional(recipe_validators))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
     
     def perform_create(self, serializer):
         """Assigne l'utilisateur connecté au cocktail créé"""
         serializer.save(user=self.request.user)
     
+    def get_recipe_id(self):
+        """Identifiant de l'URL en UUID (404 s'il est invalide, comme get_object())"""
+        try:
+            return uuid.UUID(str(self.kwargs[self.lookup_field]))
+        except ValueError:
+            raise Http404
+    
     @action(detail=True, methods=['post'])
     def toggle_favorite(self, request, pk=None):
         """Toggle le statut favori d'un cocktail"""
+        recipe_id = self.get_recipe_id()
         try:
-            cocktail = self.get_object()
-            cocktail.is_favorite = not cocktail.is_favorite
-            cocktail.save()
+            cocktail = bulk.toggle_favorite(request.user, recipe_id)
+            if cocktail is None:
+                raise Http404
             
-            logger.info(f"✅ Favori {'ajouté' if cocktail.is_favorite else 'retiré'}: {cocktail.name}")
+            logger.info(f"✅ Favori {'ajouté' if cocktail['is_favorite'] else 'retiré'}: {cocktail['name']}")
             
             return Response({
-                'is_favorite': cocktail.is_favorite,
-                'message': f'Cocktail {"ajouté aux" if cocktail.is_favorite else "retiré des"} favoris'
+                'is_favorite': cocktail['is_favorite'],
+                'message': f'Cocktail {"ajouté aux" if cocktail["is_favorite"] else "retiré des"} favoris'
             })
+        except Http404:
+            raise
         except Exception as e:
             logger.error(f"❌ Erreur toggle favori: {e}")
             return Response(
@@ -58,8 +146,8 @@ class CocktailRecipeViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def rate(self, request, pk=None):
         """Noter un cocktail"""
+        recipe_id = self.get_recipe_id()
         try:
-            cocktail = self.get_object()
             rating = request.data.get('rating')
             
             if not rating or not (1 <= int(rating) <= 5):
@@ -68,15 +156,18 @@ class CocktailRecipeViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            cocktail.rating = int(rating)
-            cocktail.save()
+            result = bulk.rate(request.user, [recipe_id], int(rating))
+            if result['missing']:
+                raise Http404
             
-            logger.info(f"✅ Note attribuée: {rating}/5 pour {cocktail.name}")
+            logger.info(f"✅ Note attribuée: {rating}/5 pour le cocktail {recipe_id}")
             
             return Response({
-                'rating': cocktail.rating,
+                'rating': int(rating),
                 'message': f'Note de {rating}/5 attribuée'
             })
+        except Http404:
+            raise
         except Exception as e:
             logger.error(f"❌ Erreur notation: {e}")
             return Response(
@@ -85,6 +176,88 @@ class CocktailRecipeViewSet(viewsets.ModelViewSet):
             )
 
 
+    # ------------------------------------------------------------------
+    # Opérations en masse : {"ids": [...]} (500 au plus), une instruction SQL par opération
+    # ------------------------------------------------------------------
+    
+    def _bulk(self, serializer_class, operation, *fields):
+        serializer = serializer_class(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            result = operation(self.request.user, data['ids'], *(data[name] for name in fields))
+        except Exception as e:
+            logger.error(f"❌ Erreur opération en masse: {e}")
+            return Response(
+                {'error': 'Erreur lors de la modification des cocktails'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        return Response(result)
+    
+    @action(detail=False, methods=['post'], url_path='bulk/favorite')
+    def bulk_favorite(self, request):
+        """Ajoute ou retire des favoris : {"ids": [...], "is_favorite": true}"""
+        return self._bulk(BulkFavoriteSerializer, bulk.set_favorite, 'is_favorite')
+    
+    @action(detail=False, methods=['post'], url_path='bulk/rate')
+    def bulk_rate(self, request):
+        """Note plusieurs cocktails : {"ids": [...], "rating": 4} (null retire la note)"""
+        return self._bulk(BulkRateSerializer, bulk.rate, 'rating')
+    
+    @action(detail=False, methods=['post'], url_path='bulk/delete')
+    def bulk_delete(self, request):
+        """Supprime plusieurs cocktails : {"ids": [...]}"""
+        return self._bulk(BulkIdsSerializer, bulk.delete)
+    
+    @action(detail=True, methods=['get'])
+    @method_decorator(conditional(similar_validators))
+    def similar(self, request, pk=None):
+        """Cocktails de tous les utilisateurs aux ingrédients les plus proches : ?limit= (20 au plus)"""
+        recipe_id = self.get_recipe_id()
+        limit = min(
+            parse_page_size(request.query_params.get('limit'), default=similarity.SIMILAR_LIMIT),
+            similarity.SIMILAR_MAX_LIMIT,
+        )
+        try:
+            # Recalculé à la prochaine écriture de l'utilisateur ou du corpus (tous les utilisateurs)
+            payload = response_cache.get_or_compute(
+                request.user, 'similar',
+                {'pk': str(recipe_id), 'limit': limit, 'corpus': similarity.similarity_index.version()},
+                lambda: _similar_payload(request.user, recipe_id, limit)
+            )
+        except Exception as e:
+            logger.error(f"❌ Erreur cocktails similaires: {e}")
+            return Response(
+                {'error': 'Erreur lors de la recherche des cocktails similaires'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        if payload is None:
+            raise Http404
+        return Response(payload)
+
+
+def _similar_payload(user, recipe_id, limit):
+    """Cocktails proches (champs publics) avec leur score ; None si le cocktail n'est pas à l'utilisateur"""
+    matches = similarity.similar(user, recipe_id, limit)
+    if matches is None:
+        return None
+    recipes = SimilarCocktailSerializer.setup_queryset(
+        CocktailRecipe.objects.filter(pk__in=[match['recipe_id'] for match in matches])
+    ).in_bulk()
+    
+    results = []
+    for match in matches:
+        recipe = recipes.get(match['recipe_id'])
+        if recipe is None:
+            continue
+        data = SimilarCocktailSerializer(recipe, context={'is_own': match['is_own']}).data
+        data['similarity'] = match['similarity']
+        data['shared_ingredients'] = match['shared']
+        data['is_own'] = match['is_own']
+        results.append(data)
+    return {'results': results, 'count': len(results)}
+
+
 class GenerationRequestViewSet(viewsets.ModelViewSet):
     """ViewSet pour les demandes de génération avec sécurité JWT"""
     
@@ -93,7 +266,8 @@ class GenerationRequestViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Retourne seulement les demandes de l'utilisateur connecté"""
-        return GenerationRequest.objects.filter(user=self.request.user).order_by('-created_at')
+        queryset = GenerationRequest.objects.filter(user=self.request.user).order_by('-created_at')
+        return GenerationRequestSerializer.setup_queryset(queryset)
     
     def perform_create(self, serializer):
         """Assigne l'utilisateur connecté à la demande"""
@@ -131,7 +305,7 @@ def generate_cocktail_api(request):
         )
         
         # Générer le cocktail avec l'IA
-        cocktail_data = ai_service.generate_cocktail(user_prompt, context)
+        cocktail_data = ai_service.generate_cocktail(user_prompt, context, user=request.user)
         
         # Créer le cocktail en base
         recipe = ai_service.create_cocktail_recipe(
@@ -161,54 +335,94 @@ def generate_cocktail_api(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(user_list_validators)
 def user_cocktail_history(request):
-    """API pour récupérer l'historique des cocktails de l'utilisateur"""
+    """
+    API pour récupérer l'historique des cocktails de l'utilisateur
+    Pagination par curseur (?cursor=, ?ordering=recent|oldest|name|name_desc|ingredients|ingredients_desc, ?count=0) ;
+    ?page=N et la recherche (triée par pertinence) utilisent la pagination par numéro de page
+    Filtres : ?difficulty=, ?alcohol_content=, ?ingredients=rhum,menthe, ?min_ingredients=, ?max_ingredients=, ?cost_tier=
+    Champs à la demande : ?fields=id,name,image_src&expand=user,generation_request
+    """
     try:
-        # Paramètres de pagination
-        page_size = int(request.GET.get('page_size', 10))
-        page = int(request.GET.get('page', 1))
+        fieldset = fieldset_params(request)
         
         # Filtres
         search = request.GET.get('search', '')
         difficulty = request.GET.get('difficulty', '')
         alcohol_content = request.GET.get('alcohol_content', '')
+        ingredients = request.GET.get('ingredients', '')
         
-        # Base queryset
-        queryset = CocktailRecipe.objects.filter(user=request.user)
+        # Base queryset, limité aux colonnes des champs demandés
+        queryset = CocktailRecipeListSerializer.setup_queryset(
+            CocktailRecipe.objects.filter(user=request.user), **fieldset
+        )
         
         # Appliquer les filtres
-        if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | 
-                Q(description__icontains=search)
-            )
-        
         if difficulty:
             queryset = queryset.filter(difficulty_level=difficulty)
         
         if alcohol_content:
             queryset = queryset.filter(alcohol_content=alcohol_content)
         
-        # Ordonner par date de création
-        queryset = queryset.order_by('-created_at')
+        if ingredients:
+            # "rhum,citron vert" : cocktails contenant chacun des ingrédients
+            queryset = ingredient_catalogue.filter_containing(queryset, request.user, ingredients)
+        
+        # Nombre d'ingrédients et palier de coût : colonnes indexées, le JSON n'est pas lu
+        queryset, summary_filtered = filter_ingredients_summary(queryset, request.GET)
+        
+        if not search and 'page' not in request.GET:
+            return _keyset_history(
+                request, queryset, fieldset, difficulty, alcohol_content, ingredients or summary_filtered
+            )
+        
+        # Paramètres de pagination
+        page_size = int(request.GET.get('page_size', 10))
+        page = int(request.GET.get('page', 1))
+        
+        # Recherche plein texte ordonnée par pertinence, sinon par date de création
+        if search:
+            # Total calculé par la requête de la page (fenêtre) : la recherche n'est évaluée qu'une fois
+            queryset = search_recipes(queryset, search).annotate(search_total=Window(Count('pk')))
+        else:
+            queryset = queryset.order_by('-created_at')
         
         # Pagination manuelle
-        total_count = queryset.count()
         start = (page - 1) * page_size
         end = start + page_size
-        cocktails = queryset[start:end]
+        cocktails = list(queryset[start:end])
+        if not search:
+            total_count = queryset.count()
+        elif cocktails:
+            total_count = cocktails[0].search_total
+        else:
+            # Page vide : aucun résultat, ou page au-delà du dernier
+            total_count = queryset.count() if start else 0
         
         # Sérialiser
-        serializer = CocktailRecipeSerializer(cocktails, many=True)
+        serializer = CocktailRecipeListSerializer(cocktails, many=True, **fieldset)
+        results = serializer.data
+        
+        if search:
+            # Extraits surlignés calculés pour la page courante uniquement
+            snippets = highlights(cocktails, search)
+            for cocktail, item in zip(cocktails, results):
+                item['search_rank'] = cocktail.search_rank
+                item['search_snippet'] = snippets.get(str(cocktail.pk), '')
         
         return Response({
-            'results': serializer.data,
+            'results': results,
             'count': total_count,
             'page': page,
             'page_size': page_size,
             'total_pages': (total_count + page_size - 1) // page_size
         })
         
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except ValidationError as e:
+        return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"❌ Erreur historique utilisateur: {e}")
         return Response(
@@ -217,27 +431,50 @@ def user_cocktail_history(request):
         )
 
 
+def _keyset_history(request, queryset, fieldset, difficulty, alcohol_content, other_filters):
+    """Page de l'historique par curseur ; le total vient des statistiques quand un seul filtre simple s'applique"""
+    count = None
+    if wants_count(request):
+        count = queryset.count
+        if not other_filters and not (difficulty and alcohol_content):
+            stats = get_stats(request.user)
+            if difficulty in DIFFICULTY_LEVELS:
+                count = getattr(stats, f'difficulty_{difficulty}')
+            elif alcohol_content in ALCOHOL_LEVELS:
+                count = getattr(stats, f'alcohol_{alcohol_content}')
+            elif not difficulty and not alcohol_content:
+                count = stats.total
+    
+    page = paginate(
+        queryset,
+        ordering=request.GET.get('ordering', DEFAULT_ORDERING),
+        cursor=request.GET.get('cursor'),
+        page_size=parse_page_size(request.GET.get('page_size')),
+        count=count,
+    )
+    serializer = CocktailRecipeListSerializer(page.items, many=True, **fieldset)
+    return Response(page_payload(page, serializer.data))
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def toggle_favorite(request, pk):
     """API pour toggle le statut favori d'un cocktail"""
     try:
-        cocktail = CocktailRecipe.objects.get(pk=pk, user=request.user)
-        cocktail.is_favorite = not cocktail.is_favorite
-        cocktail.save()
+        cocktail = bulk.toggle_favorite(request.user, pk)
+        if cocktail is None:
+            return Response(
+                {'error': 'Cocktail non trouvé'},
+                status=status.HTTP_404_NOT_FOUND
+            )
         
-        logger.info(f"✅ Favori {'ajouté' if cocktail.is_favorite else 'retiré'}: {cocktail.name}")
+        logger.info(f"✅ Favori {'ajouté' if cocktail['is_favorite'] else 'retiré'}: {cocktail['name']}")
         
         return Response({
-            'is_favorite': cocktail.is_favorite,
-            'message': f'Cocktail {"ajouté aux" if cocktail.is_favorite else "retiré des"} favoris'
+            'is_favorite': cocktail['is_favorite'],
+            'message': f'Cocktail {"ajouté aux" if cocktail["is_favorite"] else "retiré des"} favoris'
         })
         
-    except CocktailRecipe.DoesNotExist:
-        return Response(
-            {'error': 'Cocktail non trouvé'},
-            status=status.HTTP_404_NOT_FOUND
-        )
     except Exception as e:
         logger.error(f"❌ Erreur toggle favori: {e}")
         return Response(
@@ -248,21 +485,20 @@ def toggle_favorite(request, pk):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional(user_list_validators)
 def user_favorites(request):
-    """API pour récupérer les cocktails favoris de l'utilisateur"""
+    """API pour récupérer les cocktails favoris de l'utilisateur (pagination par curseur, 50 par page, ?fields=, ?expand=)"""
     try:
-        favorites = CocktailRecipe.objects.filter(
-            user=request.user, 
-            is_favorite=True
-        ).order_by('-created_at')
-        
-        serializer = CocktailRecipeSerializer(favorites, many=True)
-        
-        return Response({
-            'favorites': serializer.data,
-            'count': favorites.count()
-        })
+        # Page calculée une fois par version des données et combinaison de paramètres
+        payload = response_cache.get_or_compute(
+            request.user, 'favorites', dict(request.GET.lists()), lambda: _favorites_payload(request)
+        )
+        return Response(payload)
         
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except ValidationError as e:
+        return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"❌ Erreur favoris utilisateur: {e}")
         return Response(
@@ -271,41 +507,183 @@ def user_favorites(request):
         )
 
 
+def _favorites_payload(request):
+    fieldset = fieldset_params(request)
+    favorites = CocktailRecipeListSerializer.setup_queryset(
+        CocktailRecipe.objects.filter(user=request.user, is_favorite=True), **fieldset
+    )
+    
+    page = paginate(
+        favorites,
+        ordering=request.GET.get('ordering', DEFAULT_ORDERING),
+        cursor=request.GET.get('cursor'),
+        page_size=parse_page_size(request.GET.get('page_size'), default=FAVORITES_PAGE_SIZE),
+        count=get_stats(request.user).favorites if wants_count(request) else None,
+    )
+    serializer = CocktailRecipeListSerializer(page.items, many=True, **fieldset)
+    
+    payload = page_payload(page, serializer.data)
+    payload['favorites'] = payload.pop('results')
+    return payload
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+def export_history(request):
+    """
+    Export en flux de tout l'historique : ?type=ndjson|csv, ?since=<date ISO 8601>, ?cursor=<curseur d'une ligne>
+    Compressé en gzip quand le client l'accepte (Accept-Encoding)
+    """
+    export_format = request.GET.get('type', 'ndjson')
+    compress = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    try:
+        stream = stream_export(
+            request.user,
+            export_format,
+            since=parse_since(request.GET.get('since')),
+            cursor=request.GET.get('cursor'),
+            compress=compress,
+        )
+    except InvalidCursor as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    logger.info(f"📦 Export {export_format} de l'historique pour {request.user.username}")
+    
+    response = StreamingHttpResponse(stream, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = (
+        f'attachment; filename="cocktails-{timezone.localdate().isoformat()}.{export_format}"'
+    )
+    if compress:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    # Pas de mise en tampon côté nginx : les blocs partent dès qu'ils sont produits
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def import_cocktails(request):
+    """
+    Import en masse : corps NDJSON (application/x-ndjson) ou CSV (text/csv), ou fichier multipart 'file'
+    Les lignes sont lues en flux et insérées par lots ; le rapport détaille les erreurs par ligne
+    ?dry_run=1 valide sans rien insérer
+    """
+    dry_run = request.GET.get('dry_run') in ('1', 'true')
+    try:
+        if request.content_type.startswith('multipart/'):
+            upload = request.FILES.get('file')
+            if upload is None:
+                return Response({'error': "Fichier 'file' requis"}, status=status.HTTP_400_BAD_REQUEST)
+            source, lines = upload.name.lower(), upload
+        else:
+            # Lecture ligne à ligne du corps de la requête, sans le charger en entier
+            source, lines = request.content_type, request.stream or []
+        import_format = request.GET.get('type') or ('csv' if 'csv' in source else 'ndjson')
+        rows = read_rows(lines, import_format)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        report = import_recipes(request.user, rows, dry_run=dry_run)
+    except Exception as e:
+        logger.error(f"❌ Erreur import cocktails: {e}")
+        return Response(
+            {'error': 'Erreur lors de l\'import des cocktails'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    if report.created:
+        response_status = status.HTTP_201_CREATED
+    elif report.failed and not dry_run:
+        response_status = status.HTTP_400_BAD_REQUEST
+    else:
+        response_status = status.HTTP_200_OK
+    return Response(report.as_dict(), status=response_status)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_ingredients(request):
+    """API pour récupérer les ingrédients utilisés par l'utilisateur et leur nombre de cocktails"""
+    try:
+        results = [
+            {
+                'id': row['ingredient_id'],
+                'name': row['ingredient__name'],
+                'canonical_name': row['ingredient__canonical_name'],
+                'cocktails': row['cocktails'],
+            }
+            for row in ingredient_catalogue.user_ingredients(request.user)
+        ]
+        return Response({'ingredients': results, 'count': len(results)})
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur ingrédients utilisateur: {e}")
+        return Response(
+            {'error': 'Erreur lors de la récupération des ingrédients'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def makeable_cocktails(request):
+    """API "que puis-je préparer ?" : cocktails réalisables avec les ingrédients disponibles"""
+    try:
+        available = request.GET.get('available', '')
+        if not available.strip():
+            return Response(
+                {'error': "Paramètre 'available' requis (ex: available=rhum,citron vert,sucre)"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        max_missing = max(0, min(int(request.GET.get('max_missing', 0)), 5))
+        
+        matches = ingredient_catalogue.makeable(request.user, available, max_missing)
+        recipe_ids = [match['recipe_id'] for match in matches]
+        recipes = CocktailRecipeListSerializer.setup_queryset(
+            CocktailRecipe.objects.filter(user=request.user, pk__in=recipe_ids)
+        ).in_bulk()
+        missing = ingredient_catalogue.missing_ingredients(recipe_ids, available) if max_missing else {}
+        
+        results = []
+        for match in matches:
+            recipe = recipes.get(match['recipe_id'])
+            if recipe is None:
+                continue
+            data = CocktailRecipeListSerializer(recipe).data
+            data['missing_count'] = match['missing']
+            data['missing_ingredients'] = missing.get(match['recipe_id'], [])
+            results.append(data)
+        
+        return Response({'results': results, 'count': len(results), 'max_missing': max_missing})
+        
+    except ValueError:
+        return Response(
+            {'error': "Paramètre 'max_missing' invalide"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except Exception as e:
+        logger.error(f"❌ Erreur cocktails réalisables: {e}")
+        return Response(
+            {'error': 'Erreur lors de la recherche des cocktails réalisables'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@conditional(user_stats_validators)
 def user_stats(request):
     """API pour récupérer les statistiques de l'utilisateur"""
     try:
         user = request.user
-        now = datetime.now()
-        
-        # Statistiques générales
-        total_cocktails = CocktailRecipe.objects.filter(user=user).count()
-        total_favorites = CocktailRecipe.objects.filter(user=user, is_favorite=True).count()
-        
-        # Statistiques par période
-        last_week = now - timedelta(days=7)
-        last_month = now - timedelta(days=30)
-        
-        cocktails_last_week = CocktailRecipe.objects.filter(
-            user=user, 
-            created_at__gte=last_week
-        ).count()
         
-        cocktails_last_month = CocktailRecipe.objects.filter(
-            user=user, 
-            created_at__gte=last_month
-        ).count()
-        
-        # Statistiques par difficulté
-        difficulty_stats = CocktailRecipe.objects.filter(user=user).values(
-            'difficulty_level'
-        ).annotate(count=Count('id'))
-        
-        # Statistiques par type d'alcool
-        alcohol_stats = CocktailRecipe.objects.filter(user=user).values(
-            'alcohol_content'
-        ).annotate(count=Count('id'))
+        # Compteurs recalculés à chaque nouvelle version des données ou changement de jour
+        # (last_week / last_month : 7 / 30 derniers jours calendaires, voir created_since)
+        payload = response_cache.get_or_compute(
+            user, 'stats', {'day': timezone.localdate()}, lambda: _stats_payload(user)
+        )
         
         return Response({
             'user': {
@@ -313,14 +691,7 @@ def user_stats(request):
                 'date_joined': user.date_joined.isoformat(),
                 'last_login': user.last_login.isoformat() if user.last_login else None,
             },
-            'cocktails': {
-                'total': total_cocktails,
-                'favorites': total_favorites,
-                'last_week': cocktails_last_week,
-                'last_month': cocktails_last_month,
-            },
-            'difficulty_distribution': list(difficulty_stats),
-            'alcohol_distribution': list(alcohol_stats),
+            **payload,
         })
         
     except Exception as e:
@@ -329,3 +700,63 @@ def user_stats(request):
             {'error': 'Erreur lors de la récupération des statistiques'},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+
+def _stats_payload(user):
+    # Statistiques matérialisées : une ligne + les cumuls journaliers des 30 derniers jours
+    stats = get_stats(user)
+    
+    # Répartitions (seules les catégories représentées, comme un GROUP BY)
+    difficulty_stats = [
+        {'difficulty_level': level, 'count': getattr(stats, f'difficulty_{level}')}
+        for level in DIFFICULTY_LEVELS
+        if getattr(stats, f'difficulty_{level}')
+    ]
+    alcohol_stats = [
+        {'alcohol_content': level, 'count': getattr(stats, f'alcohol_{level}')}
+        for level in ALCOHOL_LEVELS
+        if getattr(stats, f'alcohol_{level}')
+    ]
+    
+    return {
+        'cocktails': {
+            'total': stats.total,
+            'favorites': stats.favorites,
+            'last_week': created_since(user, 7),
+            'last_month': created_since(user, 30),
+            'rated': stats.rated,
+            'average_rating': stats.average_rating,
+        },
+        'difficulty_distribution': difficulty_stats,
+        'alcohol_distribution': alcohol_stats,
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def image_credit_budget(request):
+    """API staff : budget de crédits Stability AI restant et projection d'épuisement"""
+    try:
+        return Response(credit_governor.get_budget_status())
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur budget crédits image: {e}")
+        return Response(
+            {'error': 'Erreur lors de la récupération du budget de crédits'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def response_cache_stats(request):
+    """API staff : taux de succès du cache des réponses (global et par réponse)"""
+    try:
+        return Response(response_cache.get_stats())
+        
+    except Exception as e:
+        logger.error(f"❌ Erreur statistiques du cache des réponses: {e}")
+        return Response(
+            {'error': 'Erreur lors de la récupération des statistiques du cache'},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
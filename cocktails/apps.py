@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CocktailsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cocktails'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .services.search import register_sqlite_functions
+
+        connection_created.connect(register_sqlite_functions)
@@ -0,0 +1,86 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cocktails.models import CocktailRecipe
+from cocktails.services import ingredients
+from cocktails.services.response_cache import response_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Alimente le catalogue normalisé des ingrédients (Ingredient / CocktailIngredient) "
+        "depuis le JSON des cocktails, par lots"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Recalculer tous les cocktails (par défaut : seulement ceux sans lignes d\'ingrédients)'
+        )
+        parser.add_argument(
+            '--fix-keys',
+            action='store_true',
+            help="Réécrire aussi les clés 'quantité' du JSON en 'quantite' (clé lue par les templates)"
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Nombre de cocktails traités par lot'
+        )
+
+    def handle(self, *args, **options):
+        queryset = CocktailRecipe.objects.only('pk', 'user_id', 'ingredients').order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(ingredient_lines__isnull=True)
+
+        started = time.perf_counter()
+        recipes_count = 0
+        lines_count = 0
+        fixed = 0
+        last_pk = None
+
+        # Pagination par clé : les cocktails traités sortent du filtre au fur et à mesure
+        while True:
+            batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            batch = list(batch[:options['chunk_size']])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            if options['fix_keys']:
+                fixed += self._fix_keys(batch)
+            lines_count += ingredients.sync_recipes(batch)
+            recipes_count += len(batch)
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"   🧪 {recipes_count} cocktail(s), {lines_count} ligne(s)")
+
+        elapsed = time.perf_counter() - started
+        if fixed:
+            self.stdout.write(f"🔧 {fixed} liste(s) d'ingrédients réécrite(s) avec la clé 'quantite'")
+        rate = recipes_count / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {recipes_count} cocktail(s) indexé(s), {lines_count} ligne(s) d'ingrédients "
+            f"en {elapsed:.1f}s ({rate:.0f} cocktails/s)"
+        ))
+
+    def _fix_keys(self, recipes):
+        changed = []
+        for recipe in recipes:
+            if not isinstance(recipe.ingredients, list):
+                continue
+            if not any(isinstance(item, dict) and 'quantité' in item for item in recipe.ingredients):
+                continue
+            recipe.ingredients = [
+                {('quantite' if key == 'quantité' else key): value for key, value in item.items()}
+                if isinstance(item, dict) else item
+                for item in recipe.ingredients
+            ]
+            changed.append(recipe)
+        # bulk_update : pas de signaux, les lignes sont recalculées juste après
+        CocktailRecipe.objects.bulk_update(changed, ['ingredients'])
+        for user_id in {recipe.user_id for recipe in changed}:
+            response_cache.invalidate(user_id)
+        return len(changed)
@@ -0,0 +1,192 @@
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from cocktails.models import CocktailRecipe
+from cocktails.services import media_storage
+from cocktails.services.image_derivatives import DERIVATIVES_DIR, source_candidates
+from cocktails.services.image_store import IMAGES_DIR, PLACEHOLDER_IMAGES, STAGING_DIR
+
+QUARANTINE_DIR = '.quarantine'
+
+
+class Command(BaseCommand):
+    help = (
+        "Supprime (ou met en quarantaine) les images de cocktail_images qui ne sont plus "
+        "référencées par aucun cocktail, ainsi que les fichiers partiels des générations échouées"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Afficher ce qui serait supprimé sans rien modifier'
+        )
+        parser.add_argument(
+            '--quarantine',
+            nargs='?',
+            const='',
+            default=None,
+            metavar='DOSSIER',
+            help=f'Déplacer les fichiers au lieu de les supprimer (défaut: MEDIA_ROOT/{QUARANTINE_DIR}/<date>)'
+        )
+        parser.add_argument(
+            '--older-than',
+            type=float,
+            default=24,
+            help='Ne traiter que les fichiers non modifiés depuis ce nombre d\'heures (délai de grâce)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Nombre de fichiers vérifiés par requête en base'
+        )
+
+    def handle(self, *args, **options):
+        self.media_root = Path(settings.MEDIA_ROOT)
+        images_root = self.media_root / IMAGES_DIR
+        if not images_root.is_dir():
+            self.stdout.write(self.style.WARNING(f"⚠️  Dossier introuvable: {images_root}"))
+            return
+
+        self.dry_run = options['dry_run']
+        self.verbosity = options['verbosity']
+        self.quarantine = None
+        if options['quarantine'] is not None:
+            self.quarantine = Path(
+                options['quarantine']
+                or self.media_root / QUARANTINE_DIR / time.strftime('%Y%m%d-%H%M%S')
+            )
+
+        grace = max(options['older_than'] * 3600, getattr(settings, 'IMAGE_STORE_RELEASE_GRACE_SECONDS', 300))
+        cutoff = time.time() - grace
+
+        self.stats = {'scanned': 0, 'kept': 0, 'orphans': 0, 'partials': 0, 'bytes': 0, 'errors': 0}
+
+        batch = []
+        for entry in self._iter_files(images_root):
+            self.stats['scanned'] += 1
+            stat = entry.stat(follow_symlinks=False)
+            # Fichier récent : une génération ou une réutilisation est peut-être en cours
+            if stat.st_mtime > cutoff:
+                self.stats['kept'] += 1
+                continue
+
+            batch.append((Path(entry.path).relative_to(self.media_root).as_posix(), stat.st_size))
+            if len(batch) >= options['chunk_size']:
+                self._process_batch(batch)
+                batch = []
+
+        if batch:
+            self._process_batch(batch)
+
+        self._report()
+
+    def _iter_files(self, root: Path):
+        """Parcourt l'arborescence sans la charger : seule la pile des dossiers reste en mémoire"""
+        skipped = {str(self.media_root / QUARANTINE_DIR)}
+        if self.quarantine:
+            skipped.add(str(self.quarantine))
+
+        stack = [str(root)]
+        while stack:
+            try:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.path not in skipped:
+                                stack.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            yield entry
+            except FileNotFoundError:
+                continue
+
+    def _is_partial(self, path: str) -> bool:
+        """Fichier temporaire laissé par une écriture interrompue"""
+        parts = Path(path).parts
+        name = parts[-1]
+        return STAGING_DIR in parts or (name.startswith('.') and name.endswith(('.part', '.tmp')))
+
+    def _is_placeholder(self, path: str) -> bool:
+        stem = Path(path).stem
+        return any(stem == Path(name).stem or stem.startswith(f"{Path(name).stem}_") for name in PLACEHOLDER_IMAGES)
+
+    def _process_batch(self, batch):
+        """Vérifie un lot de fichiers en une seule requête puis traite les orphelins"""
+        candidates = {}
+        orphans = []
+
+        for path, size in batch:
+            if self._is_partial(path):
+                self.stats['partials'] += 1
+                orphans.append((path, size))
+            elif self._is_placeholder(path):
+                self.stats['kept'] += 1
+            elif path.startswith(f"{DERIVATIVES_DIR}/"):
+                candidates[(path, size)] = source_candidates(path)
+            else:
+                candidates[(path, size)] = [path]
+
+        referenced = set(
+            CocktailRecipe.objects
+            .filter(image_url__in={source for sources in candidates.values() for source in sources})
+            .values_list('image_url', flat=True)
+            .distinct()
+        )
+
+        for (path, size), sources in candidates.items():
+            if referenced.intersection(sources):
+                self.stats['kept'] += 1
+            else:
+                self.stats['orphans'] += 1
+                orphans.append((path, size))
+
+        removed = []
+        for path, size in orphans:
+            if self.verbosity >= 2:
+                self.stdout.write(f"   🗑️  {path} ({size} octets)")
+            if not self.dry_run and not self._remove(path):
+                continue
+            self.stats['bytes'] += size
+            removed.append(path)
+
+        # Une quarantaine doit rester réversible : les objets distants sont conservés
+        if removed and not self.dry_run and self.quarantine is None:
+            media_storage.delete(path for path in removed if not self._is_partial(path))
+
+    def _remove(self, path: str) -> bool:
+        source = self.media_root / path
+        try:
+            if self.quarantine is not None:
+                target = self.quarantine / path
+                target.parent.mkdir(parents=True, exist_ok=True)
+                os.replace(source, target)
+            else:
+                source.unlink()
+            return True
+        except FileNotFoundError:
+            return False
+        except OSError as e:
+            self.stats['errors'] += 1
+            self.stderr.write(self.style.ERROR(f"❌ {path}: {e}"))
+            return False
+
+    def _report(self):
+        stats = self.stats
+        action = 'à récupérer' if self.dry_run else ('mis en quarantaine' if self.quarantine else 'récupérés')
+        self.stdout.write(
+            f"📁 {stats['scanned']} fichier(s) analysé(s), {stats['kept']} conservé(s), "
+            f"{stats['orphans']} orphelin(s), {stats['partials']} fichier(s) partiel(s)"
+        )
+        if self.quarantine and not self.dry_run:
+            self.stdout.write(f"📦 Quarantaine: {self.quarantine}")
+        if stats['errors']:
+            self.stdout.write(self.style.WARNING(f"⚠️  {stats['errors']} fichier(s) n'ont pas pu être traités"))
+        prefix = '🔍 [dry-run] ' if self.dry_run else '✅ '
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}{stats['bytes']} octets ({stats['bytes'] / (1024 * 1024):.2f} Mo) {action}"
+        ))
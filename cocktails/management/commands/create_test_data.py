@@ -45,11 +45,11 @@ class Command(BaseCommand):
                 'name': 'Sunset Paradise',
                 'description': 'Un cocktail tropical qui évoque les couchers de soleil sur une plage paradisiaque. Mélange parfait de fruits exotiques et de rhum.',
                 'ingredients': [
-                    {'nom': 'Rhum blanc', 'quantité': '5 cl'},
-                    {'nom': 'Jus de mangue', 'quantité': '8 cl'},
-                    {'nom': 'Jus de passion', 'quantité': '3 cl'},
-                    {'nom': 'Sirop de coco', 'quantité': '2 cl'},
-                    {'nom': 'Glace pilée', 'quantité': 'À volonté'}
+                    {'nom': 'Rhum blanc', 'quantite': '5 cl'},
+                    {'nom': 'Jus de mangue', 'quantite': '8 cl'},
+                    {'nom': 'Jus de passion', 'quantite': '3 cl'},
+                    {'nom': 'Sirop de coco', 'quantite': '2 cl'},
+                    {'nom': 'Glace pilée', 'quantite': 'À volonté'}
                 ],
                 'music_ambiance': 'Musique lounge tropical, artistes comme Thievery Corporation ou Boozoo Bajou',
                 'difficulty_level': 'easy',
@@ -61,12 +61,12 @@ class Command(BaseCommand):
                 'name': 'Mystic Garden',
                 'description': 'Un cocktail sans alcool aux saveurs herbacées et rafraîchissantes, parfait pour une pause détente en terrasse.',
                 'ingredients': [
-                    {'nom': 'Concombre', 'quantité': '4 rondelles'},
-                    {'nom': 'Menthe fraîche', 'quantité': '8 feuilles'},
-                    {'nom': 'Jus de citron vert', 'quantité': '3 cl'},
-                    {'nom': 'Sirop d\'agave', 'quantité': '2 cl'},
-                    {'nom': 'Eau gazeuse', 'quantité': '15 cl'},
-                    {'nom': 'Glaçons', 'quantité': 'À volonté'}
+                    {'nom': 'Concombre', 'quantite': '4 rondelles'},
+                    {'nom': 'Menthe fraîche', 'quantite': '8 feuilles'},
+                    {'nom': 'Jus de citron vert', 'quantite': '3 cl'},
+                    {'nom': 'Sirop d\'agave', 'quantite': '2 cl'},
+                    {'nom': 'Eau gazeuse', 'quantite': '15 cl'},
+                    {'nom': 'Glaçons', 'quantite': 'À volonté'}
                 ],
                 'music_ambiance': 'Acoustic chill, artistes comme Norah Jones ou Jack Johnson',
                 'difficulty_level': 'easy',
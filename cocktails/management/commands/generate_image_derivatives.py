@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from cocktails.models import CocktailRecipe
+from cocktails.services.image_derivatives import generate_derivatives
+
+
+class Command(BaseCommand):
+    help = "Génère les variantes d'images (thumb/card/full, WebP et JPEG) et l'aperçu flou (LQIP) des cocktails existants"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Régénérer aussi les cocktails qui ont déjà des variantes et un aperçu flou'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Nombre de cocktails lus par requête'
+        )
+
+    def handle(self, *args, **options):
+        queryset = CocktailRecipe.objects.exclude(image_url__isnull=True).exclude(image_url='')
+        if not options['all']:
+            queryset = queryset.filter(Q(image_variants={}) | Q(image_lqip=''))
+
+        processed = 0
+        failed = 0
+        rows = queryset.values_list('pk', 'image_url').iterator(chunk_size=options['chunk_size'])
+        for recipe_id, image_url in rows:
+            if generate_derivatives(recipe_id, image_url) is None:
+                failed += 1
+                self.stdout.write(self.style.WARNING(f"⚠️  Échec pour {image_url}"))
+            else:
+                processed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Variantes générées pour {processed} cocktail(s), {failed} échec(s)"
+        ))
@@ -0,0 +1,68 @@
+import sys
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from cocktails.services import importer
+
+
+class Command(BaseCommand):
+    help = "Importe en masse des recettes de cocktails depuis un fichier NDJSON ou CSV (ou l'entrée standard)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Fichier à importer ('-' pour l'entrée standard)")
+        parser.add_argument('--user', required=True, help='Utilisateur propriétaire des cocktails importés')
+        parser.add_argument(
+            '--format',
+            choices=importer.IMPORT_FORMATS,
+            help='Format du fichier (par défaut : déduit de l\'extension, NDJSON sinon)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=importer.BATCH_SIZE,
+            help='Nombre de lignes validées puis insérées par transaction'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Valider sans rien insérer'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"Utilisateur introuvable: {options['user']}")
+
+        path = options['path']
+        import_format = options['format'] or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+
+        def progress(report):
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"   📥 {report.rows} ligne(s), {report.created} cocktail(s) créé(s)")
+
+        stream = sys.stdin if path == '-' else open(path, encoding='utf-8-sig', newline='')
+        try:
+            report = importer.import_recipes(
+                user,
+                importer.read_rows(stream, import_format),
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+                on_batch=progress,
+            )
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for error in report.errors:
+            self.stdout.write(self.style.WARNING(f"   ⚠️ Ligne {error['line']}: {error['errors']}"))
+        if report.failed > len(report.errors):
+            self.stdout.write(self.style.WARNING(f"   ... {report.failed - len(report.errors)} autre(s) erreur(s)"))
+
+        verb = 'validé(s)' if options['dry_run'] else 'importé(s)'
+        count = report.rows - report.failed if options['dry_run'] else report.created
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {count} cocktail(s) {verb}, {report.failed} erreur(s) "
+            f"en {report.elapsed:.1f}s ({report.rows_per_second:.0f} lignes/s)"
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from cocktails.services import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule l'index plein texte des cocktails (tsvector PostgreSQL), "
+        "par exemple après une modification de la configuration de recherche"
+    )
+
+    def handle(self, *args, **options):
+        engine = search.backend()
+        if engine != 'postgresql':
+            # SQLite : recherche par parcours (cocktails_search_rank), aucun index à recalculer
+            self.stdout.write(self.style.WARNING(
+                "⚠️  Aucun index plein texte sur cette base, rien à recalculer"
+            ))
+            return
+
+        started = time.perf_counter()
+        count = search.rebuild_index()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Index {engine} recalculé pour {count} cocktail(s) en {elapsed:.1f}s"
+        ))
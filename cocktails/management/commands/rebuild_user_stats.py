@@ -0,0 +1,67 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from cocktails.services import user_stats
+
+
+class Command(BaseCommand):
+    help = "Reconstruit ou vérifie les statistiques matérialisées des cocktails par utilisateur"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Vérifier la cohérence sans rien modifier (code de sortie non nul si écart)'
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Avec --check : reconstruire uniquement les utilisateurs incohérents'
+        )
+        parser.add_argument(
+            '--user',
+            help="Nom d'utilisateur à traiter (tous par défaut)"
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Nombre d\'utilisateurs lus par requête'
+        )
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(username=options['user'])
+            if not users.exists():
+                raise CommandError(f"Utilisateur introuvable: {options['user']}")
+
+        user_ids = users.values_list('pk', flat=True).iterator(chunk_size=options['chunk_size'])
+
+        if not options['check']:
+            count = 0
+            for user_id in user_ids:
+                user_stats.rebuild(user_id)
+                count += 1
+            self.stdout.write(self.style.SUCCESS(f"✅ Statistiques reconstruites pour {count} utilisateur(s)"))
+            return
+
+        checked = 0
+        inconsistent = 0
+        for user_id in user_ids:
+            checked += 1
+            differences = user_stats.check(user_id)
+            if not differences:
+                continue
+            inconsistent += 1
+            self.stdout.write(self.style.WARNING(f"⚠️  Utilisateur {user_id}: {differences}"))
+            if options['fix']:
+                user_stats.rebuild(user_id)
+
+        if inconsistent and not options['fix']:
+            raise CommandError(f"❌ {inconsistent} utilisateur(s) incohérent(s) sur {checked}")
+
+        suffix = ' (corrigés)' if inconsistent else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {checked} utilisateur(s) vérifié(s), {inconsistent} incohérent(s){suffix}"
+        ))
@@ -0,0 +1,46 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from cocktails.services import media_storage
+from cocktails.services.image_store import IMAGES_DIR, STAGING_DIR
+
+
+class Command(BaseCommand):
+    help = "Envoie les images locales (originaux, variantes, placeholders) vers le stockage media distant"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Nombre de fichiers envoyés par lot'
+        )
+
+    def handle(self, *args, **options):
+        if not media_storage.is_remote():
+            self.stdout.write(self.style.WARNING(
+                "⚠️  Le stockage media est le MEDIA_ROOT local (MEDIA_STORAGE_BACKEND=local) : rien à envoyer"
+            ))
+            return
+
+        media_root = Path(settings.MEDIA_ROOT)
+        batch = []
+        scanned = 0
+        uploaded = 0
+
+        for path in (media_root / IMAGES_DIR).rglob('*'):
+            if not path.is_file() or path.name.startswith('.') or STAGING_DIR in path.parts:
+                continue
+            batch.append(path.relative_to(media_root).as_posix())
+            scanned += 1
+            if len(batch) >= options['batch_size']:
+                uploaded += len(media_storage.upload(batch))
+                batch = []
+
+        uploaded += len(media_storage.upload(batch))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {uploaded} fichier(s) envoyé(s) sur {scanned} analysé(s)"
+        ))
@@ -0,0 +1,133 @@
+"""
+Service des images de cocktails
+Django vérifie l'accès une seule fois puis délègue le transfert des octets à nginx (X-Accel-Redirect)
+"""
+
+import mimetypes
+import posixpath
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, HttpResponseRedirect
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_safe
+
+from .models import CocktailRecipe
+from .services import media_storage
+from .services.image_derivatives import DERIVATIVES_DIR, source_candidates
+from .services.image_store import IMAGES_DIR, PLACEHOLDER_IMAGES, image_store
+
+# Les URLs adressées par contenu ne changent jamais de contenu
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+MUTABLE_MAX_AGE = 3600
+
+
+def _source_paths(path: str):
+    """Images originales dont dépend le fichier (lui-même, ou la source d'une variante)"""
+    if path.startswith(f"{DERIVATIVES_DIR}/"):
+        return source_candidates(path)
+    return [path]
+
+
+def _is_placeholder(path: str) -> bool:
+    return any(Path(source).name in PLACEHOLDER_IMAGES for source in _source_paths(path))
+
+
+def _is_content_addressed(path: str) -> bool:
+    return any(image_store.is_stored_path(source) for source in _source_paths(path))
+
+
+def _is_public(path: str) -> bool:
+    return getattr(settings, 'MEDIA_ACCESS_POLICY', 'owner') == 'public' or _is_placeholder(path)
+
+
+def _can_access(user, path: str) -> bool:
+    """Applique MEDIA_ACCESS_POLICY (public, authenticated, owner)"""
+    if _is_public(path):
+        return True
+    if not user.is_authenticated:
+        return False
+    if getattr(settings, 'MEDIA_ACCESS_POLICY', 'owner') == 'authenticated' or user.is_staff:
+        return True
+    return CocktailRecipe.objects.filter(user=user, image_url__in=_source_paths(path)).exists()
+
+
+def _etag(path: str, local_file: Path):
+    """ETag fort dérivé du nom (donc de l'empreinte) pour les fichiers adressés par contenu"""
+    if _is_content_addressed(path):
+        return f'"{Path(path).name}"'
+    try:
+        stat = local_file.stat()
+    except FileNotFoundError:
+        return None
+    return f'W/"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def _cache_headers(response, path: str, etag):
+    public = _is_public(path)
+    visibility = 'public' if public else 'private'
+    if _is_content_addressed(path):
+        response['Cache-Control'] = f"{visibility}, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        response['Cache-Control'] = f"{visibility}, max-age={MUTABLE_MAX_AGE}"
+    if not public:
+        # La réponse dépend de la session
+        response['Vary'] = 'Cookie'
+    if etag:
+        response['ETag'] = etag
+    return response
+
+
+def _signed_redirect(path: str):
+    """Redirection vers une URL de courte durée : la politique d'accès vaut aussi hors de Django"""
+    expire = getattr(settings, 'MEDIA_SIGNED_URL_EXPIRE', 300)
+    url = media_storage.signed_url(path, expire)
+    if url is None:
+        return None
+    response = HttpResponseRedirect(url)
+    # Réutilisable par le navigateur, pas au-delà de la signature, jamais par un cache partagé
+    response['Cache-Control'] = f"private, max-age={expire // 2}"
+    response['Vary'] = 'Cookie'
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    """Sert une image de cocktail après vérification des droits"""
+    path = posixpath.normpath(path).lstrip('/')
+    if not path.startswith(f"{IMAGES_DIR}/") or '..' in path.split('/'):
+        raise Http404("Fichier introuvable")
+
+    # Même réponse qu'un fichier absent : ne pas révéler l'existence des images des autres
+    if not _can_access(request.user, path):
+        raise Http404("Fichier introuvable")
+
+    local_file = Path(settings.MEDIA_ROOT) / path
+    etag = _etag(path, local_file)
+
+    if etag and etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return _cache_headers(HttpResponseNotModified(), path, etag)
+
+    if not local_file.is_file():
+        # Stockage distant : le fichier n'est pas sur ce nœud
+        if not (media_storage.is_remote() and media_storage.exists(path)):
+            raise Http404("Fichier introuvable")
+        if _is_public(path):
+            return HttpResponseRedirect(media_storage.url(path))
+        redirect = _signed_redirect(path)
+        if redirect is not None:
+            return redirect
+        # Stockage sans URL signée : le fichier est rapatrié et servi après la même vérification
+        if not media_storage.ensure_local(path):
+            raise Http404("Fichier introuvable")
+
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if getattr(settings, 'MEDIA_ACCEL_REDIRECT', False):
+        # nginx lit le fichier depuis son emplacement interne ; aucun octet ne passe par Django
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = f"{settings.MEDIA_ACCEL_REDIRECT_PREFIX}{quote(path)}"
+    else:
+        response = FileResponse(local_file.open('rb'), content_type=content_type)
+
+    return _cache_headers(response, path, etag)
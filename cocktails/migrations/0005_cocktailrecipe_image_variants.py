@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cocktails', '0004_generationrequest_generate_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cocktailrecipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, help_text="Variantes redimensionnées de l'image (thumb/card/full en WebP et JPEG)"),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cocktails', '0005_cocktailrecipe_image_variants'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageCreditUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(help_text='Jour de consommation')),
+                ('credits', models.DecimalField(decimal_places=2, default=0, help_text='Crédits Stability AI consommés', max_digits=10)),
+                ('images', models.PositiveIntegerField(default=0, help_text="Nombre d'images générées")),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(blank=True, help_text="Utilisateur à l'origine des générations (vide pour les appels système)", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='image_credit_usage', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Consommation de crédits image',
+                'verbose_name_plural': 'Consommations de crédits image',
+                'ordering': ['-day'],
+                'unique_together': {('user', 'day')},
+            },
+        ),
+    ]
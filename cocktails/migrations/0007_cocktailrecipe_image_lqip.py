@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cocktails', '0006_imagecreditusage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cocktailrecipe',
+            name='image_lqip',
+            field=models.TextField(blank=True, default='', help_text="Aperçu flou de l'image (WebP minuscule en data URI) affiché pendant le chargement"),
+        ),
+    ]
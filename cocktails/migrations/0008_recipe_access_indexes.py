@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cocktails', '0007_cocktailrecipe_image_lqip'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cocktailrecipe',
+            index=models.Index(fields=['user', '-created_at'], name='cocktail_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cocktailrecipe',
+            index=models.Index(fields=['user', 'is_favorite', '-created_at'], name='cocktail_user_fav_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cocktailrecipe',
+            index=models.Index(fields=['user', 'alcohol_content', '-created_at'], name='cocktail_user_alcohol_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cocktailrecipe',
+            index=models.Index(fields=['user', 'difficulty_level', '-created_at'], name='cocktail_user_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cocktailrecipe',
+            index=models.Index(fields=['user', 'name'], name='cocktail_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='generationrequest',
+            index=models.Index(fields=['user', '-created_at'], name='genreq_user_created_idx'),
+        ),
+    ]
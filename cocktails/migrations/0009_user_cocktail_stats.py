@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('cocktails', '0008_recipe_access_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCocktailStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cocktail_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total', models.IntegerField(default=0)),
+                ('favorites', models.IntegerField(default=0)),
+                ('alcohol_none', models.IntegerField(default=0)),
+                ('alcohol_low', models.IntegerField(default=0)),
+                ('alcohol_medium', models.IntegerField(default=0)),
+                ('alcohol_high', models.IntegerField(default=0)),
+                ('difficulty_easy', models.IntegerField(default=0)),
+                ('difficulty_medium', models.IntegerField(default=0)),
+                ('difficulty_hard', models.IntegerField(default=0)),
+                ('rated', models.IntegerField(default=0, help_text='Nombre de cocktails notés')),
+                ('rating_sum', models.IntegerField(default=0, help_text='Somme des notes')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Statistiques utilisateur',
+                'verbose_name_plural': 'Statistiques utilisateurs',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserCocktailDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('created', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cocktail_daily_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Statistiques journalières',
+                'verbose_name_plural': 'Statistiques journalières',
+                'ordering': ['-day'],
+                'unique_together': {('user', 'day')},
+            },
+        ),
+    ]
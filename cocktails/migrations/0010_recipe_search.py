@@ -0,0 +1,93 @@
+# Recherche plein texte des cocktails
+# PostgreSQL : colonne tsvector (configuration française sans accents) + index GIN, maintenue par trigger
+# SQLite (développement) : pas d'index, cocktails.services.search compare les cocktails un à un
+# La colonne d'index n'est pas déclarée dans le modèle : seul cocktails.services.search la lit
+
+from django.db import migrations
+
+
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    DO $$
+    BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'french_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION french_unaccent (COPY = french);
+            ALTER TEXT SEARCH CONFIGURATION french_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, french_stem;
+        END IF;
+    END
+    $$
+    """,
+    "ALTER TABLE cocktails_cocktailrecipe ADD COLUMN search_vector tsvector",
+    """
+    CREATE FUNCTION cocktails_recipe_search_vector() RETURNS trigger AS $$
+    BEGIN
+        -- Recalcul uniquement si un champ indexé change (ou si le vecteur a été vidé pour reconstruction)
+        IF TG_OP = 'UPDATE'
+            AND NEW.search_vector IS NOT NULL
+            AND NEW.name IS NOT DISTINCT FROM OLD.name
+            AND NEW.description IS NOT DISTINCT FROM OLD.description
+            AND NEW.ingredients IS NOT DISTINCT FROM OLD.ingredients
+            AND NEW.generation_request_id IS NOT DISTINCT FROM OLD.generation_request_id THEN
+            RETURN NEW;
+        END IF;
+
+        NEW.search_vector :=
+            setweight(to_tsvector('french_unaccent', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('french_unaccent', coalesce(NEW.description, '')), 'B') ||
+            setweight(to_tsvector('french_unaccent', coalesce((
+                SELECT string_agg(coalesce(item ->> 'nom', item ->> 'name', item #>> '{}'), ' ')
+                FROM jsonb_array_elements(
+                    CASE WHEN jsonb_typeof(NEW.ingredients) = 'array' THEN NEW.ingredients ELSE '[]'::jsonb END
+                ) AS item
+            ), '')), 'C') ||
+            setweight(to_tsvector('french_unaccent', coalesce((
+                SELECT user_prompt FROM cocktails_generationrequest WHERE id = NEW.generation_request_id
+            ), '')), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER cocktails_recipe_search_vector_trigger
+        BEFORE INSERT OR UPDATE ON cocktails_cocktailrecipe
+        FOR EACH ROW EXECUTE FUNCTION cocktails_recipe_search_vector()
+    """,
+    # Remplissage des cocktails existants par le trigger
+    "UPDATE cocktails_cocktailrecipe SET search_vector = NULL",
+    "CREATE INDEX cocktail_search_vector_idx ON cocktails_cocktailrecipe USING GIN (search_vector)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP TRIGGER IF EXISTS cocktails_recipe_search_vector_trigger ON cocktails_cocktailrecipe",
+    "DROP FUNCTION IF EXISTS cocktails_recipe_search_vector()",
+    "ALTER TABLE cocktails_cocktailrecipe DROP COLUMN IF EXISTS search_vector",
+    "DROP TEXT SEARCH CONFIGURATION IF EXISTS french_unaccent",
+]
+
+
+def _run(schema_editor, statements):
+    for statement in statements:
+        schema_editor.execute(statement, params=None)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cocktails', '0009_user_cocktail_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.4 on 2026-10-19 08:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cocktails', '0010_recipe_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ingredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Nom affiché (première graphie rencontrée)', max_length=100)),
+                ('canonical_name', models.CharField(help_text='Nom normalisé : minuscules, sans accents, au singulier, synonymes résolus', max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Ingrédient',
+                'verbose_name_plural': 'Ingrédients',
+                'ordering': ['canonical_name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CocktailIngredient',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('name', models.CharField(help_text="Nom tel qu'écrit dans la recette", max_length=200)),
+                ('quantity', models.CharField(blank=True, help_text="Quantité telle qu'écrite dans la recette", max_length=100)),
+                ('amount', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('unit', models.CharField(blank=True, max_length=20)),
+                ('volume_ml', models.FloatField(blank=True, help_text="Volume en millilitres si l'unité le permet", null=True)),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ingredient_lines', to='cocktails.cocktailrecipe')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cocktail_ingredients', to=settings.AUTH_USER_MODEL)),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='recipe_lines', to='cocktails.ingredient')),
+            ],
+            options={
+                'verbose_name': 'Ingrédient de cocktail',
+                'verbose_name_plural': 'Ingrédients de cocktails',
+                'ordering': ['recipe', 'position'],
+            },
+        ),
+        migrations.AddField(
+            model_name='cocktailrecipe',
+            name='catalogue_ingredients',
+            field=models.ManyToManyField(blank=True, related_name='recipes', through='cocktails.CocktailIngredient', to='cocktails.ingredient'),
+        ),
+        migrations.AddIndex(
+            model_name='cocktailingredient',
+            index=models.Index(fields=['user', 'ingredient', 'recipe'], name='cocktailingr_user_ingr_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cocktailingredient',
+            constraint=models.UniqueConstraint(fields=('recipe', 'position'), name='cocktailingredient_recipe_position_uniq'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.4 on 2026-10-19 08:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cocktails', '0011_ingredient_catalogue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='cocktailrecipe',
+            name='cocktail_user_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cocktailrecipe',
+            name='cocktail_user_fav_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cocktailrecipe',
+            name='cocktail_user_alcohol_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cocktailrecipe',
+            name='cocktail_user_difficulty_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='cocktailrecipe',
+            name='cocktail_user_name_idx',
+        ),
+        migrations.AddIndex(
+            model_name='cocktailrecipe',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='cocktail_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cocktailrecipe',
+            index=models.Index(fields=['user', 'is_favorite', '-created_at', '-id'], name='cocktail_user_fav_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cocktailrecipe',
+            index=models.Index(fields=['user', 'alcohol_content', '-created_at', '-id'], name='cocktail_user_alcohol_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cocktailrecipe',
+            index=models.Index(fields=['user', 'difficulty_level', '-created_at', '-id'], name='cocktail_user_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cocktailrecipe',
+            index=models.Index(fields=['user', 'name', 'id'], name='cocktail_user_name_idx'),
+        ),
+    ]
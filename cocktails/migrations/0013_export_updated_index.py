@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 08:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cocktails', '0012_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cocktailrecipe',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='cocktail_user_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.4 on 2026-10-19 08:30
+# Colonnes dénormalisées ingredients_count / cost_tier, remplies en une instruction UPDATE
+# (longueur du tableau JSON calculée par la base) avant la création des index
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+JSON_LENGTH = {
+    'sqlite': "json_array_length(ingredients)",
+    'postgresql': "CASE WHEN jsonb_typeof(ingredients) = 'array' THEN jsonb_array_length(ingredients) ELSE 0 END",
+}
+
+BATCH_SIZE = 2000
+
+
+def _cost_tier(count):
+    # Paliers figés à la date de la migration (même découpage que la branche SQL)
+    if count <= 3:
+        return 1
+    if count <= 5:
+        return 2
+    return 3
+
+
+def backfill(apps, schema_editor):
+    length = JSON_LENGTH.get(schema_editor.connection.vendor)
+    if length:
+        schema_editor.execute(f"""
+            UPDATE cocktails_cocktailrecipe
+            SET ingredients_count = COALESCE({length}, 0),
+                cost_tier = CASE
+                    WHEN COALESCE({length}, 0) <= 3 THEN 1
+                    WHEN COALESCE({length}, 0) <= 5 THEN 2
+                    ELSE 3
+                END
+        """)
+        return
+
+    # Autres bases : calcul en Python, par lots
+    CocktailRecipe = apps.get_model('cocktails', 'CocktailRecipe')
+    queryset = CocktailRecipe.objects.only('pk', 'ingredients').order_by('pk')
+    last_pk = None
+    while True:
+        batch = list((queryset if last_pk is None else queryset.filter(pk__gt=last_pk))[:BATCH_SIZE])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+        for recipe in batch:
+            recipe.ingredients_count = len(recipe.ingredients) if isinstance(recipe.ingredients, list) else 0
+            recipe.cost_tier = _cost_tier(recipe.ingredients_count)
+        CocktailRecipe.objects.bulk_update(batch, ['ingredients_count', 'cost_tier'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cocktails', '0013_export_updated_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cocktailrecipe',
+            name='cost_tier',
+            field=models.PositiveSmallIntegerField(choices=[(1, '€'), (2, '€€'), (3, '€€€')], default=1, editable=False, help_text="Coût estimé d'après le nombre d'ingrédients"),
+        ),
+        migrations.AddField(
+            model_name='cocktailrecipe',
+            name='ingredients_count',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, help_text="Nombre d'ingrédients"),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='cocktailrecipe',
+            index=models.Index(fields=['user', 'ingredients_count', 'id'], name='cocktail_user_ingr_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cocktailrecipe',
+            index=models.Index(fields=['user', 'cost_tier', '-created_at', '-id'], name='cocktail_user_cost_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-19 08:46
+# unique_together (user, day) laissait passer plusieurs lignes système (user NULL) par jour :
+# fusion des doublons existants puis contrainte conditionnelle sur day quand user est NULL
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def merge_system_rows(apps, schema_editor):
+    ImageCreditUsage = apps.get_model('cocktails', 'ImageCreditUsage')
+    system = ImageCreditUsage.objects.filter(user__isnull=True)
+    duplicated = system.values('day').annotate(rows=Count('pk')).filter(rows__gt=1).values_list('day', flat=True)
+    for day in list(duplicated):
+        rows = system.filter(day=day).order_by('pk')
+        totals = rows.aggregate(credits=Sum('credits'), images=Sum('images'))
+        kept = rows.first()
+        rows.exclude(pk=kept.pk).delete()
+        kept.credits = totals['credits']
+        kept.images = totals['images']
+        kept.save(update_fields=['credits', 'images'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cocktails', '0014_ingredients_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_system_rows, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='imagecreditusage',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='imagecreditusage',
+            constraint=models.UniqueConstraint(fields=('user', 'day'), name='imagecreditusage_user_day_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='imagecreditusage',
+            constraint=models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('day',), name='imagecreditusage_system_day_uniq'),
+        ),
+    ]
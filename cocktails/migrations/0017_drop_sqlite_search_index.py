@@ -0,0 +1,30 @@
+# Suppression de la table FTS5 et de ses triggers (SQLite, bases créées par une version antérieure de 0010)
+# La recherche SQLite compare les cocktails un à un (cocktails_search_rank) : l'index n'était plus lu
+
+from django.db import migrations
+
+
+SQLITE_FORWARD = [
+    "DROP TRIGGER IF EXISTS cocktails_recipe_fts_insert",
+    "DROP TRIGGER IF EXISTS cocktails_recipe_fts_update",
+    "DROP TRIGGER IF EXISTS cocktails_recipe_fts_delete",
+    "DROP TABLE IF EXISTS cocktails_recipe_fts",
+]
+
+
+def drop_sqlite_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in SQLITE_FORWARD:
+        schema_editor.execute(statement, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cocktails', '0016_image_credit_usage_constraints'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_sqlite_search_index, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.urls import reverse
 import uuid
@@ -36,6 +36,9 @@ class GenerationRequest(models.Model):
         ordering = ['-created_at']
         verbose_name = "Demande de génération"
         verbose_name_plural = "Demandes de génération"
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='genreq_user_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.user_prompt[:50]}..."
@@ -60,6 +63,23 @@ class CocktailRecipe(models.Model):
     ingredients = models.JSONField(
         help_text="Liste des ingrédients avec quantités"
     )
+    # Copies dénormalisées du JSON, recalculées à chaque sauvegarde : les listes filtrent et trient
+    # dessus sans charger ni décoder les ingrédients
+    ingredients_count = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        help_text="Nombre d'ingrédients"
+    )
+    cost_tier = models.PositiveSmallIntegerField(
+        choices=[
+            (1, '€'),
+            (2, '€€'),
+            (3, '€€€'),
+        ],
+        default=1,
+        editable=False,
+        help_text="Coût estimé d'après le nombre d'ingrédients"
+    )
     
     # Informations supplémentaires
     music_ambiance = models.TextField(
@@ -76,6 +96,16 @@ class CocktailRecipe(models.Model):
         null=True,
         help_text="Chemin vers l'image générée du cocktail"
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text="Variantes redimensionnées de l'image (thumb/card/full en WebP et JPEG)"
+    )
+    image_lqip = models.TextField(
+        blank=True,
+        default='',
+        help_text="Aperçu flou de l'image (WebP minuscule en data URI) affiché pendant le chargement"
+    )
     
     # Métadonnées
     difficulty_level = models.CharField(
@@ -113,6 +143,14 @@ class CocktailRecipe(models.Model):
         help_text="Note de 1 à 5 étoiles"
     )
     
+    # Catalogue normalisé des ingrédients (alimenté depuis le JSON à chaque sauvegarde)
+    catalogue_ingredients = models.ManyToManyField(
+        'Ingredient',
+        through='CocktailIngredient',
+        related_name='recipes',
+        blank=True
+    )
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -121,10 +159,67 @@ class CocktailRecipe(models.Model):
         ordering = ['-created_at']
         verbose_name = "Recette de cocktail"
         verbose_name_plural = "Recettes de cocktails"
+        # Toutes les listes filtrent par utilisateur puis trient par date (ou par nom) :
+        # l'index fournit directement l'ordre, sans tri de la table. id termine chaque index
+        # pour la pagination par clé ((created_at, id) et (name, id), voir services/pagination.py)
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='cocktail_user_created_idx'),
+            models.Index(fields=['user', 'is_favorite', '-created_at', '-id'], name='cocktail_user_fav_idx'),
+            models.Index(fields=['user', 'alcohol_content', '-created_at', '-id'], name='cocktail_user_alcohol_idx'),
+            models.Index(fields=['user', 'difficulty_level', '-created_at', '-id'], name='cocktail_user_difficulty_idx'),
+            models.Index(fields=['user', 'name', 'id'], name='cocktail_user_name_idx'),
+            # Export incrémental : cocktails modifiés depuis une date, dans l'ordre (updated_at, id)
+            models.Index(fields=['user', 'updated_at', 'id'], name='cocktail_user_updated_idx'),
+            # Filtres et tris sur les colonnes dénormalisées des ingrédients
+            models.Index(fields=['user', 'ingredients_count', 'id'], name='cocktail_user_ingr_count_idx'),
+            models.Index(fields=['user', 'cost_tier', '-created_at', '-id'], name='cocktail_user_cost_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} - {self.user.username}"
     
+    # Champs dont les valeurs chargées sont mémorisées pour mettre à jour les statistiques
+    STATS_TRACKED_FIELDS = ('user_id', 'is_favorite', 'alcohol_content', 'difficulty_level', 'rating', 'created_at')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            name: value
+            for name, value in zip(field_names, values)
+            if name in cls.STATS_TRACKED_FIELDS and value is not models.DEFERRED
+        }
+        if 'ingredients' in field_names:
+            # Empreinte (et non la liste elle-même) : une modification en place reste détectée
+            from .services.ingredients import fingerprint
+            instance._loaded_values['ingredients'] = fingerprint(instance.ingredients)
+        if 'image_url' in field_names:
+            # Génération des variantes planifiée seulement si l'image change ou si elles sont effacées
+            instance._loaded_values['image_url'] = instance.image_url
+            if 'image_variants' in field_names and 'image_lqip' in field_names:
+                instance._loaded_values['derivatives'] = bool(instance.image_variants and instance.image_lqip)
+        from .services.similarity import SHOWN_FIELDS, shown_fingerprint
+        if set(SHOWN_FIELDS) <= set(field_names):
+            # Version du corpus des cocktails similaires changée seulement si ces champs changent
+            instance._loaded_values['shown'] = shown_fingerprint(instance)
+        return instance
+    
+    def save(self, *args, **kwargs):
+        self.refresh_ingredients_summary()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'ingredients' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'ingredients_count', 'cost_tier'}
+        # Les statistiques utilisateur (signal post_save) sont mises à jour dans la même transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def refresh_ingredients_summary(self):
+        """Recalcule les colonnes dénormalisées (à appeler avant bulk_create / bulk_update)"""
+        if 'ingredients' in self.get_deferred_fields():
+            return
+        self.ingredients_count = len(self.ingredients_list)
+        self.cost_tier = cost_tier_for(self.ingredients_count)
+    
     def get_absolute_url(self):
         return reverse('cocktails:detail', kwargs={'pk': self.pk})
     
@@ -138,13 +233,67 @@ class CocktailRecipe(models.Model):
     @property
     def estimated_cost(self):
         """Estimation du coût basé sur le nombre d'ingrédients"""
-        ingredient_count = len(self.ingredients_list)
-        if ingredient_count <= 3:
-            return "€"
-        elif ingredient_count <= 5:
-            return "€€"
-        else:
-            return "€€€"
+        return self.get_cost_tier_display()
+
+
+def cost_tier_for(ingredients_count):
+    """Palier de coût : jusqu'à 3 ingrédients €, jusqu'à 5 €€, au-delà €€€"""
+    if ingredients_count <= 3:
+        return 1
+    elif ingredients_count <= 5:
+        return 2
+    return 3
+
+
+class Ingredient(models.Model):
+    """Catalogue des ingrédients, identifiés par leur nom canonique"""
+    name = models.CharField(max_length=100, help_text="Nom affiché (première graphie rencontrée)")
+    canonical_name = models.CharField(
+        max_length=100,
+        unique=True,
+        help_text="Nom normalisé : minuscules, sans accents, au singulier, synonymes résolus"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['canonical_name']
+        verbose_name = "Ingrédient"
+        verbose_name_plural = "Ingrédients"
+    
+    def __str__(self):
+        return self.name
+
+
+class CocktailIngredient(models.Model):
+    """Ligne d'ingrédient d'un cocktail : lien vers le catalogue et quantité analysée"""
+    recipe = models.ForeignKey(CocktailRecipe, on_delete=models.CASCADE, related_name='ingredient_lines')
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.PROTECT, related_name='recipe_lines')
+    # Copie du propriétaire du cocktail : les filtres par ingrédient restent dans l'index
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cocktail_ingredients')
+    position = models.PositiveSmallIntegerField(default=0)
+    
+    # Texte d'origine et quantité analysée
+    name = models.CharField(max_length=200, help_text="Nom tel qu'écrit dans la recette")
+    quantity = models.CharField(max_length=100, blank=True, help_text="Quantité telle qu'écrite dans la recette")
+    amount = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
+    unit = models.CharField(max_length=20, blank=True)
+    volume_ml = models.FloatField(null=True, blank=True, help_text="Volume en millilitres si l'unité le permet")
+    
+    class Meta:
+        ordering = ['recipe', 'position']
+        verbose_name = "Ingrédient de cocktail"
+        verbose_name_plural = "Ingrédients de cocktails"
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'position'], name='cocktailingredient_recipe_position_uniq'),
+        ]
+        indexes = [
+            # "Cocktails de l'utilisateur contenant X" : parcours de l'index seul
+            models.Index(fields=['user', 'ingredient', 'recipe'], name='cocktailingr_user_ingr_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.recipe.name}: {self.quantity} {self.name}".strip()
+
 
 class CocktailTag(models.Model):
     """Tags pour catégoriser les cocktails"""
@@ -165,3 +314,100 @@ class CocktailRecipeTag(models.Model):
     
     class Meta:
         unique_together = ['cocktail', 'tag']
+
+
+class ImageCreditUsage(models.Model):
+    """Registre des crédits Stability AI consommés par jour et par utilisateur"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='image_credit_usage',
+        help_text="Utilisateur à l'origine des générations (vide pour les appels système)"
+    )
+    day = models.DateField(help_text="Jour de consommation")
+    credits = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        default=0,
+        help_text="Crédits Stability AI consommés"
+    )
+    images = models.PositiveIntegerField(default=0, help_text="Nombre d'images générées")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day'], name='imagecreditusage_user_day_uniq'),
+            # NULL n'entre jamais en conflit dans une contrainte d'unicité : une seule ligne système par jour
+            models.UniqueConstraint(
+                fields=['day'], condition=models.Q(user__isnull=True), name='imagecreditusage_system_day_uniq'
+            ),
+        ]
+        verbose_name = "Consommation de crédits image"
+        verbose_name_plural = "Consommations de crédits image"
+    
+    def __str__(self):
+        username = self.user.username if self.user else 'système'
+        return f"{self.day} - {username}: {self.credits} crédits"
+
+
+class UserCocktailStats(models.Model):
+    """Statistiques matérialisées des cocktails d'un utilisateur (mises à jour à chaque écriture)"""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='cocktail_stats'
+    )
+    total = models.IntegerField(default=0)
+    favorites = models.IntegerField(default=0)
+    
+    # Répartition par teneur en alcool
+    alcohol_none = models.IntegerField(default=0)
+    alcohol_low = models.IntegerField(default=0)
+    alcohol_medium = models.IntegerField(default=0)
+    alcohol_high = models.IntegerField(default=0)
+    
+    # Répartition par difficulté
+    difficulty_easy = models.IntegerField(default=0)
+    difficulty_medium = models.IntegerField(default=0)
+    difficulty_hard = models.IntegerField(default=0)
+    
+    # Notes
+    rated = models.IntegerField(default=0, help_text="Nombre de cocktails notés")
+    rating_sum = models.IntegerField(default=0, help_text="Somme des notes")
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "Statistiques utilisateur"
+        verbose_name_plural = "Statistiques utilisateurs"
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.total} cocktails"
+    
+    @property
+    def alcoholic(self):
+        return self.total - self.alcohol_none
+    
+    @property
+    def average_rating(self):
+        return round(self.rating_sum / self.rated, 2) if self.rated else None
+
+
+class UserCocktailDailyStats(models.Model):
+    """Nombre de cocktails créés par jour et par utilisateur (cumuls des 7/30 derniers jours)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='cocktail_daily_stats')
+    day = models.DateField()
+    created = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-day']
+        unique_together = ['user', 'day']
+        verbose_name = "Statistiques journalières"
+        verbose_name_plural = "Statistiques journalières"
+    
+    def __str__(self):
+        return f"{self.day} - {self.user.username}: {self.created}"
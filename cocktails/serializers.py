@@ -5,6 +5,9 @@ Serializers pour l'API REST des cocktails
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from .models import CocktailRecipe, GenerationRequest
+from .services.bulk import MAX_IDS
+from .services.ingredients import NAME_KEYS
+from .services.image_derivatives import get_image_srcset, media_url
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -25,14 +28,105 @@ class GenerationRequestSerializer(serializers.ModelSerializer):
         model = GenerationRequest
         fields = ['id', 'user', 'user_prompt', 'context', 'created_at']
         read_only_fields = ['id', 'user', 'created_at']
+    
+    @staticmethod
+    def setup_queryset(queryset):
+        """Charge l'utilisateur imbriqué dans la même requête (pas de N+1)"""
+        return queryset.select_related('user')
+
+
+def fieldset_params(request) -> dict:
+    """Paramètres ?fields=id,name&expand=user de la requête, à passer à setup_queryset() et au serializer"""
+    def names(key):
+        value = request.query_params.get(key)
+        if value is None:
+            return None
+        return [name.strip() for name in value.split(',') if name.strip()]
+    
+    return {'fields': names('fields'), 'expand': names('expand') or []}
+
+
+class SparseFieldsetMixin:
+    """
+    Champs renvoyés à la demande (?fields=) et relations imbriquées optionnelles (?expand=)
+    Les colonnes lues et les jointures suivent les champs demandés (only() + select_related)
+    """
+    
+    # Champ calculé -> colonnes du modèle qu'il lit (par défaut : la colonne du même nom)
+    SOURCES = {
+        'estimated_cost': ('cost_tier',),
+        'image_src': ('image_url',),
+        'image_srcset': ('image_variants',),
+    }
+    # Relation imbriquée -> chemin select_related
+    RELATIONS = {
+        'user': 'user',
+        'generation_request': 'generation_request__user',
+    }
+    # Relations absentes par défaut, ajoutées par ?expand=
+    EXPANDABLE = {}
+    # Toujours chargées : clés de tri et des curseurs de pagination
+    ALWAYS_LOADED = ('id', 'created_at', 'name', 'updated_at', 'ingredients_count', 'cost_tier')
+    
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in expand:
+            self.fields[name] = self.EXPANDABLE[name]()
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+    
+    @classmethod
+    def check_fieldset(cls, fields=None, expand=()):
+        """Champs disponibles après expansion ; ValidationError (400) pour un nom inconnu"""
+        unknown = [name for name in expand if name not in cls.EXPANDABLE]
+        if unknown:
+            raise serializers.ValidationError({'expand': f"Relation(s) inconnue(s): {', '.join(unknown)}"})
+        available = list(cls.Meta.fields) + list(expand)
+        unknown = [name for name in fields or () if name not in available]
+        if unknown:
+            raise serializers.ValidationError({'fields': f"Champ(s) inconnu(s): {', '.join(unknown)}"})
+        return [name for name in available if fields is None or name in fields]
+    
+    @classmethod
+    def setup_queryset(cls, queryset, fields=None, expand=()):
+        """Projection sur les colonnes des champs demandés, jointures pour les seules relations renvoyées"""
+        columns = set(cls.ALWAYS_LOADED)
+        related = []
+        for name in cls.check_fieldset(fields, expand):
+            if name in cls.RELATIONS:
+                columns.add(name)
+                related.append(cls.RELATIONS[name])
+            else:
+                columns.update(cls.SOURCES.get(name, (name,)))
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset.only(*columns)
 
 
-class CocktailRecipeSerializer(serializers.ModelSerializer):
+class ImageFieldsMixin(serializers.Serializer):
+    """URL de l'image et srcset de ses variantes (colonnes lues : voir SparseFieldsetMixin.SOURCES)"""
+    
+    image_src = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    
+    def get_image_src(self, obj):
+        """Retourne l'URL de l'image originale, construite par le stockage media"""
+        return media_url(obj.image_url) if obj.image_url else ''
+    
+    def get_image_srcset(self, obj):
+        """Retourne les srcset WebP et JPEG des variantes de l'image"""
+        return {
+            'webp': get_image_srcset(obj, 'webp'),
+            'jpeg': get_image_srcset(obj, 'jpeg'),
+        }
+
+
+class CocktailRecipeSerializer(SparseFieldsetMixin, ImageFieldsMixin, serializers.ModelSerializer):
     """Serializer pour les recettes de cocktails"""
     
     user = UserSerializer(read_only=True)
     generation_request = GenerationRequestSerializer(read_only=True)
-    ingredients_count = serializers.SerializerMethodField()
     estimated_cost = serializers.ReadOnlyField()
     
     class Meta:
@@ -40,21 +134,16 @@ class CocktailRecipeSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'user', 'generation_request', 'name', 'description',
             'ingredients', 'ingredients_count', 'music_ambiance', 
-            'image_prompt', 'image_url', 'difficulty_level', 
-            'alcohol_content', 'preparation_time', 'is_favorite', 
-            'rating', 'estimated_cost', 'created_at', 'updated_at'
+            'image_prompt', 'image_url', 'image_src', 'image_variants', 'image_srcset', 'image_lqip',
+            'difficulty_level', 'alcohol_content', 'preparation_time',
+            'is_favorite', 'rating', 'cost_tier', 'estimated_cost', 'created_at', 'updated_at'
         ]
+        # image_url est fixé par le serveur (génération) : il ouvre l'accès au fichier (MEDIA_ACCESS_POLICY=owner)
         read_only_fields = [
-            'id', 'user', 'generation_request', 'estimated_cost', 
+            'id', 'user', 'generation_request', 'image_url', 'image_variants', 'image_lqip', 'estimated_cost',
             'created_at', 'updated_at'
         ]
     
-    def get_ingredients_count(self, obj):
-        """Retourne le nombre d'ingrédients"""
-        if isinstance(obj.ingredients, list):
-            return len(obj.ingredients)
-        return 0
-    
     def validate_rating(self, value):
         """Valide que la note est entre 1 et 5"""
         if value is not None and (value < 1 or value > 5):
@@ -72,6 +161,8 @@ class CocktailRecipeCreateSerializer(serializers.ModelSerializer):
             'image_prompt', 'image_url', 'difficulty_level',
             'alcohol_content', 'preparation_time'
         ]
+        # Chemin d'image jamais fourni par le client : il donnerait accès à l'image d'un autre utilisateur
+        read_only_fields = ['image_url']
     
     def validate_ingredients(self, value):
         """Valide le format des ingrédients"""
@@ -82,27 +173,80 @@ class CocktailRecipeCreateSerializer(serializers.ModelSerializer):
             if not isinstance(ingredient, dict):
                 raise serializers.ValidationError("Chaque ingrédient doit être un objet")
             
-            if 'name' not in ingredient:
+            if not any(ingredient.get(key) for key in NAME_KEYS):
                 raise serializers.ValidationError("Chaque ingrédient doit avoir un nom")
         
         return value
 
 
-class CocktailRecipeListSerializer(serializers.ModelSerializer):
-    """Serializer simplifié pour les listes de cocktails"""
+class CocktailRecipeImportSerializer(CocktailRecipeCreateSerializer):
+    """Ligne d'import en masse : champs de création, favori, note, tags et prompt d'origine"""
     
-    ingredients_count = serializers.SerializerMethodField()
+    tags = serializers.ListField(
+        child=serializers.CharField(max_length=50), required=False, default=list, max_length=20
+    )
+    user_prompt = serializers.CharField(required=False)
+    context = serializers.CharField(required=False, max_length=200)
+    
+    class Meta(CocktailRecipeCreateSerializer.Meta):
+        # Pas d'image à l'import : un chemin fourni par le fichier n'est jamais relu ni transformé
+        fields = [name for name in CocktailRecipeCreateSerializer.Meta.fields if name != 'image_url'] + [
+            'is_favorite', 'rating', 'tags', 'user_prompt', 'context'
+        ]
+        read_only_fields = []
+
+
+class CocktailRecipeListSerializer(SparseFieldsetMixin, ImageFieldsMixin, serializers.ModelSerializer):
+    """Serializer simplifié pour les listes de cocktails (?expand=user,generation_request)"""
+    
+    EXPANDABLE = {
+        'user': lambda: UserSerializer(read_only=True),
+        'generation_request': lambda: GenerationRequestSerializer(read_only=True),
+    }
     
     class Meta:
         model = CocktailRecipe
         fields = [
-            'id', 'name', 'description', 'ingredients_count', 
+            'id', 'name', 'description', 'ingredients_count', 'cost_tier',
+            'difficulty_level', 'alcohol_content', 'preparation_time',
+            'is_favorite', 'rating', 'image_url', 'image_src', 'image_srcset', 'image_lqip', 'created_at'
+        ]
+
+
+class SimilarCocktailSerializer(CocktailRecipeListSerializer):
+    """
+    Cocktail similaire, éventuellement d'un autre utilisateur : champs publics seulement
+    (ni description ni demande d'origine, qui peuvent reprendre le prompt, ni note, favori ou propriétaire)
+    Image d'un autre utilisateur : aperçu flou seul, ses fichiers restent privés (contexte is_own)
+    """
+
+    EXPANDABLE = {}
+
+    def get_image_src(self, obj):
+        return super().get_image_src(obj) if self.context.get('is_own') else ''
+
+    def get_image_srcset(self, obj):
+        if self.context.get('is_own'):
+            return super().get_image_srcset(obj)
+        return {'webp': '', 'jpeg': ''}
+
+    class Meta(CocktailRecipeListSerializer.Meta):
+        fields = [
+            'id', 'name', 'ingredients_count', 'cost_tier',
             'difficulty_level', 'alcohol_content', 'preparation_time',
-            'is_favorite', 'rating', 'image_url', 'created_at'
+            'image_src', 'image_srcset', 'image_lqip',
         ]
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    """Identifiants des cocktails visés par une opération en masse"""
     
-    def get_ingredients_count(self, obj):
-        """Retourne le nombre d'ingrédients"""
-        if isinstance(obj.ingredients, list):
-            return len(obj.ingredients)
-        return 0
+    ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False, max_length=MAX_IDS)
+
+
+class BulkFavoriteSerializer(BulkIdsSerializer):
+    is_favorite = serializers.BooleanField()
+
+
+class BulkRateSerializer(BulkIdsSerializer):
+    rating = serializers.IntegerField(min_value=1, max_value=5, allow_null=True)
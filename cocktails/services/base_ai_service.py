@@ -16,7 +16,7 @@ class BaseAIService(ABC):
         self.service_name = self.__class__.__name__
     
     @abstractmethod
-    def generate_cocktail(self, user_prompt: str, context: str = "", generate_image: bool = True) -> Dict[str, Any]:
+    def generate_cocktail(self, user_prompt: str, context: str = "", generate_image: bool = True, user=None) -> Dict[str, Any]:
         """
         « Propose-moi une fiche cocktail créative basé sur le prompt utilisateur. 
         Le nom du cocktail doit obligatoirement être festif, 
@@ -26,6 +26,7 @@ class BaseAIService(ABC):
             user_prompt: La demande de l'utilisateur
             context: Contexte optionnel (occasion, ambiance, cocktail signature pour un enterrement de vie de garçon,
              soirée entre filles, etc.)
+            user: Utilisateur à l'origine de la demande (budget de crédits image)
             
         Returns:
             Dict contenant:
@@ -147,7 +148,7 @@ Sois créatif avec le nom et l'histoire. Les ingrédients doivent être réalist
             if isinstance(ingredient, dict):
                 # Format nouveau (avec quantity et unit séparés)
                 name = ingredient.get('name', ingredient.get('nom', 'Ingrédient inconnu'))
-                quantity = ingredient.get('quantity', ingredient.get('quantité', ''))
+                quantity = ingredient.get('quantity', ingredient.get('quantite', ingredient.get('quantité', '')))
                 unit = ingredient.get('unit', '')
                 
                 # Si on a quantity et unit, les combiner
@@ -162,9 +163,9 @@ Sois créatif avec le nom et l'histoire. Les ingrédients doivent être réalist
                 
                 formatted.append({
                     'nom': name,
-                    'quantité': full_quantity
+                    'quantite': full_quantity
                 })
             else:
                 # Format ancien (string simple)
-                formatted.append({'nom': str(ingredient), 'quantité': 'À doser'})
+                formatted.append({'nom': str(ingredient), 'quantite': 'À doser'})
         return formatted
@@ -0,0 +1,109 @@
+"""
+Modifications en masse des cocktails d'un utilisateur (favoris, notes, suppression)
+Une instruction UPDATE/DELETE ... WHERE user_id = ... AND id IN (...) par opération, sans save() ligne
+à ligne : les compteurs de UserCocktailStats sont ajustés à partir du nombre de lignes modifiées
+et les réponses en cache invalidées (UPDATE en masse : pas de signaux)
+"""
+
+import logging
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.db import transaction
+from django.utils import timezone
+
+from cocktails.models import CocktailRecipe
+from . import user_stats
+from .response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+
+MAX_IDS = 500
+
+
+def _owned(user, ids: Iterable) -> Any:
+    return CocktailRecipe.objects.filter(user=user, pk__in=list(ids))
+
+
+def _uuids(ids: Iterable) -> List[uuid.UUID]:
+    """Identifiants comparables aux clés lues en base (majuscules, avec ou sans tirets) ; ValueError si invalide"""
+    return [pk if isinstance(pk, uuid.UUID) else uuid.UUID(str(pk)) for pk in ids]
+
+
+def _missing(ids: Iterable, found) -> List[str]:
+    return [str(pk) for pk in _uuids(ids) if pk not in found]
+
+
+def _result(user, ids, changed: int) -> Dict[str, Any]:
+    """Nombre de cocktails modifiés et identifiants introuvables (ou appartenant à un autre utilisateur)"""
+    found = set(_owned(user, ids).values_list('pk', flat=True))
+    return {'updated': changed, 'missing': _missing(ids, found)}
+
+
+@transaction.atomic
+def set_favorite(user, ids, is_favorite: bool) -> Dict[str, Any]:
+    """
+    Ajoute ou retire des favoris
+    Le filtre sur l'ancienne valeur rend le nombre de lignes modifiées exact malgré les écritures concurrentes
+    """
+    changed = _owned(user, ids).filter(is_favorite=not is_favorite).update(
+        is_favorite=is_favorite, updated_at=timezone.now()
+    )
+    user_stats.record_counter_deltas(user.pk, {'favorites': changed if is_favorite else -changed})
+    if changed:
+        response_cache.invalidate(user.pk)
+    return _result(user, ids, changed)
+
+
+@transaction.atomic
+def toggle_favorite(user, pk) -> Optional[Dict[str, Any]]:
+    """Bascule le favori d'un cocktail ; None si introuvable"""
+    current = _owned(user, [pk]).select_for_update().values('name', 'is_favorite').first()
+    if current is None:
+        return None
+    current['is_favorite'] = not current['is_favorite']
+    set_favorite(user, [pk], current['is_favorite'])
+    return current
+
+
+@transaction.atomic
+def rate(user, ids, rating: Optional[int]) -> Dict[str, Any]:
+    """
+    Note (ou retire la note avec None)
+    Anciennes notes lues et verrouillées en une requête (delta des statistiques), puis un seul UPDATE
+    limité à ces lignes : une note modifiée entre-temps par une autre requête n'est pas comptée deux fois
+    """
+    queryset = _owned(user, ids)
+    filtered = queryset.filter(rating__isnull=False) if rating is None else queryset.exclude(rating=rating)
+    previous = list(filtered.select_for_update().values_list('pk', 'rating'))
+    changed = queryset.filter(pk__in=[pk for pk, _ in previous]).update(rating=rating, updated_at=timezone.now())
+
+    old = [value for _, value in previous if value is not None]
+    user_stats.record_counter_deltas(user.pk, {
+        'rated': (changed if rating is not None else 0) - len(old),
+        'rating_sum': changed * (rating or 0) - sum(old),
+    })
+    if changed:
+        response_cache.invalidate(user.pk)
+    return _result(user, ids, changed)
+
+
+@transaction.atomic
+def delete(user, ids) -> Dict[str, Any]:
+    """
+    Supprime les cocktails (lignes d'ingrédients en cascade, images libérées par signal)
+    Les statistiques sont ajustées une fois pour le lot au lieu d'une fois par cocktail
+    """
+    queryset = _owned(user, ids)
+    rows = list(queryset.select_for_update().values('pk', *CocktailRecipe.STATS_TRACKED_FIELDS))
+    with user_stats.paused():
+        _, per_model = queryset.delete()
+    deleted = per_model.get(CocktailRecipe._meta.label, 0)
+    user_stats.record_bulk_deleted(user.pk, rows)
+    if deleted:
+        response_cache.invalidate(user.pk)
+
+    logger.info(f"🗑️ {deleted} cocktail(s) supprimé(s) pour {user.username}")
+    found = {row['pk'] for row in rows}
+    return {'deleted': deleted, 'missing': _missing(ids, found)}
@@ -0,0 +1,159 @@
+"""
+Requêtes conditionnelles (ETag / Last-Modified) des vues de cocktails
+Les validateurs sont calculés en une requête indexée, avant toute sérialisation ou rendu de template :
+un client à jour reçoit un 304 sans que la liste ou le cocktail ne soient chargés
+"""
+
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Optional
+
+from django.contrib import messages
+from django.core.exceptions import ValidationError
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+# En-têtes qui changent la représentation (JSON / API navigable, utilisateur authentifié)
+VARY_HEADERS = ('Accept', 'Authorization', 'Cookie')
+
+
+@dataclass
+class Validators:
+    etag: Optional[str] = None
+    last_modified: Optional[datetime] = None
+
+
+def user_data_state(user):
+    """
+    État des données de l'utilisateur : (nombre, dernière écriture) en une requête
+    UserCocktailStats.updated_at avance à chaque création, suppression ou changement suivi,
+    le max(updated_at) des cocktails couvre les autres modifications
+    """
+    from cocktails.models import CocktailRecipe, UserCocktailStats
+    from .user_stats import get_stats
+
+    last_recipe = (
+        CocktailRecipe.objects.filter(user=OuterRef('user'))
+        .order_by('-updated_at')
+        .values('updated_at')[:1]
+    )
+    row = (
+        UserCocktailStats.objects.filter(user=user)
+        .annotate(recipes_updated_at=Subquery(last_recipe))
+        .values('total', 'updated_at', 'recipes_updated_at')
+        .first()
+    )
+    if row is None:
+        stats = get_stats(user)
+        row = {'total': stats.total, 'updated_at': stats.updated_at, 'recipes_updated_at': None}
+
+    last_modified = max(filter(None, (row['updated_at'], row['recipes_updated_at'])))
+    return row['total'], last_modified
+
+
+def _etag(request, *parts, weak: bool = False) -> str:
+    """Empreinte de l'état des données et de la requête (chemin complet, Accept)"""
+    key = repr((parts, request.get_full_path(), request.META.get('HTTP_ACCEPT', '')))
+    digest = hashlib.md5(key.encode('utf-8')).hexdigest()
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def user_list_validators(request, *args, **kwargs) -> Validators:
+    """Listes de l'utilisateur (historique, favoris, ViewSet) : filtres et curseur inclus via le chemin"""
+    total, last_modified = user_data_state(request.user)
+    return Validators(_etag(request, request.user.pk, total, last_modified), last_modified)
+
+
+def user_stats_validators(request, *args, **kwargs) -> Validators:
+    """Statistiques : dépendent aussi du jour (7 / 30 derniers jours) et de la dernière connexion"""
+    total, last_modified = user_data_state(request.user)
+    etag = _etag(request, request.user.pk, total, last_modified, timezone.localdate(), request.user.last_login)
+    return Validators(etag, last_modified)
+
+
+def recipe_validators(request, pk=None, *args, weak: bool = False, **kwargs) -> Validators:
+    """Un cocktail : sa date de modification seule (404 laissé à la vue s'il n'existe pas)"""
+    from cocktails.models import CocktailRecipe
+
+    try:
+        updated_at = (
+            CocktailRecipe.objects.filter(user=request.user, pk=pk)
+            .values_list('updated_at', flat=True)
+            .first()
+        )
+    except ValidationError:
+        # Identifiant qui n'est pas un UUID : même traitement qu'un cocktail introuvable
+        updated_at = None
+    if updated_at is None:
+        return Validators()
+    return Validators(_etag(request, request.user.pk, request.user.username, pk, updated_at, weak=weak), updated_at)
+
+
+def similar_validators(request, pk=None, *args, **kwargs) -> Validators:
+    """
+    Cocktails similaires : proposés parmi les cocktails de tous les utilisateurs, la version du corpus
+    (qui avance à chaque écriture d'ingrédients ou suppression) complète la date de modification
+    Pas de Last-Modified : un changement chez un autre utilisateur n'a pas de date à comparer
+    """
+    from .similarity import similarity_index
+
+    recipe = recipe_validators(request, pk)
+    if recipe.etag is None:
+        return recipe
+    return Validators(_etag(request, request.user.pk, pk, recipe.last_modified, similarity_index.version()))
+
+
+def recipe_page_validators(request, pk=None, *args, **kwargs) -> Validators:
+    """
+    Page HTML d'un cocktail : ETag faible (le jeton CSRF masqué change à chaque rendu)
+    La section « Vous aimerez aussi » dépend des cocktails de tous les utilisateurs : la version du
+    corpus complète la date de modification, sans Last-Modified (comme similar_validators)
+    Pas de validateur si des messages attendent d'être affichés par le template
+    """
+    from .similarity import similarity_index
+
+    if not request.user.is_authenticated or len(messages.get_messages(request)):
+        return Validators()
+    recipe = recipe_validators(request, pk, weak=True)
+    if recipe.etag is None:
+        return recipe
+    etag = _etag(
+        request, request.user.pk, request.user.username, pk, recipe.last_modified, similarity_index.version(),
+        weak=True,
+    )
+    return Validators(etag)
+
+
+def conditional(validators: Callable[..., Validators]):
+    """
+    Décorateur de vue : ETag et Last-Modified depuis validators(request, *args, **kwargs),
+    304 (ou 412) rendu avant la vue ; les réponses restent privées et toujours revalidées
+    """
+    def decorator(view):
+        def cached(request, *args, **kwargs) -> Validators:
+            # condition() appelle les deux fonctions : une seule évaluation par requête
+            if not hasattr(request, '_conditional_validators'):
+                request._conditional_validators = (
+                    validators(request, *args, **kwargs)
+                    if request.method in ('GET', 'HEAD') else Validators()
+                )
+            return request._conditional_validators
+
+        conditioned = condition(
+            etag_func=lambda request, *args, **kwargs: cached(request, *args, **kwargs).etag,
+            last_modified_func=lambda request, *args, **kwargs: cached(request, *args, **kwargs).last_modified,
+        )(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs) -> Any:
+            response = conditioned(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD') and response.status_code in (200, 304):
+                patch_cache_control(response, private=True, no_cache=True)
+                patch_vary_headers(response, VARY_HEADERS)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,228 @@
+"""
+Gouverneur du budget de crédits Stability AI
+Enregistre la consommation par jour et par utilisateur et descend automatiquement
+en gamme (quality → balanced → economic → placeholder) à mesure que le budget s'épuise
+Le coût d'une génération est réservé avant l'appel (vérification et écriture dans la même
+transaction, sous le verrou du jour) puis remboursé si aucune image n'est payée
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+# Du plus cher au moins cher
+MODE_LADDER = ['quality', 'balanced', 'economic', 'placeholder']
+
+# Part du budget restant en dessous de laquelle un mode n'est plus autorisé
+MODE_THRESHOLDS = {
+    'quality': 0.5,
+    'balanced': 0.2,
+    'economic': 0.0,
+}
+
+PROVIDER_EXHAUSTED_KEY = 'stability:provider_exhausted'
+
+
+@dataclass
+class Reservation:
+    """Mode retenu pour une génération et crédits déjà inscrits au registre (None : rien à rembourser)"""
+    mode: str
+    credits: Optional[Decimal] = None
+    day: Optional[date] = None
+    user: Any = None
+
+
+class CreditGovernor:
+    """Applique les budgets journaliers (global et par utilisateur) aux générations d'images"""
+
+    @property
+    def daily_budget(self) -> float:
+        return float(getattr(settings, 'STABILITY_AI_DAILY_CREDIT_BUDGET', 0))
+
+    @property
+    def user_daily_budget(self) -> float:
+        return float(getattr(settings, 'STABILITY_AI_USER_DAILY_CREDIT_BUDGET', 0))
+
+    def _usage(self, user=None):
+        from cocktails.models import ImageCreditUsage
+
+        queryset = ImageCreditUsage.objects.filter(day=timezone.localdate())
+        if user is not None:
+            queryset = queryset.filter(user=user)
+        return queryset
+
+    def spent_today(self, user=None) -> float:
+        """Crédits consommés aujourd'hui (globalement ou par un utilisateur)"""
+        total = self._usage(user).aggregate(total=Sum('credits'))['total']
+        return float(total or 0)
+
+    def remaining(self, user=None) -> Optional[float]:
+        """Crédits restants pour aujourd'hui, None si aucun budget n'est configuré"""
+        remaining = []
+        if self.daily_budget > 0:
+            remaining.append(self.daily_budget - self.spent_today())
+        if user is not None and self.user_daily_budget > 0:
+            remaining.append(self.user_daily_budget - self.spent_today(user))
+        return max(min(remaining), 0.0) if remaining else None
+
+    def _remaining_ratio(self, user=None) -> float:
+        ratios = []
+        if self.daily_budget > 0:
+            ratios.append((self.daily_budget - self.spent_today()) / self.daily_budget)
+        if user is not None and self.user_daily_budget > 0:
+            ratios.append((self.user_daily_budget - self.spent_today(user)) / self.user_daily_budget)
+        return max(min(ratios), 0.0) if ratios else 1.0
+
+    def mode_cap(self, user=None) -> str:
+        """Mode le plus cher autorisé par le budget restant"""
+        if cache.get(PROVIDER_EXHAUSTED_KEY):
+            return 'placeholder'
+
+        ratio = self._remaining_ratio(user)
+        for mode in MODE_LADDER[:-1]:
+            if ratio > MODE_THRESHOLDS[mode]:
+                return mode
+        return 'placeholder'
+
+    def choose_mode(self, requested_mode: str, user=None, mode_costs: Optional[Dict[str, float]] = None) -> str:
+        """
+        Retourne le mode à utiliser pour une génération.
+
+        Le mode demandé n'est jamais dépassé ; il est abaissé au plafond du
+        budget, puis encore tant que le coût d'une image dépasse les crédits restants.
+        """
+        cap = self.mode_cap(user)
+        if requested_mode not in MODE_LADDER:
+            # Mode personnalisé (modèle fixé dans les settings) : seul l'épuisement le bloque
+            return 'placeholder' if cap == 'placeholder' else requested_mode
+
+        start = max(MODE_LADDER.index(requested_mode), MODE_LADDER.index(cap))
+        remaining = self.remaining(user)
+
+        for mode in MODE_LADDER[start:-1]:
+            cost = (mode_costs or {}).get(mode, 0)
+            if remaining is None or cost <= remaining:
+                if mode != requested_mode:
+                    logger.info(f"💰 Budget crédits: mode {requested_mode} abaissé à {mode}")
+                return mode
+
+        logger.warning("💳 Budget crédits épuisé - Utilisation d'image placeholder")
+        return 'placeholder'
+
+    def _add(self, user, day, credits: Decimal, images: int):
+        """Ajoute au registre (user, day) par F(), en créant la ligne au besoin"""
+        from cocktails.models import ImageCreditUsage
+
+        updates = {'credits': F('credits') + credits, 'images': F('images') + images, 'updated_at': timezone.now()}
+        if ImageCreditUsage.objects.filter(user=user, day=day).update(**updates):
+            return
+        try:
+            with transaction.atomic():
+                ImageCreditUsage.objects.create(user=user, day=day, credits=credits, images=images)
+        except IntegrityError:
+            # Un autre worker a créé la ligne entre-temps (contraintes d'unicité, ligne système comprise)
+            ImageCreditUsage.objects.filter(user=user, day=day).update(**updates)
+
+    def _lock_day(self, day):
+        """
+        Verrouille la ligne système du jour jusqu'à la fin de la transaction : les réservations
+        (lecture du solde puis écriture) de tous les workers passent l'une après l'autre
+        """
+        from cocktails.models import ImageCreditUsage
+
+        self._add(None, day, Decimal('0'), 0)
+        ImageCreditUsage.objects.select_for_update().get(user__isnull=True, day=day)
+
+    def reserve(self, requested_mode: str, user=None, mode_costs: Optional[Dict[str, float]] = None) -> Reservation:
+        """
+        Choisit le mode (choose_mode) et inscrit aussitôt son coût au registre, atomiquement :
+        deux générations simultanées ne peuvent pas lire le même solde et le dépasser toutes les deux
+        mode_costs doit contenir le coût du mode demandé ; refund() si l'image n'est finalement pas payée
+        """
+        day = timezone.localdate()
+        with transaction.atomic():
+            self._lock_day(day)
+            mode = self.choose_mode(requested_mode, user, mode_costs)
+            cost = (mode_costs or {}).get(mode)
+            if mode == 'placeholder' or not isinstance(cost, (int, float)):
+                return Reservation(mode)
+            credits = Decimal(str(cost))
+            self._add(user, day, credits, 1)
+        return Reservation(mode, credits, day, user)
+
+    def refund(self, reservation: Reservation):
+        """Annule une réservation (image servie par le cache, erreur de l'API...) ; sans effet la seconde fois"""
+        if reservation.credits is None:
+            return
+        with transaction.atomic():
+            self._add(reservation.user, reservation.day, -reservation.credits, -1)
+        reservation.credits = None
+
+    @transaction.atomic
+    def fold_user(self, user):
+        """
+        Reporte la consommation d'un utilisateur supprimé sur la ligne système de chaque jour :
+        le budget global reste exact et SET_NULL ne crée pas de seconde ligne système
+        """
+        from cocktails.models import ImageCreditUsage
+
+        rows = ImageCreditUsage.objects.select_for_update().filter(user=user)
+        for row in rows:
+            self._add(None, row.day, row.credits, row.images)
+        rows.delete()
+
+    def mark_provider_exhausted(self, duration: int = 3600):
+        """Stability AI a répondu 402 : ne plus l'appeler pendant un moment"""
+        cache.set(PROVIDER_EXHAUSTED_KEY, True, duration)
+
+    def get_budget_status(self) -> Dict[str, Any]:
+        """Budget du jour, consommation et projection d'épuisement"""
+        now = timezone.localtime()
+        start_of_day = timezone.make_aware(datetime.combine(now.date(), time.min))
+        elapsed = max((now - start_of_day).total_seconds(), 1)
+
+        spent = self.spent_today()
+        remaining = self.remaining()
+        burn_rate = spent / elapsed  # crédits par seconde
+
+        projected_exhaustion = None
+        if remaining is not None and burn_rate > 0:
+            projected_exhaustion = (now + timedelta(seconds=remaining / burn_rate)).isoformat()
+
+        top_users = (
+            self._usage()
+            .filter(user__isnull=False)
+            .order_by('-credits')
+            .values('user__username', 'credits', 'images')[:10]
+        )
+
+        return {
+            'day': now.date().isoformat(),
+            'daily_budget': self.daily_budget or None,
+            'user_daily_budget': self.user_daily_budget or None,
+            'spent': round(spent, 2),
+            'remaining': round(remaining, 2) if remaining is not None else None,
+            'images': self._usage().aggregate(total=Sum('images'))['total'] or 0,
+            'credits_per_hour': round(burn_rate * 3600, 2),
+            'projected_exhaustion': projected_exhaustion,
+            'mode_cap': self.mode_cap(),
+            'provider_exhausted': bool(cache.get(PROVIDER_EXHAUSTED_KEY)),
+            'top_users': [
+                {'username': row['user__username'], 'credits': float(row['credits']), 'images': row['images']}
+                for row in top_users
+            ],
+        }
+
+
+credit_governor = CreditGovernor()
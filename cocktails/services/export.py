@@ -0,0 +1,120 @@
+"""
+Export en flux de l'historique complet d'un utilisateur (NDJSON ou CSV)
+Les cocktails sont lus par lots (QuerySet.iterator) et écrits par blocs : la mémoire reste constante
+quelle que soit la taille de l'historique. Ordre (updated_at, id) : chaque ligne porte un curseur
+permettant de reprendre un export interrompu, et ?since= ne renvoie que les cocktails modifiés depuis
+"""
+
+import csv
+import io
+import json
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_datetime
+
+from cocktails.models import CocktailRecipe
+from .pagination import InvalidCursor, encode_cursor, filter_after
+
+EXPORT_ORDERING = 'updated'
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+EXPORT_FIELDS = (
+    'id', 'name', 'description', 'ingredients', 'music_ambiance', 'image_prompt', 'image_url',
+    'difficulty_level', 'alcohol_content', 'preparation_time', 'is_favorite', 'rating',
+    'created_at', 'updated_at',
+)
+
+# Lignes lues par aller-retour en base, octets accumulés avant chaque envoi
+CHUNK_SIZE = 2000
+FLUSH_BYTES = 64 * 1024
+
+
+def parse_since(value: Optional[str]):
+    """Date ISO 8601 de ?since= ; InvalidCursor si illisible"""
+    if not value:
+        return None
+    since = parse_datetime(value.replace(' ', '+'))
+    if since is None:
+        raise InvalidCursor("Paramètre 'since' invalide (date ISO 8601 attendue)")
+    return since
+
+
+def export_queryset(user, since=None, cursor: Optional[str] = None):
+    """Cocktails de l'utilisateur modifiés depuis `since`, après `cursor`, dans l'ordre (updated_at, id)"""
+    queryset = CocktailRecipe.objects.filter(user=user)
+    if since is not None:
+        # >= : un cocktail modifié à l'instant exact de la synchronisation précédente n'est pas perdu
+        queryset = queryset.filter(updated_at__gte=since)
+    if cursor:
+        queryset = filter_after(queryset, EXPORT_ORDERING, cursor)
+    return queryset.order_by('updated_at', 'id').values(*EXPORT_FIELDS)
+
+
+def _ndjson_lines(rows: Iterable[dict]) -> Iterator[str]:
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for values in rows:
+        values['cursor'] = encode_cursor(EXPORT_ORDERING, values)
+        yield encoder.encode(values) + '\n'
+
+
+def _csv_lines(rows: Iterable[dict]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow((*EXPORT_FIELDS, 'cursor'))
+    for values in rows:
+        writer.writerow((
+            *(
+                json.dumps(values[name], ensure_ascii=False) if name == 'ingredients'
+                else values[name].isoformat() if hasattr(values[name], 'isoformat')
+                else '' if values[name] is None
+                else values[name]
+                for name in EXPORT_FIELDS
+            ),
+            encode_cursor(EXPORT_ORDERING, values),
+        ))
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _chunks(lines: Iterable[str]) -> Iterator[bytes]:
+    """Regroupe les lignes en blocs d'environ FLUSH_BYTES"""
+    pending = []
+    size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        pending.append(data)
+        size += len(data)
+        if size >= FLUSH_BYTES:
+            yield b''.join(pending)
+            pending, size = [], 0
+    if pending:
+        yield b''.join(pending)
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Compression gzip à la volée, bloc par bloc"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_export(user, export_format: str = 'ndjson', since=None, cursor: Optional[str] = None,
+                  compress: bool = False) -> Iterator[bytes]:
+    """
+    Flux d'octets de l'export ; le curseur et le format sont validés avant le premier octet
+    (une erreur en cours de flux ne peut plus changer le statut HTTP)
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise InvalidCursor(f"Format d'export inconnu: {export_format}")
+    rows = export_queryset(user, since, cursor).iterator(chunk_size=CHUNK_SIZE)
+    lines = _ndjson_lines(rows) if export_format == 'ndjson' else _csv_lines(rows)
+    chunks = _chunks(lines)
+    return gzip_stream(chunks) if compress else chunks
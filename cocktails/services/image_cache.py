@@ -0,0 +1,95 @@
+"""
+Cache des images Stability AI déjà générées
+Évite de payer deux fois la même requête (modèle, mode, prompt, dimensions, étapes)
+"""
+
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from django.core.cache import caches
+
+from cocktails.services.image_store import image_store
+
+logger = logging.getLogger(__name__)
+
+
+CACHE_ALIAS = 'stability_images'
+# Compteurs dans le cache partagé (incr atomique avec Redis), pas avec les images : le cache fichier
+# n'a pas d'incr atomique et son éviction les supprimerait avec les entrées
+COUNTERS_ALIAS = 'default'
+KEY_PREFIX = 'stability:image:'
+HITS_KEY = 'stability:stats:hits'
+MISSES_KEY = 'stability:stats:misses'
+# Les compteurs du cache sont entiers : crédits stockés en centièmes
+CREDITS_SAVED_KEY = 'stability:stats:credits_saved_cents'
+
+
+class StabilityImageCache:
+    """Cache partagé entre workers (backend Django configuré dans CACHES)"""
+
+    def __init__(self, alias: str = CACHE_ALIAS, counters_alias: str = COUNTERS_ALIAS):
+        self.alias = alias
+        self.counters_alias = counters_alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    @property
+    def counters(self):
+        return caches[self.counters_alias]
+
+    def make_key(self, model: str, cost_mode: str, prompt: str, dimensions: str, steps: Optional[int]) -> str:
+        """Clé déterministe de la requête envoyée à Stability AI"""
+        payload = json.dumps([model, cost_mode, prompt.strip().lower(), dimensions, steps])
+        return KEY_PREFIX + hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str, credits: float = 0) -> Optional[str]:
+        """
+        Retourne le chemin de l'image en cache, si le fichier existe toujours
+        Sa date de modification est rafraîchie : une image remise à un nouveau cocktail n'est pas
+        supprimée par release() / cleanup_media avant que le cocktail ne la référence
+        """
+        image_path = self.cache.get(key)
+        if image_path and image_store.touch(image_path):
+            self._incr(HITS_KEY)
+            self._incr(CREDITS_SAVED_KEY, round(credits * 100))
+            return image_path
+
+        if image_path:
+            # Fichier supprimé entre-temps : l'entrée n'est plus valable
+            self.cache.delete(key)
+        self._incr(MISSES_KEY)
+        return None
+
+    def set(self, key: str, image_path: str):
+        """Mémorise l'image générée (TTL et éviction gérés par le backend)"""
+        self.cache.set(key, image_path)
+
+    def _incr(self, key: str, delta: int = 1):
+        if delta == 0:
+            return
+        self.counters.add(key, 0, timeout=None)
+        try:
+            self.counters.incr(key, delta)
+        except ValueError:
+            # Compteur évincé entre add() et incr()
+            self.counters.set(key, delta, timeout=None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Statistiques globales du cache (tous workers confondus)"""
+        counters = self.counters.get_many([HITS_KEY, MISSES_KEY, CREDITS_SAVED_KEY])
+        hits = counters.get(HITS_KEY, 0)
+        misses = counters.get(MISSES_KEY, 0)
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 3) if total else 0.0,
+            'credits_saved': counters.get(CREDITS_SAVED_KEY, 0) / 100,
+        }
+
+
+image_cache = StabilityImageCache()
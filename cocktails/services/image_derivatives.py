@@ -0,0 +1,272 @@
+"""
+Pipeline de dérivés d'images pour les cocktails
+Génère des variantes thumb/card/full en WebP et JPEG, ainsi qu'un aperçu flou (LQIP),
+hors du cycle requête/réponse
+"""
+
+import base64
+import io
+import logging
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections
+from django.utils import timezone
+from PIL import Image
+
+from cocktails.services import media_storage
+from cocktails.services.response_cache import response_cache
+from cocktails.services.similarity import similarity_index
+
+logger = logging.getLogger(__name__)
+
+
+# Largeur maximale de chaque variante (les images générées sont carrées)
+DERIVATIVE_SIZES = {
+    'thumb': 256,
+    'card': 512,
+    'full': 1024,
+}
+
+# Format Pillow, extension et options d'encodage pour chaque format de sortie
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+DERIVATIVES_DIR = 'cocktail_images/derivatives'
+
+# Aperçu flou intégré en data URI : quelques centaines d'octets, affiché avant le chargement
+LQIP_WIDTH = 16
+LQIP_QUALITY = 40
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def build_lqip(image: Image.Image) -> str:
+    """Encode une version minuscule de l'image en data URI WebP (low-quality image placeholder)"""
+    preview = image.copy()
+    preview.thumbnail((LQIP_WIDTH, LQIP_WIDTH), Image.LANCZOS)
+    buffer = io.BytesIO()
+    preview.save(buffer, 'WEBP', quality=LQIP_QUALITY, method=6)
+    return f"data:image/webp;base64,{base64.b64encode(buffer.getvalue()).decode('ascii')}"
+
+
+def build_derivatives(media_root: str, image_path: str) -> Tuple[Dict[str, Dict[str, Any]], str]:
+    """
+    Génère toutes les variantes d'une image source et son aperçu flou.
+
+    Exécutée dans un processus du pool : aucun accès à la base de données ici,
+    seulement Pillow et le système de fichiers.
+
+    Args:
+        media_root: Racine des fichiers media
+        image_path: Chemin relatif de l'image source (ex: cocktail_images/xxx.jpg)
+
+    Returns:
+        Tuple (variantes {taille: {'width': int, 'webp': chemin, 'jpeg': chemin}}, LQIP en data URI)
+    """
+    root = Path(media_root)
+    stem = Path(image_path).stem
+    relative_dir = _derivatives_dir(image_path)
+    output_dir = root / relative_dir
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    variants = {}
+    with Image.open(root / image_path) as source:
+        source = source.convert('RGB')
+        lqip = build_lqip(source)
+        for size_name, max_width in DERIVATIVE_SIZES.items():
+            resized = source.copy()
+            resized.thumbnail((max_width, max_width), Image.LANCZOS)
+            variants[size_name] = {'width': resized.width}
+
+            for format_key, (pil_format, extension, options) in DERIVATIVE_FORMATS.items():
+                filename = f"{stem}_{size_name}.{extension}"
+                target = output_dir / filename
+
+                # Les placeholders sont partagés : ne pas régénérer une variante existante
+                if not target.exists():
+                    temp_target = output_dir / f".{filename}.{os.getpid()}.tmp"
+                    resized.save(temp_target, pil_format, **options)
+                    os.replace(temp_target, target)
+
+                variants[size_name][format_key] = f"{relative_dir}/{filename}"
+
+    return variants, lqip
+
+
+def _derivatives_dir(image_path: str) -> str:
+    """Dossier des variantes, qui reprend le sous-dossier (shard) de l'image source"""
+    parent = Path(image_path).parent
+    try:
+        shard = parent.relative_to('cocktail_images')
+    except ValueError:
+        shard = Path()
+    return str(Path(DERIVATIVES_DIR) / shard) if str(shard) != '.' else DERIVATIVES_DIR
+
+
+def derivative_paths(image_path: str) -> List[str]:
+    """Liste les chemins relatifs de toutes les variantes possibles d'une image"""
+    relative_dir = _derivatives_dir(image_path)
+    stem = Path(image_path).stem
+    return [
+        f"{relative_dir}/{stem}_{size_name}.{extension}"
+        for size_name in DERIVATIVE_SIZES
+        for _, extension, _ in DERIVATIVE_FORMATS.values()
+    ]
+
+
+def source_candidates(derivative_path: str) -> List[str]:
+    """
+    Chemins possibles de l'image source d'une variante (inverse de derivative_paths).
+
+    L'extension de l'original n'est pas conservée dans le nom de la variante :
+    toutes les extensions possibles sont proposées.
+    """
+    path = Path(derivative_path)
+    match = re.match(rf'^(?P<stem>.+)_(?:{"|".join(DERIVATIVE_SIZES)})$', path.stem)
+    if not match:
+        return []
+    try:
+        shard = path.parent.relative_to(DERIVATIVES_DIR)
+    except ValueError:
+        return []
+    source_dir = Path('cocktail_images') / shard
+    return [
+        (source_dir / f"{match.group('stem')}.{extension}").as_posix()
+        for extension in ('png', 'jpg', 'jpeg', 'webp')
+    ]
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Retourne le pool de processus partagé (créé à la première utilisation)"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_DERIVATIVES_WORKERS', 2),
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _executor
+
+
+def _save_variants(recipe_id, image_path: str, variants: Dict[str, Dict[str, Any]], lqip: str = ''):
+    """Envoie les variantes vers le stockage media puis les enregistre si l'image du cocktail n'a pas changé entre-temps"""
+    from cocktails.models import CocktailRecipe
+
+    # Les variantes ne sont référencées qu'une fois disponibles sur tous les nœuds
+    media_storage.upload(
+        variant[format_key]
+        for variant in variants.values()
+        for format_key in DERIVATIVE_FORMATS
+    )
+
+    recipes = CocktailRecipe.objects.filter(pk=recipe_id, image_url=image_path)
+    if recipes.update(image_variants=variants, image_lqip=lqip, updated_at=timezone.now()):
+        # UPDATE sans signal : les pages en cache doivent afficher les nouvelles variantes
+        response_cache.invalidate(recipes.values_list('user_id', flat=True).first())
+        # Aperçu flou montré aux autres utilisateurs par les cocktails similaires
+        similarity_index.changed()
+
+
+def _on_derivatives_ready(recipe_id, image_path: str, future):
+    """Callback exécuté dans un thread du processus web quand le pool a terminé"""
+    try:
+        variants, lqip = future.result()
+        _save_variants(recipe_id, image_path, variants, lqip)
+        logger.info(f"🖼️ Variantes générées pour {image_path}")
+    except Exception as e:
+        logger.error(f"❌ Erreur génération des variantes pour {image_path}: {e}")
+    finally:
+        # Ce thread n'est pas géré par Django : fermer sa connexion explicitement
+        connections.close_all()
+
+
+def generate_derivatives(recipe_id, image_path: str) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Génère et enregistre les variantes de façon synchrone (commandes, tests)"""
+    try:
+        # L'image a pu être générée par un autre nœud
+        media_storage.ensure_local(image_path)
+        variants, lqip = build_derivatives(str(settings.MEDIA_ROOT), image_path)
+        _save_variants(recipe_id, image_path, variants, lqip)
+    except Exception as e:
+        logger.error(f"❌ Erreur génération des variantes pour {image_path}: {e}")
+        return None
+    return variants
+
+
+def needs_derivatives(recipe, created: bool, update_fields=None) -> bool:
+    """
+    Image nouvelle ou remplacée depuis le chargement, ou variantes effacées : génération à planifier
+    Un échec n'est pas replanifié à chaque sauvegarde (commande generate_image_derivatives)
+    """
+    if 'image_url' in recipe.get_deferred_fields() or not recipe.image_url:
+        return False
+    if update_fields is not None and not {'image_url', 'image_variants', 'image_lqip'} & set(update_fields):
+        return False
+    complete = bool(recipe.image_variants and recipe.image_lqip)
+    if created:
+        return not complete
+    loaded = getattr(recipe, '_loaded_values', {})
+    if loaded.get('image_url') != recipe.image_url:
+        # Variantes éventuelles de l'ancienne image
+        return True
+    return loaded.get('derivatives', False) and not complete
+
+
+def remember_image(recipe):
+    """L'image et l'état des variantes sauvegardés deviennent la référence des prochaines sauvegardes"""
+    deferred = recipe.get_deferred_fields()
+    if 'image_url' in deferred:
+        return
+    recipe._loaded_values = {**getattr(recipe, '_loaded_values', {}), 'image_url': recipe.image_url}
+    if not {'image_variants', 'image_lqip'} & deferred:
+        recipe._loaded_values['derivatives'] = bool(recipe.image_variants and recipe.image_lqip)
+
+
+def schedule_derivatives(recipe_id, image_path: str):
+    """Planifie la génération des variantes dans le pool de processus"""
+    if not image_path or not getattr(settings, 'IMAGE_DERIVATIVES_ENABLED', True):
+        return
+
+    if not getattr(settings, 'IMAGE_DERIVATIVES_ASYNC', True):
+        generate_derivatives(recipe_id, image_path)
+        return
+
+    future = _get_executor().submit(build_derivatives, str(settings.MEDIA_ROOT), image_path)
+    future.add_done_callback(lambda f: _on_derivatives_ready(recipe_id, image_path, f))
+
+
+# ============================================================================
+# URLS POUR LES TEMPLATES ET L'API
+# ============================================================================
+
+def media_url(path: str) -> str:
+    """Construit l'URL publique d'un fichier media à partir du stockage configuré"""
+    return media_storage.url(path)
+
+
+def get_image_src(recipe, size: str = 'card', image_format: str = 'jpeg') -> str:
+    """Retourne l'URL de la variante demandée, ou de l'image originale à défaut"""
+    variant = (recipe.image_variants or {}).get(size, {})
+    if variant.get(image_format):
+        return media_url(variant[image_format])
+    if recipe.image_url:
+        return media_url(recipe.image_url)
+    return ''
+
+
+def get_image_srcset(recipe, image_format: str = 'jpeg') -> str:
+    """Construit l'attribut srcset ('url 256w, url 512w, ...') pour un format donné"""
+    variants = recipe.image_variants or {}
+    candidates = []
+    for size_name in DERIVATIVE_SIZES:
+        variant = variants.get(size_name, {})
+        if variant.get(image_format):
+            candidates.append(f"{media_url(variant[image_format])} {variant['width']}w")
+    return ', '.join(candidates)
@@ -0,0 +1,201 @@
+"""
+Stockage des images de cocktails adressé par contenu
+Chaque image est identifiée par le SHA-256 de ses octets : les doublons
+partagent le même fichier et les écritures sont atomiques (fichier temporaire + rename)
+"""
+
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterable, Optional
+
+from django.conf import settings
+
+from cocktails.services import media_storage
+
+logger = logging.getLogger(__name__)
+
+
+IMAGES_DIR = 'cocktail_images'
+# Fichiers en cours d'écriture (même volume que la destination pour un rename atomique)
+STAGING_DIR = '.staging'
+
+# Images de repli livrées avec l'application (jamais supprimées)
+PLACEHOLDER_IMAGES = [
+    "placeholder_2ed8a5ba.jpg",
+    "placeholder_3d0a5333.jpg",
+    "placeholder_401ddb34.jpg",
+    "placeholder_5c46358c.jpg",
+    "placeholder_9f138c66.jpg",
+    "placeholder_ba0d131b.jpg",
+]
+
+# cocktail_images/ab/cd/<sha256>.<ext>
+STORED_PATH_RE = re.compile(
+    rf'^{IMAGES_DIR}/(?P<shard1>[0-9a-f]{{2}})/(?P<shard2>[0-9a-f]{{2}})/(?P<digest>[0-9a-f]{{64}})\.(?P<ext>jpg|png|webp)$'
+)
+
+
+# Octets nécessaires pour reconnaître toutes les signatures (RIFF....WEBP)
+SIGNATURE_SIZE = 12
+
+
+def guess_extension(data: bytes) -> str:
+    """Détermine l'extension à partir de la signature binaire de l'image"""
+    if data.startswith(b'\x89PNG'):
+        return 'png'
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return 'jpg'
+
+
+class ImageStore:
+    """Stockage dédupliqué des images, partagé entre workers sur le même volume"""
+
+    def __init__(self, media_root: Optional[str] = None):
+        self._media_root = media_root
+
+    @property
+    def media_root(self) -> Path:
+        return Path(self._media_root or settings.MEDIA_ROOT)
+
+    def relative_path(self, digest: str, extension: str) -> str:
+        """Chemin relatif (stocké en base) d'une image à partir de son empreinte"""
+        return f"{IMAGES_DIR}/{digest[:2]}/{digest[2:4]}/{digest}.{extension}"
+
+    def is_stored_path(self, path: str) -> bool:
+        """Vrai si le chemin appartient au stockage adressé par contenu"""
+        return bool(path and STORED_PATH_RE.match(path))
+
+    def exists(self, path: str) -> bool:
+        """Vrai si l'image est dans le tampon local ou dans le stockage media"""
+        return (self.media_root / path).exists() or media_storage.exists(path)
+
+    def touch(self, path: str) -> bool:
+        """
+        Rafraîchit la date de modification d'une image réutilisée (cache des requêtes Stability AI) :
+        release() et cleanup_media la considèrent comme neuve pendant le délai de grâce.
+        Une image présente seulement dans le stockage distant est d'abord rapatriée ; False si elle n'existe plus
+        """
+        target = self.media_root / path
+        if not target.exists() and not media_storage.ensure_local(path):
+            return False
+        try:
+            os.utime(target)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def save(self, data: bytes) -> str:
+        """Enregistre une image déjà en mémoire et retourne son chemin relatif"""
+        return self.save_stream([data])
+
+    def save_stream(self, chunks: Iterable[bytes]) -> str:
+        """
+        Enregistre une image reçue par morceaux et retourne son chemin relatif.
+
+        Les morceaux sont écrits directement dans un fichier temporaire du
+        volume media pendant que l'empreinte est calculée : l'image n'est
+        jamais entièrement chargée en mémoire. Si une image identique existe
+        déjà, le fichier temporaire est abandonné et on se contente de
+        rafraîchir la date de modification de l'existant pour le protéger du
+        nettoyage pendant le délai de grâce.
+        """
+        staging_dir = self.media_root / IMAGES_DIR / STAGING_DIR
+        staging_dir.mkdir(parents=True, exist_ok=True)
+
+        digest = hashlib.sha256()
+        extension = None
+        # Début du fichier conservé jusqu'à SIGNATURE_SIZE octets : un premier morceau peut être plus
+        # court que la signature (décodage base64 par blocs)
+        head = b''
+        fd, temp_path = tempfile.mkstemp(dir=staging_dir, prefix='.tmp-', suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    if extension is None:
+                        head += chunk[:SIGNATURE_SIZE - len(head)]
+                        if len(head) >= SIGNATURE_SIZE:
+                            extension = guess_extension(head)
+                    digest.update(chunk)
+                    f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+
+            if not head:
+                raise ValueError("Image vide")
+            if extension is None:
+                # Fichier plus court que la signature
+                extension = guess_extension(head)
+
+            relative = self.relative_path(digest.hexdigest(), extension)
+            target = self.media_root / relative
+
+            if target.exists():
+                os.unlink(temp_path)
+                os.utime(target)
+                logger.info(f"♻️ Image déjà stockée, réutilisée: {relative}")
+            else:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                # rename atomique : un lecteur voit soit rien, soit le fichier complet
+                os.replace(temp_path, target)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+        # Stockage distant (S3) : envoi en arrière-plan, idempotent si l'objet existe déjà
+        media_storage.schedule_upload([relative])
+        return relative
+
+    def reference_count(self, path: str) -> int:
+        """Nombre de cocktails qui référencent cette image"""
+        from cocktails.models import CocktailRecipe
+
+        return CocktailRecipe.objects.filter(image_url=path).count()
+
+    def release(self, path: str) -> bool:
+        """
+        Supprime l'image (et ses variantes) si plus aucun cocktail ne la référence.
+
+        Une image enregistrée ou réutilisée depuis moins de
+        IMAGE_STORE_RELEASE_GRACE_SECONDS est conservée : un autre worker
+        peut être en train de créer le cocktail qui la référence.
+        """
+        from cocktails.services.image_derivatives import derivative_paths
+
+        if not self.is_stored_path(path) or self.reference_count(path) > 0:
+            return False
+
+        target = self.media_root / path
+        try:
+            mtime = target.stat().st_mtime
+        except FileNotFoundError:
+            # Image générée sur un autre nœud : seule la copie distante existe
+            mtime = media_storage.modified_time(path)
+        if mtime is None:
+            return False
+
+        grace = getattr(settings, 'IMAGE_STORE_RELEASE_GRACE_SECONDS', 300)
+        if time.time() - mtime < grace:
+            return False
+
+        paths = [path, *derivative_paths(path)]
+        for relative in paths:
+            try:
+                (self.media_root / relative).unlink()
+            except FileNotFoundError:
+                pass
+        media_storage.delete(paths)
+
+        logger.info(f"🗑️ Image non référencée supprimée: {path}")
+        return True
+
+
+image_store = ImageStore()
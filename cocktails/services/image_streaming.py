@@ -0,0 +1,61 @@
+"""
+Décodage en flux des réponses Stability AI
+Permet d'écrire les images sur disque sans charger la réponse complète en mémoire
+"""
+
+import base64
+import re
+from typing import Iterable, Iterator
+
+# Début de la valeur de la première clé "base64" (artifacts[0].base64 pour SDXL)
+BASE64_VALUE_START = re.compile(rb'"base64"\s*:\s*"')
+
+# Taille conservée entre deux morceaux tant que la clé n'a pas été trouvée
+_KEY_LOOKBEHIND = 32
+
+
+class ArtifactNotFound(Exception):
+    """La réponse JSON ne contient aucun artefact base64"""
+    pass
+
+
+def iter_base64_artifact(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Extrait et décode à la volée le premier artefact base64 d'une réponse JSON.
+
+    Le JSON n'est jamais parsé en entier : on cherche la clé "base64" puis on
+    décode la chaîne par blocs de 4 caractères au fur et à mesure de l'arrivée
+    des morceaux, jusqu'au guillemet fermant.
+    """
+    buffer = b''
+    in_value = False
+
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffer += chunk
+
+        if not in_value:
+            match = BASE64_VALUE_START.search(buffer)
+            if not match:
+                buffer = buffer[-_KEY_LOOKBEHIND:]
+                continue
+            buffer = buffer[match.end():]
+            in_value = True
+
+        end = buffer.find(b'"')
+        encoded = buffer if end == -1 else buffer[:end]
+        # JSON peut échapper '/' en '\/' : aucun '\' n'appartient à l'alphabet base64
+        encoded = encoded.replace(b'\\', b'')
+
+        if end != -1:
+            if encoded:
+                yield base64.b64decode(encoded)
+            return
+
+        usable = len(encoded) - len(encoded) % 4
+        if usable:
+            yield base64.b64decode(encoded[:usable])
+        buffer = encoded[usable:]
+
+    raise ArtifactNotFound("Pas d'image dans la réponse SDXL")
@@ -0,0 +1,236 @@
+"""
+Import en masse de recettes de cocktails (NDJSON ou CSV)
+Les lignes sont lues en flux, validées par lots avec CocktailRecipeImportSerializer puis insérées
+par bulk_create dans une transaction par lot. bulk_create n'envoie pas de signaux : lignes
+d'ingrédients, tags, statistiques et cache des réponses sont traités ici, en masse (pas d'image importée)
+"""
+
+import csv
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from cocktails.models import CocktailRecipe, CocktailRecipeTag, CocktailTag, GenerationRequest
+from . import ingredients, user_stats
+from .response_cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+
+IMPORT_FORMATS = ('ndjson', 'csv')
+BATCH_SIZE = 500
+# Erreurs détaillées conservées dans le rapport (les suivantes sont seulement comptées)
+MAX_REPORTED_ERRORS = 1000
+
+
+@dataclass
+class ImportReport:
+    rows: int = 0
+    created: int = 0
+    failed: int = 0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def add_error(self, line: int, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'elapsed': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+# ============================================================================
+# LECTURE DES FLUX
+# ============================================================================
+
+def _decode(lines: Iterable) -> Iterator[str]:
+    for line in lines:
+        yield line.decode('utf-8-sig') if isinstance(line, bytes) else line
+
+
+def read_ndjson(lines: Iterable) -> Iterator[Tuple[int, Any]]:
+    """(numéro de ligne, objet) ; une ligne illisible donne une ValueError à la place de l'objet"""
+    for number, line in enumerate(_decode(lines), start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, ValueError(f"JSON invalide: {e}")
+
+
+def read_csv(lines: Iterable) -> Iterator[Tuple[int, Any]]:
+    """(numéro de ligne du fichier, dictionnaire) ; la première ligne contient les noms de colonnes"""
+    reader = csv.DictReader(_decode(lines))
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _split_ingredients(value: str) -> List[Dict[str, str]]:
+    """Colonne CSV : JSON, ou "Rhum blanc: 5 cl; Citron vert: 2 cl" """
+    value = value.strip()
+    if value.startswith('['):
+        return json.loads(value)
+    items = []
+    for part in value.split(';'):
+        name, _, quantity = part.partition(':')
+        if name.strip():
+            items.append({'nom': name.strip(), 'quantite': quantity.strip()})
+    return items
+
+
+def normalize_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Valeurs CSV (chaînes) vers les types attendus ; cellules vides = valeur par défaut"""
+    row = {key: value for key, value in row.items() if key and value not in ('', None)}
+    if isinstance(row.get('ingredients'), str):
+        try:
+            row['ingredients'] = _split_ingredients(row['ingredients'])
+        except ValueError:
+            pass  # laissé tel quel : le serializer signale le format invalide
+    if isinstance(row.get('tags'), str):
+        row['tags'] = [tag.strip() for tag in row['tags'].split(',') if tag.strip()]
+    return row
+
+
+# ============================================================================
+# INSERTION
+# ============================================================================
+
+def _tags(names: Iterable[str]) -> Dict[str, int]:
+    """Ids des tags par nom, en créant les tags manquants (une insertion groupée)"""
+    names = set(names)
+    ids = dict(CocktailTag.objects.filter(name__in=names).values_list('name', 'pk'))
+    missing = names - set(ids)
+    if missing:
+        CocktailTag.objects.bulk_create([CocktailTag(name=name) for name in missing], ignore_conflicts=True)
+        ids.update(CocktailTag.objects.filter(name__in=missing).values_list('name', 'pk'))
+    return ids
+
+
+@transaction.atomic
+def _insert(user, batch: List[Tuple[int, Dict[str, Any]]], shared_request) -> int:
+    """Insère un lot validé : demandes de génération, cocktails, ingrédients, tags"""
+    requests = []
+    recipes = []
+    tags = []
+    for _, data in batch:
+        data = dict(data)
+        prompt = data.pop('user_prompt', '')
+        context = data.pop('context', '')
+        recipe_tags = data.pop('tags', [])
+        if prompt:
+            generation_request = GenerationRequest(user=user, user_prompt=prompt, context=context)
+            requests.append(generation_request)
+        else:
+            generation_request = shared_request
+        recipe = CocktailRecipe(user=user, generation_request=generation_request, **data)
+        # bulk_create n'appelle pas save() : colonnes dénormalisées calculées ici
+        recipe.refresh_ingredients_summary()
+        recipes.append(recipe)
+        tags.append(recipe_tags)
+
+    GenerationRequest.objects.bulk_create(requests)
+    CocktailRecipe.objects.bulk_create(recipes)
+    ingredients.sync_recipes(recipes)
+
+    tag_ids = _tags(name for names in tags for name in names)
+    CocktailRecipeTag.objects.bulk_create(
+        [
+            CocktailRecipeTag(cocktail_id=recipe.pk, tag_id=tag_ids[name])
+            for recipe, names in zip(recipes, tags)
+            for name in set(names)
+        ],
+        ignore_conflicts=True,
+    )
+    return len(recipes)
+
+
+def import_recipes(user, rows: Iterable[Tuple[int, Any]], batch_size: int = BATCH_SIZE,
+                   dry_run: bool = False, on_batch=None) -> ImportReport:
+    """
+    Importe les lignes (numéro, objet) pour l'utilisateur
+    Les lignes invalides sont rapportées sans bloquer leur lot ; une erreur base de données
+    annule le lot concerné seulement. on_batch(report) est appelé après chaque lot
+    """
+    from cocktails.serializers import CocktailRecipeImportSerializer
+
+    report = ImportReport()
+    started = time.perf_counter()
+    # Une seule instance : les champs ne sont pas reconstruits à chaque ligne
+    serializer = CocktailRecipeImportSerializer()
+    shared_request = None
+    batch = []
+
+    def flush():
+        nonlocal shared_request
+        if not batch:
+            return
+        if not dry_run:
+            if shared_request is None and any('user_prompt' not in data for _, data in batch):
+                # Demande de génération commune aux cocktails importés sans prompt d'origine
+                shared_request = GenerationRequest.objects.create(
+                    user=user,
+                    user_prompt=f"Import du {timezone.localdate().isoformat()}",
+                    context='import',
+                )
+            try:
+                report.created += _insert(user, batch, shared_request)
+            except DatabaseError as e:
+                logger.error(f"❌ Lot d'import annulé: {e}")
+                for number, _ in batch:
+                    report.add_error(number, {'database': [str(e)]})
+        batch.clear()
+        if on_batch:
+            on_batch(report)
+
+    for number, row in rows:
+        report.rows += 1
+        if isinstance(row, Exception):
+            report.add_error(number, {'line': [str(row)]})
+            continue
+        if not isinstance(row, dict):
+            report.add_error(number, {'line': ["Objet JSON attendu"]})
+            continue
+        try:
+            batch.append((number, serializer.run_validation(normalize_row(row))))
+        except ValidationError as e:
+            report.add_error(number, e.detail)
+            continue
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+
+    if report.created:
+        # Statistiques recalculées et réponses invalidées une fois pour tout l'import
+        user_stats.rebuild(user.pk)
+        response_cache.invalidate(user.pk)
+    report.elapsed = time.perf_counter() - started
+    logger.info(
+        f"📥 Import pour {user.username}: {report.created} créé(s), {report.failed} erreur(s), "
+        f"{report.rows_per_second:.0f} lignes/s"
+    )
+    return report
+
+
+def read_rows(lines: Iterable, import_format: str) -> Iterator[Tuple[int, Any]]:
+    if import_format not in IMPORT_FORMATS:
+        raise ValueError(f"Format d'import inconnu: {import_format}")
+    return read_csv(lines) if import_format == 'csv' else read_ndjson(lines)
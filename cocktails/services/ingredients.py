@@ -0,0 +1,350 @@
+"""
+Catalogue normalisé des ingrédients
+Le JSON CocktailRecipe.ingredients reste la source affichée ; ses lignes sont recopiées dans
+CocktailIngredient (nom canonique, quantité analysée) pour les filtres par ingrédient
+"""
+
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from decimal import Decimal, InvalidOperation
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from cocktails.services.similarity import similarity_index
+
+logger = logging.getLogger(__name__)
+
+
+# Clés rencontrées dans les cocktails existants ('quantité' : anciennes réponses de BaseAIService)
+NAME_KEYS = ('nom', 'name')
+QUANTITY_KEYS = ('quantite', 'quantité', 'quantity')
+
+# Mots ignorés en tête de nom ("des feuilles de menthe" -> "feuille de menthe")
+LEADING_STOPWORDS = {'de', 'd', 'du', 'des', 'la', 'le', 'les', 'l', 'un', 'une', 'quelques', 'some', 'fresh'}
+
+# Mots terminés par s ou x au singulier
+INVARIABLE = {'ananas', 'jus', 'cassis', 'anis', 'pastis', 'mais', 'pois', 'noix', 'bois', 'riz'}
+
+# Synonymes (après normalisation) vers le nom canonique du catalogue
+SYNONYMS = {
+    'rum': 'rhum',
+    'white rum': 'rhum blanc',
+    'dark rum': 'rhum ambre',
+    'lime': 'citron vert',
+    'lime juice': 'jus de citron vert',
+    'lemon': 'citron',
+    'lemon juice': 'jus de citron',
+    'mint': 'menthe',
+    'sugar': 'sucre',
+    'ice': 'glacon',
+    'glace': 'glacon',
+    'whiskey': 'whisky',
+    'bourbon whiskey': 'bourbon',
+    'soda': 'eau gazeuse',
+    'eau petillante': 'eau gazeuse',
+    'club soda': 'eau gazeuse',
+    'sirop de sucre de canne': 'sirop de sucre',
+    'sucre de canne liquide': 'sirop de sucre',
+    'simple syrup': 'sirop de sucre',
+    'tonic water': 'tonic',
+    'angostura bitters': 'angostura',
+}
+
+# Unités reconnues (forme normalisée -> unité canonique) et leur volume en ml
+UNITS = {
+    'ml': 'ml', 'millilitre': 'ml',
+    'cl': 'cl', 'centilitre': 'cl',
+    'l': 'l', 'litre': 'l',
+    'oz': 'oz', 'once': 'oz',
+    'g': 'g', 'gramme': 'g', 'kg': 'kg',
+    'c a soupe': 'c. à soupe', 'cuillere a soupe': 'c. à soupe', 'cas': 'c. à soupe', 'tbsp': 'c. à soupe',
+    'c a cafe': 'c. à café', 'cuillere a cafe': 'c. à café', 'cac': 'c. à café', 'tsp': 'c. à café',
+    'trait': 'trait', 'dash': 'trait', 'goutte': 'goutte', 'drop': 'goutte',
+    'feuille': 'feuille', 'tranche': 'tranche', 'rondelle': 'tranche', 'zeste': 'zeste',
+    'quartier': 'quartier', 'pincee': 'pincée', 'brin': 'brin', 'cube': 'cube', 'glacon': 'glaçon',
+}
+VOLUME_ML = {
+    'ml': 1, 'cl': 10, 'l': 1000, 'oz': 30,
+    'c. à soupe': 15, 'c. à café': 5, 'trait': 1, 'goutte': 0.05,
+}
+FRACTIONS = {'½': Decimal('0.5'), '¼': Decimal('0.25'), '¾': Decimal('0.75'), '⅓': Decimal('0.33'), '⅔': Decimal('0.67')}
+
+QUANTITY_RE = re.compile(
+    r'^\s*(?P<amount>\d+(?:[.,]\d+)?(?:\s*/\s*\d+)?|[½¼¾⅓⅔])\s*(?P<unit>[^\d].*)?$'
+)
+
+
+# ============================================================================
+# NORMALISATION
+# ============================================================================
+
+def _strip_accents(text: str) -> str:
+    return ''.join(
+        char for char in unicodedata.normalize('NFKD', text)
+        if not unicodedata.combining(char)
+    )
+
+
+def _normalize(text: str) -> str:
+    """Minuscules, sans accents ni ponctuation, espaces réduits"""
+    text = _strip_accents(str(text)).lower()
+    text = re.sub(r'\([^)]*\)', ' ', text)
+    text = re.sub(r"[^a-z0-9.]+", ' ', text)
+    return ' '.join(text.split())
+
+
+def _singular(word: str) -> str:
+    if word in INVARIABLE:
+        return word
+    if len(word) > 3 and word[-1] in 'sx' and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def canonical_name(name: str) -> str:
+    """Nom canonique d'un ingrédient : "Feuilles de Menthe fraîche" -> "feuille de menthe fraiche" """
+    words = _normalize(name).replace('.', ' ').split()
+    while words and words[0] in LEADING_STOPWORDS:
+        words = words[1:]
+    canonical = ' '.join(_singular(word) for word in words)
+    return SYNONYMS.get(canonical, canonical)[:100]
+
+
+def parse_quantity(text: str) -> Tuple[Optional[Decimal], str, Optional[float]]:
+    """
+    Analyse une quantité : "4 cl" -> (4, 'cl', 40.0), "1/2 citron" -> (0.5, '', None)
+    Renvoie (None, '', None) pour les quantités libres ("À doser")
+    """
+    match = QUANTITY_RE.match(str(text or ''))
+    if not match:
+        return None, '', None
+
+    raw_amount = match.group('amount').replace(' ', '')
+    try:
+        if raw_amount in FRACTIONS:
+            amount = FRACTIONS[raw_amount]
+        elif '/' in raw_amount:
+            numerator, denominator = raw_amount.split('/')
+            amount = (Decimal(numerator.replace(',', '.')) / Decimal(denominator)).quantize(Decimal('0.01'))
+        else:
+            amount = Decimal(raw_amount.replace(',', '.'))
+    except (InvalidOperation, ZeroDivisionError):
+        return None, '', None
+
+    unit = ''
+    words = _normalize(match.group('unit') or '').replace('.', ' ').split()
+    # Unités de plusieurs mots d'abord ("cuillère à soupe")
+    for size in (3, 2, 1):
+        candidate = ' '.join(_singular(word) for word in words[:size])
+        if candidate in UNITS:
+            unit = UNITS[candidate]
+            break
+
+    volume = float(amount) * VOLUME_ML[unit] if unit in VOLUME_ML else None
+    return amount, unit, volume
+
+
+def iter_ingredients(raw) -> Iterable[Dict[str, str]]:
+    """Lignes {'name', 'quantity'} d'un JSON d'ingrédients, quelles que soient ses clés"""
+    if not isinstance(raw, list):
+        return
+    for item in raw:
+        if isinstance(item, dict):
+            name = next((item[key] for key in NAME_KEYS if item.get(key)), '')
+            quantity = next((item[key] for key in QUANTITY_KEYS if item.get(key)), '')
+            if item.get('unit') and quantity:
+                quantity = f"{quantity} {item['unit']}"
+        else:
+            name, quantity = item, ''
+        name = str(name).strip()
+        if name:
+            yield {'name': name[:200], 'quantity': str(quantity).strip()[:100]}
+
+
+def fingerprint(raw) -> str:
+    """Empreinte du JSON d'ingrédients (détection des modifications)"""
+    payload = json.dumps(raw, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.md5(payload.encode('utf-8')).hexdigest()
+
+
+# ============================================================================
+# SYNCHRONISATION
+# ============================================================================
+
+def _catalogue(names: Dict[str, str]) -> Dict[str, int]:
+    """Ids du catalogue pour {nom canonique: nom affiché}, en créant les ingrédients manquants"""
+    from cocktails.models import Ingredient
+
+    ids = dict(Ingredient.objects.filter(canonical_name__in=names).values_list('canonical_name', 'pk'))
+    missing = [canonical for canonical in names if canonical not in ids]
+    if missing:
+        Ingredient.objects.bulk_create(
+            [Ingredient(canonical_name=canonical, name=names[canonical][:100]) for canonical in missing],
+            ignore_conflicts=True,
+        )
+        ids.update(Ingredient.objects.filter(canonical_name__in=missing).values_list('canonical_name', 'pk'))
+    return ids
+
+
+@transaction.atomic
+def sync_recipes(recipes: List[Any]) -> int:
+    """Réécrit les lignes d'ingrédients d'un lot de cocktails (3 à 4 requêtes par lot)"""
+    from cocktails.models import CocktailIngredient
+
+    parsed = {recipe.pk: list(iter_ingredients(recipe.ingredients)) for recipe in recipes}
+    names = {}
+    for lines in parsed.values():
+        for line in lines:
+            line['canonical'] = canonical_name(line['name'])
+            if line['canonical']:
+                names.setdefault(line['canonical'], line['name'])
+    ids = _catalogue(names) if names else {}
+
+    CocktailIngredient.objects.filter(recipe__in=[recipe.pk for recipe in recipes]).delete()
+
+    rows = []
+    for recipe in recipes:
+        for position, line in enumerate(line for line in parsed[recipe.pk] if line['canonical']):
+            amount, unit, volume = parse_quantity(line['quantity'])
+            rows.append(CocktailIngredient(
+                recipe_id=recipe.pk,
+                ingredient_id=ids[line['canonical']],
+                user_id=recipe.user_id,
+                position=position,
+                name=line['name'],
+                quantity=line['quantity'],
+                amount=amount,
+                unit=unit,
+                volume_ml=volume,
+            ))
+    CocktailIngredient.objects.bulk_create(rows, batch_size=1000)
+    similarity_index.changed([recipe.pk for recipe in recipes])
+    return len(rows)
+
+
+def sync_recipe(recipe) -> int:
+    count = sync_recipes([recipe])
+    recipe._loaded_values = {**getattr(recipe, '_loaded_values', {}), 'ingredients': fingerprint(recipe.ingredients)}
+    return count
+
+
+def needs_sync(recipe, created: bool, update_fields=None) -> bool:
+    """Le JSON ou le propriétaire ont-ils changé depuis le chargement ?"""
+    if created:
+        return True
+    if update_fields is not None and not {'ingredients', 'user'} & set(update_fields):
+        return False
+    if 'ingredients' in recipe.get_deferred_fields():
+        return False
+    loaded = getattr(recipe, '_loaded_values', {})
+    if 'ingredients' not in loaded:
+        return True
+    if 'user_id' in loaded and loaded['user_id'] != recipe.user_id:
+        return True
+    return loaded['ingredients'] != fingerprint(recipe.ingredients)
+
+
+# ============================================================================
+# REQUÊTES
+# ============================================================================
+
+def _split_terms(terms) -> List[str]:
+    if isinstance(terms, str):
+        terms = terms.split(',')
+    return [term.strip() for term in terms if term and term.strip()]
+
+
+def resolve(term: str) -> Set[int]:
+    """
+    Ingrédients du catalogue désignés par un terme : "rhum" couvre "rhum blanc" et "rhum ambre",
+    "citron vert" couvre "jus de citron vert" (mot entier, sur le catalogue seulement)
+    """
+    from cocktails.models import Ingredient
+
+    canonical = canonical_name(term)
+    if not canonical:
+        return set()
+    return set(
+        Ingredient.objects.filter(
+            Q(canonical_name=canonical)
+            | Q(canonical_name__startswith=f"{canonical} ")
+            | Q(canonical_name__endswith=f" {canonical}")
+            | Q(canonical_name__contains=f" {canonical} ")
+        ).values_list('pk', flat=True)
+    )
+
+
+def filter_containing(queryset, user, terms):
+    """Cocktails contenant chacun des ingrédients demandés ("rhum, citron vert")"""
+    from cocktails.models import CocktailIngredient
+
+    for term in _split_terms(terms):
+        ingredient_ids = resolve(term)
+        if not ingredient_ids:
+            return queryset.none()
+        # Semi-jointure servie par l'index (user, ingredient, recipe)
+        queryset = queryset.filter(pk__in=CocktailIngredient.objects.filter(
+            user=user, ingredient__in=ingredient_ids
+        ).values('recipe_id'))
+    return queryset
+
+
+def makeable(user, available, max_missing: int = 0) -> List[Dict[str, Any]]:
+    """
+    Cocktails de l'utilisateur réalisables avec les ingrédients disponibles
+    (au plus max_missing ingrédients manquants), les plus complets d'abord
+    """
+    from cocktails.models import CocktailIngredient
+
+    available_ids = set()
+    for term in _split_terms(available):
+        available_ids |= resolve(term)
+    if not available_ids:
+        return []
+
+    # Une seule agrégation sur les lignes de l'utilisateur
+    rows = (
+        CocktailIngredient.objects.filter(user=user)
+        .values('recipe_id')
+        .annotate(total=Count('pk'), missing=Count('pk', filter=~Q(ingredient__in=available_ids)))
+        .filter(missing__lte=max_missing, total__gt=F('missing'))
+        .order_by('missing', '-total')
+    )
+    return list(rows)
+
+
+def missing_ingredients(recipe_ids, available) -> Dict[Any, List[str]]:
+    """Noms des ingrédients manquants par cocktail"""
+    from cocktails.models import CocktailIngredient
+
+    available_ids = set()
+    for term in _split_terms(available):
+        available_ids |= resolve(term)
+
+    missing = {recipe_id: [] for recipe_id in recipe_ids}
+    lines = (
+        CocktailIngredient.objects.filter(recipe__in=recipe_ids)
+        .exclude(ingredient__in=available_ids)
+        .order_by('recipe_id', 'position')
+        .values_list('recipe_id', 'name')
+    )
+    for recipe_id, name in lines:
+        missing[recipe_id].append(name)
+    return missing
+
+
+def user_ingredients(user) -> List[Dict[str, Any]]:
+    """Ingrédients utilisés par l'utilisateur avec leur nombre de cocktails"""
+    from cocktails.models import CocktailIngredient
+
+    return list(
+        CocktailIngredient.objects.filter(user=user)
+        .values('ingredient_id', 'ingredient__name', 'ingredient__canonical_name')
+        .annotate(cocktails=Count('recipe_id', distinct=True))
+        .order_by('-cocktails', 'ingredient__canonical_name')
+    )
@@ -0,0 +1,174 @@
+"""
+Stockage des images de cocktails via l'API de stockage Django
+Les images sont d'abord écrites dans MEDIA_ROOT (tampon local, utilisé par Pillow),
+puis envoyées en arrière-plan vers le stockage 'cocktail_images' quand celui-ci est distant (S3, MinIO)
+"""
+
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, storages
+
+logger = logging.getLogger(__name__)
+
+
+STORAGE_ALIAS = 'cocktail_images'
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_storage():
+    """Stockage configuré pour les images (STORAGES['cocktail_images'])"""
+    return storages[STORAGE_ALIAS]
+
+
+def is_remote() -> bool:
+    """Vrai si le stockage n'est pas le MEDIA_ROOT local (les fichiers doivent y être envoyés)"""
+    storage = get_storage()
+    if isinstance(storage, FileSystemStorage):
+        return Path(storage.location).resolve() != Path(settings.MEDIA_ROOT).resolve()
+    return True
+
+
+def local_path(path: str) -> Path:
+    return Path(settings.MEDIA_ROOT) / path
+
+
+def url(path: str) -> str:
+    """URL publique d'un fichier, construite par le stockage"""
+    return get_storage().url(path)
+
+
+def signed_url(path: str, expire: int) -> Optional[str]:
+    """
+    URL S3 pré-signée valable expire secondes, même sans querystring_auth ni domaine personnalisé :
+    une image privée n'est jamais redirigée vers une URL permanente. None si le stockage ne signe pas
+    """
+    storage = get_storage()
+    if not hasattr(storage, 'connection') or not hasattr(storage, 'bucket'):
+        return None
+    from storages.utils import clean_name
+
+    return storage.connection.meta.client.generate_presigned_url(
+        'get_object',
+        Params={
+            'Bucket': storage.bucket.name,
+            'Key': storage._normalize_name(clean_name(path)),
+            # Objets envoyés en public/immutable : réponse privée, pas au-delà de la signature
+            'ResponseCacheControl': f'private, max-age={expire}',
+        },
+        ExpiresIn=expire,
+    )
+
+
+def exists(path: str) -> bool:
+    """Vrai si le fichier est présent localement ou dans le stockage"""
+    if local_path(path).exists():
+        return True
+    return is_remote() and get_storage().exists(path)
+
+
+def modified_time(path: str) -> Optional[float]:
+    """Date de modification (timestamp) du fichier local, ou de l'objet distant à défaut"""
+    try:
+        return local_path(path).stat().st_mtime
+    except FileNotFoundError:
+        pass
+    if not is_remote():
+        return None
+    try:
+        return get_storage().get_modified_time(path).timestamp()
+    except Exception:
+        return None
+
+
+def upload(paths: Iterable[str]) -> List[str]:
+    """Envoie les fichiers locaux vers le stockage distant (synchrone, idempotent)"""
+    if not is_remote():
+        return []
+
+    storage = get_storage()
+    uploaded = []
+    for path in paths:
+        source = local_path(path)
+        if not source.exists() or storage.exists(path):
+            continue
+        with source.open('rb') as f:
+            storage.save(path, File(f, name=path))
+        uploaded.append(path)
+
+    if uploaded:
+        logger.info(f"☁️ {len(uploaded)} fichier(s) envoyé(s) vers le stockage media")
+    return uploaded
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Retourne le pool de threads d'envoi (créé à la première utilisation)"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'MEDIA_UPLOAD_WORKERS', 4),
+            thread_name_prefix='media-upload',
+        )
+    return _executor
+
+
+def _log_upload_error(future: Future):
+    error = future.exception()
+    if error:
+        logger.error(f"❌ Erreur envoi vers le stockage media: {error}")
+
+
+def schedule_upload(paths: Iterable[str]) -> Optional[Future]:
+    """Planifie l'envoi des fichiers hors du cycle requête/réponse"""
+    paths = list(paths)
+    if not paths or not is_remote():
+        return None
+
+    if not getattr(settings, 'MEDIA_UPLOAD_ASYNC', True):
+        try:
+            upload(paths)
+        except Exception as e:
+            logger.error(f"❌ Erreur envoi vers le stockage media: {e}")
+        return None
+
+    future = _get_executor().submit(upload, paths)
+    future.add_done_callback(_log_upload_error)
+    return future
+
+
+def ensure_local(path: str) -> bool:
+    """
+    Rapatrie un fichier du stockage distant vers MEDIA_ROOT s'il n'y est pas
+    (image générée par un autre nœud, nécessaire à Pillow pour les variantes).
+    """
+    target = local_path(path)
+    if target.exists():
+        return True
+    if not is_remote() or not get_storage().exists(path):
+        return False
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    temp_target = target.with_name(f".{target.name}.{time.time_ns()}.tmp")
+    with get_storage().open(path, 'rb') as source, temp_target.open('wb') as f:
+        for chunk in source.chunks():
+            f.write(chunk)
+    temp_target.replace(target)
+    return True
+
+
+def delete(paths: Iterable[str]):
+    """Supprime les fichiers du stockage distant (le tampon local est géré par l'appelant)"""
+    if not is_remote():
+        return
+    storage = get_storage()
+    for path in paths:
+        try:
+            storage.delete(path)
+        except Exception as e:
+            logger.warning(f"⚠️ Suppression distante impossible pour {path}: {e}")
@@ -5,9 +5,10 @@ Support d'Ollama (Llama 3.1) et Mistral AI avec génération d'images Stability
 
 import logging
 import json
+import hashlib
 import random
 import requests
-from typing import Dict, Any, Optional, Union
+from typing import Dict, Any, Iterable, Optional, Union
 from datetime import datetime
 from pydantic import BaseModel, Field
 from langchain_ollama import ChatOllama
@@ -17,10 +18,17 @@ from langgraph.graph import StateGraph, END
 from django.conf import settings
 
 from cocktails.services.base_ai_service import BaseAIService
+from cocktails.services.credit_governor import credit_governor
+from cocktails.services.image_cache import image_cache
+from cocktails.services.image_store import IMAGES_DIR, PLACEHOLDER_IMAGES, image_store
+from cocktails.services.image_streaming import iter_base64_artifact
 from cocktails.models import CocktailRecipe
 
 logger = logging.getLogger(__name__)
 
+# Taille des morceaux lus depuis les réponses Stability AI
+STREAM_CHUNK_SIZE = 64 * 1024
+
 
 # ============================================================================
 # SERVICE STABILITY AI INTÉGRÉ
@@ -52,6 +60,13 @@ class StabilityAIService:
             'stable-image-ultra': 8
         }
         
+        # Modèle utilisé pour chaque mode coût
+        self.mode_models = {
+            'economic': 'sdxl-1-0',
+            'balanced': 'stable-diffusion-3-5-flash',
+            'quality': 'stable-diffusion-3-5-large-turbo',
+        }
+        
         # Sélection automatique du modèle selon le mode coût
         if self.cost_mode == 'economic':
             self.model = 'sdxl-1-0'  # 0.9 crédits - Le moins cher
@@ -64,24 +79,38 @@ class StabilityAIService:
             cost = self.model_costs.get(self.model, 'Inconnu')
             logger.info(f"🎨 Stability AI configuré - Modèle: {self.model} ({cost} crédits/image)")
     
+    def _mode_costs(self) -> Dict[str, float]:
+        """Coût en crédits d'une image pour chaque mode"""
+        return {mode: self.model_costs[model] for mode, model in self.mode_models.items()}
+    
     def is_enabled(self) -> bool:
         """Vérifie si la génération d'images est activée"""
         return self.enabled and bool(self.api_key) and self.api_key != 'your_stability_api_key_here'
     
-    def generate_image(self, prompt: str, cocktail_name: str = "") -> Optional[str]:
+    def generate_image(self, prompt: str, cocktail_name: str = "", user=None) -> Optional[str]:
         """Génère une image de cocktail via Stability AI avec optimisation des coûts"""
         if not self.is_enabled():
             logger.info("🖼️ Génération d'images désactivée - Image placeholder utilisée")
-            return self._generate_placeholder_image()
+            return self._generate_placeholder_image(cocktail_name)
+        
+        # Le budget de crédits peut imposer un mode moins cher pour cette génération ;
+        # son coût est réservé tout de suite et remboursé si aucune image n'est payée
+        mode_costs = {**self._mode_costs(), self.cost_mode: self.model_costs.get(self.model)}
+        reservation = credit_governor.reserve(self.cost_mode, user, mode_costs)
+        cost_mode = reservation.mode
+        if cost_mode == 'placeholder':
+            return self._generate_placeholder_image(cocktail_name)
+        model = self.model if cost_mode == self.cost_mode else self.mode_models[cost_mode]
+        paid = False
         
         try:
-            cost = self.model_costs.get(self.model, 'Inconnu')
-            logger.info(f"🎨 Génération d'image Stability AI - Modèle: {self.model} ({cost} crédits)")
+            cost = self.model_costs.get(model, 'Inconnu')
+            logger.info(f"🎨 Génération d'image Stability AI - Modèle: {model} ({cost} crédits)")
             
             # Adapter le prompt pour les cocktails (simplifié pour réduire les coûts)
-            if self.cost_mode == 'economic':
+            if cost_mode == 'economic':
                 enhanced_prompt = f"{cocktail_name} cocktail, simple glass, clean background"
-            elif self.cost_mode == 'balanced':
+            elif cost_mode == 'balanced':
                 enhanced_prompt = f"{cocktail_name} cocktail, {prompt}, elegant glass, simple setup"
             else:  # quality
                 enhanced_prompt = f"Professional photograph of {cocktail_name} cocktail, {prompt}, elegant glassware, garnish, bar setting, high quality"
@@ -94,10 +123,10 @@ class StabilityAIService:
             }
             
             # URL de l'endpoint selon le modèle
-            if self.model == 'sdxl-1-0':
+            if model == 'sdxl-1-0':
                 endpoint = f"{self.base_url}/v1/generation/stable-diffusion-xl-1024-v1-0/text-to-image"
                 # Paramètres spécifiques SDXL - dimensions minimums requises
-                if self.cost_mode == 'economic':
+                if cost_mode == 'economic':
                     # Utiliser la plus petite dimension autorisée pour économiser
                     width, height = 1024, 1024  # Carré minimum
                 else:
@@ -111,6 +140,7 @@ class StabilityAIService:
                     'samples': 1,  # Une seule image
                     'steps': 20,   # Minimum d'étapes
                 }
+                dimensions = f"{width}x{height}"
             else:
                 # Pour les nouveaux modèles SD3.5
                 endpoint = f"{self.base_url}/v2beta/stable-image/generate/sd3"
@@ -122,91 +152,84 @@ class StabilityAIService:
                 }
                 
                 # Paramètres spécifiques selon le mode économique
-                if self.cost_mode == 'economic':
+                if cost_mode == 'economic':
                     data.update({
                         'style_preset': 'photographic',  # Style simple
                         'steps': 20,  # Moins d'étapes = plus rapide et moins cher
                         'cfg_scale': 7,  # Configuration standard
                     })
+                dimensions = data['aspect_ratio']
             
-            # Faire la requête
-            response = requests.post(endpoint, headers=headers, json=data, timeout=60)
+            # Une requête identique a déjà été payée : réutiliser l'image
+            cache_key = image_cache.make_key(model, cost_mode, enhanced_prompt, dimensions, data.get('steps'))
+            cached_path = image_cache.get(cache_key, credits=cost if isinstance(cost, (int, float)) else 0)
+            if cached_path:
+                credit_governor.refund(reservation)
+                logger.info(f"💾 Image servie depuis le cache ({cost} crédits économisés): {cached_path}")
+                return cached_path
             
-            if response.status_code == 200:
-                # Traiter la réponse selon le modèle
-                if self.model == 'sdxl-1-0':
-                    # SDXL retourne du JSON avec base64
-                    response_data = response.json()
-                    if 'artifacts' in response_data and response_data['artifacts']:
-                        import base64
-                        image_data = base64.b64decode(response_data['artifacts'][0]['base64'])
-                        image_path = self._save_generated_image(image_data, cocktail_name)
-                    else:
-                        raise Exception("Pas d'image dans la réponse SDXL")
+            # Faire la requête en flux : la réponse n'est jamais entièrement chargée en mémoire
+            with requests.post(endpoint, headers=headers, json=data, timeout=60, stream=True) as response:
+                if response.status_code == 200:
+                    paid = True
+                    chunks = response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+                    # Traiter la réponse selon le modèle
+                    if model == 'sdxl-1-0':
+                        # SDXL retourne du JSON avec base64, décodé au fil de l'eau
+                        chunks = iter_base64_artifact(chunks)
+                    # Les nouveaux modèles retournent du binaire direct
+                    image_path = self._save_generated_stream(chunks, cocktail_name)
+                    
+                    if image_store.is_stored_path(image_path):
+                        image_cache.set(cache_key, image_path)
+                    
+                    logger.info(f"✅ Image générée ({cost} crédits utilisés): {image_path}")
+                    return image_path
+                    
+                credit_governor.refund(reservation)
+                if response.status_code == 402:
+                    logger.warning("💳 Crédits Stability AI épuisés - Utilisation d'image placeholder")
+                    credit_governor.mark_provider_exhausted()
+                    return self._generate_placeholder_image(cocktail_name)
+                elif response.status_code == 401:
+                    logger.error("🔑 Clé API Stability AI invalide")
+                    return self._generate_placeholder_image(cocktail_name)
                 else:
-                    # Nouveaux modèles retournent du binaire direct
-                    image_path = self._save_generated_image(response.content, cocktail_name)
-                
-                logger.info(f"✅ Image générée ({cost} crédits utilisés): {image_path}")
-                return image_path
-                
-            elif response.status_code == 402:
-                logger.warning("💳 Crédits Stability AI épuisés - Utilisation d'image placeholder")
-                return self._generate_placeholder_image()
-            elif response.status_code == 401:
-                logger.error("🔑 Clé API Stability AI invalide")
-                return self._generate_placeholder_image()
-            else:
-                logger.error(f"❌ Erreur API Stability AI: {response.status_code} - {response.text}")
-                return self._generate_placeholder_image()
+                    logger.error(f"❌ Erreur API Stability AI: {response.status_code} - {response.text}")
+                    return self._generate_placeholder_image(cocktail_name)
                 
         except Exception as e:
             logger.error(f"❌ Erreur génération Stability AI: {e}")
-            return self._generate_placeholder_image()
+            if not paid:
+                credit_governor.refund(reservation)
+            return self._generate_placeholder_image(cocktail_name)
     
     def _save_generated_image(self, image_data: bytes, cocktail_name: str) -> str:
-        """Sauvegarde l'image générée dans le dossier media"""
-        import os
-        from django.conf import settings
-        from pathlib import Path
-        import hashlib
-        
+        """Sauvegarde une image déjà en mémoire dans le stockage adressé par contenu"""
+        return self._save_generated_stream([image_data], cocktail_name)
+    
+    def _save_generated_stream(self, chunks: Iterable[bytes], cocktail_name: str) -> str:
+        """Sauvegarde l'image générée, reçue par morceaux, dans le stockage adressé par contenu (dédupliqué)"""
         try:
-            # Créer un nom de fichier unique
-            name_hash = hashlib.md5(cocktail_name.encode()).hexdigest()[:8]
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"cocktail_{name_hash}_{timestamp}.jpg"
-            
-            # Chemin du dossier media/cocktail_images
-            media_root = Path(settings.MEDIA_ROOT)
-            cocktail_dir = media_root / 'cocktail_images'
-            cocktail_dir.mkdir(exist_ok=True)
-            
-            # Chemin complet du fichier
-            file_path = cocktail_dir / filename
-            
-            # Sauvegarder l'image
-            with open(file_path, 'wb') as f:
-                f.write(image_data)
-            
+            image_path = image_store.save_stream(chunks)
+            logger.info(f"💾 Image de '{cocktail_name}' stockée: {image_path}")
             # Retourner le chemin relatif pour la DB
-            return f"cocktail_images/{filename}"
+            return image_path
             
         except Exception as e:
             logger.error(f"❌ Erreur sauvegarde image: {e}")
-            return self._generate_placeholder_image()
+            return self._generate_placeholder_image(cocktail_name)
     
-    def _generate_placeholder_image(self) -> str:
-        """Génère une image placeholder"""
-        placeholder_images = [
-            "placeholder_2ed8a5ba.jpg",
-            "placeholder_3d0a5333.jpg", 
-            "placeholder_401ddb34.jpg",
-            "placeholder_5c46358c.jpg",
-            "placeholder_9f138c66.jpg",
-            "placeholder_ba0d131b.jpg"
-        ]
-        return f"cocktail_images/{random.choice(placeholder_images)}"
+    def _generate_placeholder_image(self, cocktail_name: str = "") -> str:
+        """
+        Retourne une image placeholder.
+
+        Le choix dépend uniquement du nom du cocktail : un même cocktail garde
+        toujours la même URL, que navigateurs et CDN peuvent mettre en cache.
+        """
+        seed = hashlib.sha256(cocktail_name.strip().lower().encode('utf-8')).digest()
+        index = int.from_bytes(seed[:4], 'big') % len(PLACEHOLDER_IMAGES)
+        return f"{IMAGES_DIR}/{PLACEHOLDER_IMAGES[index]}"
     
     def get_status(self) -> Dict[str, Any]:
         """Retourne le statut du service de génération d'images"""
@@ -219,7 +242,8 @@ class StabilityAIService:
             'cost_per_image': f"{cost_per_image} crédits" if isinstance(cost_per_image, (int, float)) else cost_per_image,
             'cost_in_usd': f"${cost_per_image * 0.01:.3f}" if isinstance(cost_per_image, (int, float)) else "Inconnu",
             'ready': self.is_enabled(),
-            'optimization': 'Résolution réduite, moins d\'étapes' if self.cost_mode == 'economic' else 'Standard'
+            'optimization': 'Résolution réduite, moins d\'étapes' if self.cost_mode == 'economic' else 'Standard',
+            'cache': image_cache.get_stats()
         }
     
     def enable_image_generation(self):
@@ -608,7 +632,7 @@ class UnifiedCocktailService(BaseAIService):
         self.cocktail_graph = graph.compile()
         logger.info("🔄 Workflow LangGraph de génération de cocktails initialisé")
     
-    def generate_cocktail(self, user_prompt: str, context: str = "", generate_image: bool = True) -> Dict[str, Any]:
+    def generate_cocktail(self, user_prompt: str, context: str = "", generate_image: bool = True, user=None) -> Dict[str, Any]:
         """Génère un cocktail en utilisant le workflow LangGraph ou une approche directe"""
         service_name = "Mistral" if self.ai_service_type == "mistral" else "Ollama"
         logger.info(f"🚀 Génération IA {service_name} pour: '{user_prompt}' (image: {generate_image})")
@@ -616,16 +640,16 @@ class UnifiedCocktailService(BaseAIService):
         try:
             if self.ai_service_type == "mistral":
                 # Pour Mistral, utilise une approche directe sans LangGraph
-                return self._generate_cocktail_direct_mistral(user_prompt, context, generate_image)
+                return self._generate_cocktail_direct_mistral(user_prompt, context, generate_image, user)
             else:
                 # Pour Ollama, utilise le workflow LangGraph complet
-                return self._generate_cocktail_workflow(user_prompt, context, generate_image)
+                return self._generate_cocktail_workflow(user_prompt, context, generate_image, user)
                 
         except Exception as e:
             logger.error(f"❌ Erreur génération cocktail {service_name}: {e}")
             raise Exception(f"Impossible de générer le cocktail: {e}")
     
-    def _generate_cocktail_workflow(self, user_prompt: str, context: str = "", generate_image: bool = True) -> Dict[str, Any]:
+    def _generate_cocktail_workflow(self, user_prompt: str, context: str = "", generate_image: bool = True, user=None) -> Dict[str, Any]:
         """Génération avec workflow LangGraph (pour Ollama)"""
         logger.info(f"🦙 Génération avec workflow LangGraph (image: {generate_image})")
         
@@ -646,7 +670,8 @@ class UnifiedCocktailService(BaseAIService):
         if generate_image:
             image_url = self.stability_service.generate_image(
                 final_state["image_prompt"], 
-                cocktail_data['name']
+                cocktail_data['name'],
+                user=user
             )
             cocktail_data['image_url'] = image_url
         else:
@@ -659,7 +684,7 @@ class UnifiedCocktailService(BaseAIService):
         logger.info(f"✅ Cocktail généré via workflow: {cocktail_data['name']}")
         return cocktail_data
     
-    def _generate_cocktail_direct_mistral(self, user_prompt: str, context: str = "", generate_image: bool = True) -> Dict[str, Any]:
+    def _generate_cocktail_direct_mistral(self, user_prompt: str, context: str = "", generate_image: bool = True, user=None) -> Dict[str, Any]:
         """Génération directe pour Mistral (même qualité, sans LangGraph)"""
         logger.info(f"🌟 Génération directe Mistral (image: {generate_image})")
         
@@ -707,7 +732,7 @@ IMPORTANT:
             
             # Générer l'image avec Stability AI ou placeholder seulement si demandé
             if generate_image:
-                image_url = self.stability_service.generate_image(image_prompt, cocktail_data['name'])
+                image_url = self.stability_service.generate_image(image_prompt, cocktail_data['name'], user=user)
                 cocktail_data['image_url'] = image_url
             else:
                 # Pas d'image demandée
@@ -788,9 +813,9 @@ IMPORTANT:
                 'music_ambiance': 'Jazz décontracté'
             }
     
-    def generate_cocktail_recipe(self, user_prompt: str, context: str = "", generate_image: bool = True) -> Dict[str, Any]:
+    def generate_cocktail_recipe(self, user_prompt: str, context: str = "", generate_image: bool = True, user=None) -> Dict[str, Any]:
         """Alias pour compatibilité"""
-        return self.generate_cocktail(user_prompt, context, generate_image)
+        return self.generate_cocktail(user_prompt, context, generate_image, user)
     
     # ============================================================================
     # ÉTAPES DU WORKFLOW LANGGRAPH
@@ -1165,13 +1190,13 @@ IMPORTANT:
         except Exception:
             return f"Beautiful {cocktail_name} cocktail in a glass, professional photography, colorful, appetizing"
     
-    def generate_image(self, image_prompt: str, cocktail_name: str = "") -> Optional[str]:
+    def generate_image(self, image_prompt: str, cocktail_name: str = "", user=None) -> Optional[str]:
         """Génère une image via Stability AI ou placeholder"""
-        return self.stability_service.generate_image(image_prompt, cocktail_name)
+        return self.stability_service.generate_image(image_prompt, cocktail_name, user=user)
     
-    def _generate_placeholder_image(self) -> str:
-        """Génère une image placeholder"""
-        return self.stability_service._generate_placeholder_image()
+    def _generate_placeholder_image(self, cocktail_name: str = "") -> str:
+        """Retourne l'image placeholder (déterministe) du cocktail"""
+        return self.stability_service._generate_placeholder_image(cocktail_name)
     
     def create_cocktail_recipe(self, cocktail_data: Dict[str, Any], user, generation_request) -> CocktailRecipe:
         """Crée une instance CocktailRecipe Django à partir des données IA"""
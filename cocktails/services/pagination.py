@@ -0,0 +1,246 @@
+"""
+Pagination par clé (keyset) des listes de cocktails
+La page suivante reprend après le dernier élément vu ((created_at, id) ou (name, id)) au lieu de
+sauter N lignes : coût constant quelle que soit la profondeur, ordre stable malgré les insertions
+"""
+
+import base64
+import binascii
+import json
+import uuid
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+# Tris disponibles : (champ, décroissant) ; id départage les égalités et rend l'ordre total
+ORDERINGS = {
+    'recent': (('created_at', True), ('id', True)),
+    'oldest': (('created_at', False), ('id', False)),
+    'name': (('name', False), ('id', False)),
+    'name_desc': (('name', True), ('id', True)),
+    'updated': (('updated_at', False), ('id', False)),
+    'ingredients': (('ingredients_count', False), ('id', False)),
+    'ingredients_desc': (('ingredients_count', True), ('id', True)),
+}
+INTEGER_KEYS = ('ingredients_count',)
+DEFAULT_ORDERING = 'recent'
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    """Curseur illisible, falsifié ou émis pour un autre tri"""
+
+
+@dataclass
+class KeysetPage:
+    items: List[Any]
+    next_cursor: Optional[str] = None
+    previous_cursor: Optional[str] = None
+    count: Optional[int] = None
+    ordering: str = DEFAULT_ORDERING
+    page_size: int = DEFAULT_PAGE_SIZE
+
+
+# ============================================================================
+# CURSEURS
+# ============================================================================
+
+def _serialize(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def _deserialize(name: str, value: str):
+    if name in ('created_at', 'updated_at'):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise InvalidCursor("Date invalide dans le curseur")
+        return parsed
+    if name == 'id':
+        try:
+            return uuid.UUID(value)
+        except ValueError:
+            raise InvalidCursor("Identifiant invalide dans le curseur")
+    if name in INTEGER_KEYS:
+        try:
+            return int(value)
+        except ValueError:
+            raise InvalidCursor("Valeur invalide dans le curseur")
+    return value
+
+
+def encode_cursor(ordering: str, item, backwards: bool = False) -> str:
+    """Curseur opaque (base64 URL) : tri, valeurs de la clé du dernier élément (instance ou .values()), sens"""
+    values = [
+        _serialize(item[name] if isinstance(item, dict) else getattr(item, name))
+        for name, _ in ORDERINGS[ordering]
+    ]
+    payload = json.dumps({'o': ordering, 'v': values, 'b': int(backwards)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str, ordering: str):
+    """(valeurs de la clé, sens arrière) ; InvalidCursor si le curseur n'est pas exploitable"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        cursor_ordering, raw_values, backwards = payload['o'], payload['v'], bool(payload.get('b'))
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+        raise InvalidCursor("Curseur illisible")
+
+    if cursor_ordering != ordering:
+        raise InvalidCursor("Curseur émis pour un autre tri")
+    keys = ORDERINGS[ordering]
+    if not isinstance(raw_values, list) or len(raw_values) != len(keys):
+        raise InvalidCursor("Curseur incomplet")
+    return [_deserialize(name, str(value)) for (name, _), value in zip(keys, raw_values)], backwards
+
+
+# ============================================================================
+# PAGINATION
+# ============================================================================
+
+def _after(ordering: str, values, backwards: bool) -> Q:
+    """
+    Éléments situés après la clé dans le sens de lecture
+    Forme a <= va AND (a < va OR b < vb) : la borne sur a reste utilisable par l'index
+    """
+    (first, first_desc), (second, second_desc) = ORDERINGS[ordering]
+    first_value, second_value = values
+    first_desc ^= backwards
+    second_desc ^= backwards
+
+    first_op = 'lt' if first_desc else 'gt'
+    second_op = 'lt' if second_desc else 'gt'
+    bound = 'lte' if first_desc else 'gte'
+    return Q(**{f'{first}__{bound}': first_value}) & (
+        Q(**{f'{first}__{first_op}': first_value}) | Q(**{f'{second}__{second_op}': second_value})
+    )
+
+
+def filter_after(queryset, ordering: str, cursor: str):
+    """Éléments situés après le curseur, en lecture vers l'avant (export, synchronisation)"""
+    values, _ = decode_cursor(cursor, ordering)
+    return queryset.filter(_after(ordering, values, False))
+
+
+def _order_by(ordering: str, backwards: bool = False) -> List[str]:
+    return [
+        f"{'-' if descending ^ backwards else ''}{name}"
+        for name, descending in ORDERINGS[ordering]
+    ]
+
+
+def ordered(queryset, ordering: str = DEFAULT_ORDERING):
+    """Queryset trié comme les pages par curseur (utile pour une pagination par numéro cohérente)"""
+    return queryset.order_by(*_order_by(ordering))
+
+
+def parse_page_size(value, default: int = DEFAULT_PAGE_SIZE) -> int:
+    try:
+        return max(1, min(int(value), MAX_PAGE_SIZE)) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        return default
+
+
+def paginate(queryset, ordering: str = DEFAULT_ORDERING, cursor: Optional[str] = None,
+             page_size: int = DEFAULT_PAGE_SIZE, count=None) -> KeysetPage:
+    """
+    Page de queryset selon le tri et le curseur
+    count : total déjà connu (statistiques matérialisées), callable appelé à la demande, ou None
+    """
+    if ordering not in ORDERINGS:
+        raise InvalidCursor(f"Tri inconnu: {ordering}")
+
+    backwards = False
+    if cursor:
+        values, backwards = decode_cursor(cursor, ordering)
+        queryset = queryset.filter(_after(ordering, values, backwards))
+
+    # Un élément de plus pour savoir s'il existe une page suivante
+    rows = list(queryset.order_by(*_order_by(ordering, backwards))[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    page = KeysetPage(items=rows, ordering=ordering, page_size=page_size)
+    if rows:
+        if backwards:
+            # Lecture en arrière : has_more indique des pages encore plus anciennes dans l'ordre d'affichage
+            page.previous_cursor = encode_cursor(ordering, rows[0], backwards=True) if has_more else None
+            page.next_cursor = encode_cursor(ordering, rows[-1])
+        else:
+            page.next_cursor = encode_cursor(ordering, rows[-1]) if has_more else None
+            page.previous_cursor = encode_cursor(ordering, rows[0], backwards=True) if cursor else None
+
+    page.count = count() if callable(count) else count
+    return page
+
+
+def page_payload(page: KeysetPage, results) -> dict:
+    payload = {
+        'results': results,
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.previous_cursor,
+        'ordering': page.ordering,
+        'page_size': page.page_size,
+    }
+    if page.count is not None:
+        payload['count'] = page.count
+    return payload
+
+
+def wants_count(request) -> bool:
+    """?count=0 évite le COUNT(*) (inutile pour un défilement infini)"""
+    return request.query_params.get('count', '1').lower() not in ('0', 'false', 'no')
+
+
+# ============================================================================
+# DRF
+# ============================================================================
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination par curseur pour les ViewSets : ?cursor=&ordering=recent|oldest|name|name_desc|updated|ingredients|ingredients_desc&page_size=
+    ?page=N conserve l'ancienne pagination par numéro de page (OFFSET) pour les clients existants
+    La vue peut fournir get_keyset_count() pour éviter le COUNT(*) (statistiques matérialisées)
+    """
+
+    page_size = api_settings.PAGE_SIZE or DEFAULT_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.legacy = None
+        if 'page' in request.query_params:
+            self.legacy = PageNumberPagination()
+            return self.legacy.paginate_queryset(queryset, request, view)
+
+        count = None
+        if wants_count(request):
+            count = getattr(view, 'get_keyset_count', queryset.count)
+        try:
+            self.page = paginate(
+                queryset,
+                ordering=request.query_params.get('ordering', DEFAULT_ORDERING),
+                cursor=request.query_params.get('cursor'),
+                page_size=parse_page_size(request.query_params.get('page_size'), default=self.page_size),
+                count=count,
+            )
+        except InvalidCursor as e:
+            raise ValidationError({'cursor': str(e)})
+        return self.page.items
+
+    def get_paginated_response(self, data):
+        if self.legacy is not None:
+            return self.legacy.get_paginated_response(data)
+        return Response(page_payload(self.page, data))
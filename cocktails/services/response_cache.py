@@ -0,0 +1,151 @@
+"""
+Cache des réponses de lecture par utilisateur (statistiques, favoris, historique, carousel, détail,
+cocktails similaires)
+Chaque clé contient la « version des données » de l'utilisateur : toute écriture sur ses cocktails
+ou ses demandes incrémente la version, les anciennes entrées ne sont plus jamais lues et expirent
+seules (TTL, éviction du backend) — aucune suppression de clé à orchestrer
+"""
+
+import hashlib
+import json
+import time
+from typing import Any, Callable, Dict
+
+from django.core.cache import caches
+from django.db import transaction
+
+
+CACHE_ALIAS = 'responses'
+KEY_PREFIX = 'responses:'
+VERSION_KEY = 'responses:version:{user_id}'
+HITS_KEY = 'responses:stats:hits:{name}'
+MISSES_KEY = 'responses:stats:misses:{name}'
+INVALIDATIONS_KEY = 'responses:stats:invalidations'
+
+# Réponses mises en cache (les compteurs de get_stats() sont tenus par nom)
+CACHED_RESPONSES = ('stats', 'favorites', 'history', 'slides', 'detail', 'similar')
+
+_MISSING = object()
+
+
+class ResponseCache:
+    """Cache versionné partagé entre workers (Redis en production, mémoire locale en développement)"""
+
+    def __init__(self, alias: str = CACHE_ALIAS):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    # ------------------------------------------------------------------
+    # Version des données
+    # ------------------------------------------------------------------
+
+    def version(self, user_id) -> int:
+        """
+        Version courante des données de l'utilisateur
+        Initialisée à l'horloge en nanosecondes : une version évincée puis recréée ne retombe jamais
+        sur une valeur déjà utilisée, donc jamais sur des entrées périmées encore présentes
+        """
+        key = VERSION_KEY.format(user_id=user_id)
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, time.time_ns(), timeout=None)
+            version = self.cache.get(key, time.time_ns())
+        return version
+
+    def bump(self, user_id):
+        """Passe à une nouvelle version : toutes les réponses de l'utilisateur deviennent obsolètes"""
+        key = VERSION_KEY.format(user_id=user_id)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # Version absente (jamais lue ou évincée) : la prochaine lecture en crée une nouvelle
+            pass
+        self._incr(INVALIDATIONS_KEY)
+
+    def reset(self, user_id):
+        """Nouvelle version pour un nouveau compte (un identifiant réutilisé ne retrouve rien)"""
+        self.cache.set(VERSION_KEY.format(user_id=user_id), time.time_ns(), timeout=None)
+
+    def invalidate(self, user_id):
+        """
+        Invalide immédiatement, puis de nouveau à la validation de la transaction en cours :
+        une lecture concurrente ayant mis en cache l'état d'avant le COMMIT est ainsi écartée
+        """
+        if user_id is None:
+            return
+        self.bump(user_id)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(lambda: self.bump(user_id))
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def make_key(self, user_id, version: int, name: str, params: Any = None) -> str:
+        """Clé déterministe : utilisateur, version, réponse et paramètres (filtres, tri, curseur...)"""
+        digest = hashlib.md5(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        return f"{KEY_PREFIX}{user_id}:{version}:{name}:{digest}"
+
+    def get_or_compute(self, user, name: str, params: Any, compute: Callable[[], Any]) -> Any:
+        """
+        Réponse en cache pour la version courante, sinon compute() mis en cache
+        La version est lue AVANT le calcul : une écriture pendant le calcul range le résultat
+        sous l'ancienne version, qui n'est plus lue
+        """
+        key = self.make_key(user.pk, self.version(user.pk), name, params)
+        value = self.cache.get(key, _MISSING)
+        if value is not _MISSING:
+            self._incr(HITS_KEY.format(name=name))
+            return value
+
+        self._incr(MISSES_KEY.format(name=name))
+        value = compute()
+        self.cache.set(key, value)
+        return value
+
+    # ------------------------------------------------------------------
+    # Métriques
+    # ------------------------------------------------------------------
+
+    def _incr(self, key: str, delta: int = 1):
+        self.cache.add(key, 0, timeout=None)
+        try:
+            self.cache.incr(key, delta)
+        except ValueError:
+            # Compteur évincé entre add() et incr()
+            self.cache.set(key, delta, timeout=None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Taux de succès global et par réponse (tous workers confondus avec Redis)"""
+        keys = [HITS_KEY.format(name=name) for name in CACHED_RESPONSES]
+        keys += [MISSES_KEY.format(name=name) for name in CACHED_RESPONSES]
+        counters = self.cache.get_many(keys + [INVALIDATIONS_KEY])
+
+        responses = {}
+        total_hits = total_misses = 0
+        for name in CACHED_RESPONSES:
+            hits = counters.get(HITS_KEY.format(name=name), 0)
+            misses = counters.get(MISSES_KEY.format(name=name), 0)
+            total_hits += hits
+            total_misses += misses
+            responses[name] = {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': round(hits / (hits + misses), 3) if hits + misses else 0.0,
+            }
+
+        total = total_hits + total_misses
+        return {
+            'backend': self.cache.__class__.__name__,
+            'hits': total_hits,
+            'misses': total_misses,
+            'hit_rate': round(total_hits / total, 3) if total else 0.0,
+            'invalidations': counters.get(INVALIDATIONS_KEY, 0),
+            'responses': responses,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,299 @@
+"""
+Recherche plein texte des cocktails : nom, description, noms d'ingrédients et prompt d'origine
+PostgreSQL : colonne tsvector (configuration french_unaccent) indexée en GIN, maintenue par trigger
+(voir la migration 0010_recipe_search)
+SQLite (développement) : pas d'index, les cocktails du queryset (ceux d'un utilisateur, par l'index
+user) sont comparés par cocktails_search_rank() ; un MATCH FTS5 développait les préfixes sur tout le
+corpus et restait plus lent à cette échelle (voir Test/bench_search.py)
+"""
+
+import html
+import json
+import logging
+import re
+import threading
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from cocktails.services.ingredients import iter_ingredients
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CONFIG = 'french_unaccent'
+
+# Textes recherchés et leurs poids (A, B, C, D côté PostgreSQL)
+SEARCH_COLUMNS = ('name', 'description', 'ingredients', 'prompt')
+SEARCH_WEIGHTS = (10.0, 4.0, 2.0, 1.0)
+
+# Nombre maximal de mots pris en compte dans une recherche
+MAX_TERMS = 8
+# Rangs de cocktails_search_rank() gardés par thread (SQLite, historique d'un utilisateur)
+SCAN_CACHE_SIZE = 4096
+SNIPPET_WORDS = 16
+
+# Marqueurs posés par la base autour des termes trouvés, remplacés par <mark> après échappement
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_STOP = '\x03'
+
+def _terms(query: str) -> List[str]:
+    """Mots de la recherche (lettres et chiffres uniquement : rien à échapper côté SQL)"""
+    return re.findall(r'[^\W_]+', query.lower())[:MAX_TERMS]
+
+
+class _FoldTable(dict):
+    """Table de str.translate() remplie à la demande : un caractère -> sa lettre de base en minuscule"""
+
+    def __missing__(self, code: int) -> str:
+        self[code] = unicodedata.normalize('NFKD', chr(code))[0].lower()[0]
+        return self[code]
+
+
+_FOLD = _FoldTable()
+
+
+def fold(text: Optional[str]) -> str:
+    """Minuscules sans accents, caractère pour caractère : les positions restent celles du texte d'origine"""
+    if not text:
+        return ''
+    return text.lower() if text.isascii() else text.translate(_FOLD)
+
+
+@lru_cache(maxsize=64)
+def _word_prefix(terms: str) -> 're.Pattern':
+    """Mots commençant par l'un des termes, dans un texte replié (même règle que 'terme:*' de PostgreSQL)"""
+    return re.compile(rf"(?<![^\W_])(?:{'|'.join(map(re.escape, terms.split()))})[^\W_]*")
+
+
+@lru_cache(maxsize=1)
+def _variants() -> Dict[str, str]:
+    """Lettre de base -> toutes ses formes accentuées (latin étendu), pour chercher sans replier le texte"""
+    variants: Dict[str, set] = {}
+    for code in range(0xC0, 0x250):
+        char = chr(code).lower()
+        base = fold(char)
+        if base != char and base.isascii():
+            variants.setdefault(base, {base}).add(char)
+    return {base: ''.join(sorted(chars)) for base, chars in variants.items()}
+
+
+@lru_cache(maxsize=64)
+def _accent_prefix(term: str) -> 're.Pattern':
+    """Terme replié, accents et majuscules compris : "epice" trouve "Épicée" (début de mot vérifié à part)"""
+    variants = _variants()
+    body = ''.join(f'[{variants[char]}]' if char in variants else re.escape(char) for char in term)
+    return re.compile(body, re.IGNORECASE)
+
+
+def _starts_word(pattern: 're.Pattern', text: str) -> bool:
+    """Une occurrence au début d'un mot (un lookbehind dans l'expression triplerait le coût du parcours)"""
+    return any(not match.start() or not text[match.start() - 1].isalnum() for match in pattern.finditer(text))
+
+
+def scan_rank(*args) -> float:
+    """
+    Fonction SQLite cocktails_search_rank(nom, description, ingrédients, prompt, termes repliés) :
+    somme des poids des colonnes où chaque terme commence un mot, 0 si un terme manque
+    Les textes ne sont ni repliés ni décodés : une expression régulière par terme, exécutée en C,
+    d'abord sur les quatre textes réunis (la plupart des lignes s'arrêtent là)
+    SQLite l'évalue deux fois par ligne (WHERE puis SELECT, en deux passes avec la fenêtre du total) :
+    résultats gardés par thread, le temps de quelques requêtes
+    """
+    ranks = getattr(_scan_ranks, 'cache', None)
+    if ranks is None or len(ranks) >= SCAN_CACHE_SIZE:
+        ranks = _scan_ranks.cache = {}
+    if args not in ranks:
+        ranks[args] = _scan_rank(*args)
+    return ranks[args]
+
+
+_scan_ranks = threading.local()
+
+
+def _scan_rank(name, description, ingredients, prompt, terms) -> float:
+    # JSON brut lu tel quel par SQLite, échappements \uXXXX décodés ; il contient aussi les clés et
+    # les quantités : les noms des ingrédients ne sont extraits que si un terme y commence un mot
+    raw = ingredients or ''
+    if '\\u' in raw and raw.isascii():
+        raw = raw.encode('ascii').decode('unicode_escape', 'ignore')
+    texts = (name or '', description or '', raw, prompt or '')
+    joined = '\n'.join(texts)
+    names = None
+    rank = 0.0
+    for term in terms.split():
+        pattern = _accent_prefix(term)
+        if not pattern.search(joined):
+            return 0.0
+        found = [_starts_word(pattern, text) for text in texts]
+        if found[2]:
+            if names is None:
+                names = _ingredient_names(ingredients)
+            found[2] = _starts_word(pattern, names)
+        weight = sum(w for hit, w in zip(found, SEARCH_WEIGHTS) if hit)
+        if not weight:
+            return 0.0
+        rank += weight
+    return rank
+
+
+def _ingredient_names(raw: Optional[str]) -> str:
+    try:
+        items = json.loads(raw or '[]')
+    except ValueError:
+        return ''
+    return ' '.join(line['name'] for line in iter_ingredients(items))
+
+
+def register_sqlite_functions(sender=None, connection=None, **kwargs):
+    """Receveur de connection_created : déclare cocktails_search_rank() sur les connexions SQLite"""
+    if connection is not None and connection.vendor == 'sqlite':
+        connection.connection.create_function(
+            'cocktails_search_rank', len(SEARCH_COLUMNS) + 1, scan_rank, deterministic=True
+        )
+
+
+def _mark(text: Optional[str], terms: List[str]) -> str:
+    """Marqueurs de surlignage posés en Python, comme ts_headline() côté PostgreSQL"""
+    text = text or ''
+    marked, last = [], 0
+    for match in _word_prefix(' '.join(terms)).finditer(fold(text)):
+        marked += [text[last:match.start()], HIGHLIGHT_START, text[match.start():match.end()], HIGHLIGHT_STOP]
+        last = match.end()
+    return ''.join(marked) + text[last:]
+
+
+def backend() -> Optional[str]:
+    """Moteur plein texte de la base courante (None : repli sur icontains)"""
+    if connection.vendor in ('postgresql', 'sqlite'):
+        return connection.vendor
+    return None
+
+
+def _postgres_query(terms: List[str]) -> str:
+    # Chaque mot est un préfixe, tous doivent être présents
+    return ' & '.join(f"{term}:*" for term in terms)
+
+
+def _scan_columns(table: str) -> str:
+    """Textes de cocktails_search_rank() lus sur la ligne du cocktail (ingrédients en JSON brut)"""
+    prompt = f'(SELECT "user_prompt" FROM "cocktails_generationrequest" WHERE "id" = "{table}"."generation_request_id")'
+    return f'"{table}"."name", "{table}"."description", "{table}"."ingredients", {prompt}'
+
+
+def search(queryset, query: str):
+    """
+    Filtre les cocktails correspondant à la recherche et les ordonne par pertinence
+    Ajoute l'annotation search_rank (plus élevée = plus pertinent)
+    SQLite : chaque cocktail du queryset est comparé, à filtrer d'abord (cocktails d'un utilisateur)
+    """
+    terms = _terms(query)
+    if not terms:
+        return queryset.none()
+
+    table = queryset.model._meta.db_table
+    engine = backend()
+
+    if engine == 'postgresql':
+        tsquery = f"to_tsquery('{SEARCH_CONFIG}', %s)"
+        params = [_postgres_query(terms)]
+        queryset = queryset.filter(
+            RawSQL(f'"{table}"."search_vector" @@ {tsquery}', params, output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(f'ts_rank_cd("{table}"."search_vector", {tsquery})', params, output_field=FloatField())
+        )
+    elif engine == 'sqlite':
+        rank = f'cocktails_search_rank({_scan_columns(table)}, %s)'
+        folded = ' '.join(fold(term) for term in terms)
+        queryset = queryset.extra(
+            where=[f'{rank} > 0'],
+            params=[folded],
+            select={'search_rank': rank},
+            select_params=[folded],
+        )
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= Q(name__icontains=term) | Q(description__icontains=term)
+        queryset = queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    return queryset.order_by('-search_rank', '-created_at')
+
+
+def highlights(recipes: Iterable, query: str) -> Dict[str, str]:
+    """
+    Extraits HTML (<mark>) des cocktails déjà paginés, par id
+    Calculés en une requête sur la page seulement : ts_headline est coûteux
+    """
+    from cocktails.models import CocktailRecipe
+
+    terms = _terms(query)
+    ids = [recipe.pk for recipe in recipes]
+    if not terms or not ids:
+        return {}
+
+    table = CocktailRecipe._meta.db_table
+    queryset = CocktailRecipe.objects.filter(pk__in=ids)
+    engine = backend()
+
+    if engine == 'postgresql':
+        options = (
+            f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, "
+            f"MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 2}"
+        )
+        snippet = RawSQL(
+            f"""ts_headline('{SEARCH_CONFIG}', "{table}"."name" || ' — ' || "{table}"."description", """
+            f"""to_tsquery('{SEARCH_CONFIG}', %s), %s)""",
+            [_postgres_query(terms), options]
+        )
+        rows = queryset.annotate(search_snippet=snippet).values_list('pk', 'search_snippet')
+        return {str(pk): _to_html(raw) for pk, raw in rows if raw}
+
+    if engine == 'sqlite':
+        # Mêmes textes que search(), termes surlignés en Python
+        rows = queryset.values_list('pk', 'name', 'description', 'ingredients', 'generation_request__user_prompt')
+        folded = [fold(term) for term in terms]
+        return {
+            str(pk): _to_html(_excerpt([
+                _mark(text, folded)
+                for text in (name, description, ' '.join(line['name'] for line in iter_ingredients(items)), prompt)
+            ]))
+            for pk, name, description, items, prompt in rows
+        }
+
+    return {}
+
+
+def _excerpt(texts: List[Optional[str]]) -> str:
+    """Fenêtre de SNIPPET_WORDS mots autour du premier terme trouvé, dans la colonne la plus pertinente"""
+    # À égalité, l'ordre des colonnes (nom, description, ingrédients, prompt) départage
+    text = max((text or '' for text in texts), key=lambda text: text.count(HIGHLIGHT_START))
+    words = text.split()
+    first = next((index for index, word in enumerate(words) if HIGHLIGHT_START in word), 0)
+    start = max(0, first - SNIPPET_WORDS // 4)
+    excerpt = ' '.join(words[start:start + SNIPPET_WORDS])
+    if start > 0:
+        excerpt = f"…{excerpt}"
+    if start + SNIPPET_WORDS < len(words):
+        excerpt = f"{excerpt}…"
+    return excerpt
+
+
+def _to_html(raw: str) -> str:
+    """Échappe le texte (contenu généré) puis transforme les marqueurs en <mark>"""
+    return html.escape(raw).replace(HIGHLIGHT_START, '<mark>').replace(HIGHLIGHT_STOP, '</mark>')
+
+
+def rebuild_index() -> int:
+    """Recalcule le tsvector de tous les cocktails (le trigger fait le calcul) ; PostgreSQL seulement"""
+    from cocktails.models import CocktailRecipe
+
+    if backend() != 'postgresql':
+        logger.warning("⚠️ Aucun index plein texte sur cette base, rien à recalculer")
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'UPDATE "{CocktailRecipe._meta.db_table}" SET "search_vector" = NULL')
+        return cursor.rowcount
@@ -0,0 +1,290 @@
+"""
+Statistiques matérialisées des cocktails par utilisateur
+Les compteurs de UserCocktailStats et les cumuls journaliers sont mis à jour par delta
+à chaque création, suppression ou modification (favori, note, catégories) d'un cocktail
+"""
+
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+ALCOHOL_LEVELS = ('none', 'low', 'medium', 'high')
+DIFFICULTY_LEVELS = ('easy', 'medium', 'hard')
+
+COUNTER_FIELDS = (
+    'total', 'favorites',
+    *(f'alcohol_{level}' for level in ALCOHOL_LEVELS),
+    *(f'difficulty_{level}' for level in DIFFICULTY_LEVELS),
+    'rated', 'rating_sum',
+)
+
+
+def _contribution(values: Dict[str, Any]) -> Counter:
+    """Compteurs auxquels un cocktail contribue, à partir de ses valeurs"""
+    counters = Counter(total=1)
+    if values.get('is_favorite'):
+        counters['favorites'] += 1
+    if values.get('alcohol_content') in ALCOHOL_LEVELS:
+        counters[f"alcohol_{values['alcohol_content']}"] += 1
+    if values.get('difficulty_level') in DIFFICULTY_LEVELS:
+        counters[f"difficulty_{values['difficulty_level']}"] += 1
+    if values.get('rating'):
+        counters['rated'] += 1
+        counters['rating_sum'] += values['rating']
+    return counters
+
+
+def _values(instance, loaded: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Valeurs suivies d'un cocktail (celles chargées depuis la base si fournies)"""
+    deferred = instance.get_deferred_fields()
+    values = {}
+    for name in instance.STATS_TRACKED_FIELDS:
+        if loaded is not None and name in loaded:
+            values[name] = loaded[name]
+        elif name not in deferred or name == 'user_id':
+            values[name] = getattr(instance, name)
+    return values
+
+
+# Suppressions en masse : le signal post_delete n'applique plus de delta, l'appelant applique le cumul
+_paused = threading.local()
+
+
+@contextmanager
+def paused():
+    """Suspend la mise à jour incrémentale à la suppression (voir record_bulk_deleted)"""
+    previous = getattr(_paused, 'active', False)
+    _paused.active = True
+    try:
+        yield
+    finally:
+        _paused.active = previous
+
+
+def is_paused() -> bool:
+    return getattr(_paused, 'active', False)
+
+
+def _day(created_at):
+    return timezone.localdate(created_at) if created_at else timezone.localdate()
+
+
+def _apply(user_id, deltas: Dict[str, int], create_missing: bool = True):
+    """Applique les deltas au compteur de l'utilisateur (UPDATE atomique avec F())"""
+    from cocktails.models import UserCocktailStats
+
+    deltas = {name: delta for name, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    updated = UserCocktailStats.objects.filter(user_id=user_id).update(
+        **{name: F(name) + delta for name, delta in deltas.items()},
+        updated_at=timezone.now(),
+    )
+    if not updated and create_missing:
+        # Première écriture pour cet utilisateur : calcul complet (inclut déjà ce cocktail)
+        rebuild(user_id)
+
+
+def _apply_daily(user_id, day, delta: int, create_missing: bool = True):
+    from cocktails.models import UserCocktailDailyStats
+
+    if UserCocktailDailyStats.objects.filter(user_id=user_id, day=day).update(created=F('created') + delta):
+        return
+    if not create_missing:
+        return
+    try:
+        with transaction.atomic():
+            UserCocktailDailyStats.objects.create(user_id=user_id, day=day, created=delta)
+    except IntegrityError:
+        # Un autre worker a créé la ligne entre-temps
+        UserCocktailDailyStats.objects.filter(user_id=user_id, day=day).update(created=F('created') + delta)
+
+
+# ============================================================================
+# MISE À JOUR INCRÉMENTALE (appelée par les signaux)
+# ============================================================================
+
+def record_created(instance):
+    from cocktails.models import UserCocktailStats
+
+    values = _values(instance)
+    if not UserCocktailStats.objects.filter(user_id=values['user_id']).exists():
+        rebuild(values['user_id'])
+        return
+    _apply(values['user_id'], _contribution(values))
+    _apply_daily(values['user_id'], _day(values.get('created_at')), 1)
+
+
+def record_updated(instance):
+    """Applique la différence entre les valeurs chargées et les nouvelles valeurs"""
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is None:
+        return
+
+    old = _values(instance, loaded)
+    new = _values(instance)
+    if old == new:
+        return
+
+    if old.get('user_id') != new.get('user_id'):
+        # Changement de propriétaire (admin) : retrait chez l'un, ajout chez l'autre
+        _apply(old['user_id'], {k: -v for k, v in _contribution(old).items()})
+        _apply_daily(old['user_id'], _day(old.get('created_at')), -1, create_missing=False)
+        _apply(new['user_id'], _contribution(new))
+        _apply_daily(new['user_id'], _day(new.get('created_at')), 1)
+        return
+
+    deltas = Counter(_contribution(new))
+    deltas.subtract(_contribution(old))
+    _apply(new['user_id'], deltas)
+
+
+def record_deleted(instance):
+    from cocktails.models import UserCocktailStats
+
+    values = _values(instance, getattr(instance, '_loaded_values', None))
+    if len(values) < len(instance.STATS_TRACKED_FIELDS):
+        # Cocktail chargé partiellement (only/defer) : la ligne est déjà supprimée, recalcul complet
+        if UserCocktailStats.objects.filter(user_id=values['user_id']).exists():
+            rebuild(values['user_id'])
+        return
+    # Suppression en cascade de l'utilisateur : ne pas recréer ses statistiques
+    _apply(values['user_id'], {k: -v for k, v in _contribution(values).items()}, create_missing=False)
+    _apply_daily(values['user_id'], _day(values.get('created_at')), -1, create_missing=False)
+
+
+def record_bulk_deleted(user_id, rows):
+    """Retire d'un coup les cocktails supprimés (valeurs suivies lues avant le DELETE)"""
+    deltas = Counter()
+    days = Counter()
+    for values in rows:
+        deltas.subtract(_contribution(values))
+        days[_day(values.get('created_at'))] -= 1
+    _apply(user_id, deltas, create_missing=False)
+    for day, delta in days.items():
+        _apply_daily(user_id, day, delta, create_missing=False)
+
+
+def record_counter_deltas(user_id, deltas: Dict[str, int]):
+    """Deltas déjà calculés par un UPDATE en masse (favoris, notes)"""
+    _apply(user_id, deltas)
+
+
+def remember_values(instance):
+    """Les valeurs sauvegardées deviennent la référence des prochains deltas"""
+    instance._loaded_values = {**getattr(instance, '_loaded_values', {}), **_values(instance)}
+
+
+# ============================================================================
+# CALCUL COMPLET, RECONSTRUCTION ET VÉRIFICATION
+# ============================================================================
+
+def compute(user_id) -> Dict[str, Any]:
+    """Calcule les compteurs depuis CocktailRecipe (une seule requête agrégée)"""
+    from cocktails.models import CocktailRecipe
+
+    aggregates = {
+        'total': Count('pk'),
+        'favorites': Count('pk', filter=Q(is_favorite=True)),
+        'rated': Count('pk', filter=Q(rating__isnull=False)),
+        'rating_sum': Sum('rating'),
+    }
+    for level in ALCOHOL_LEVELS:
+        aggregates[f'alcohol_{level}'] = Count('pk', filter=Q(alcohol_content=level))
+    for level in DIFFICULTY_LEVELS:
+        aggregates[f'difficulty_{level}'] = Count('pk', filter=Q(difficulty_level=level))
+
+    result = CocktailRecipe.objects.filter(user_id=user_id).aggregate(**aggregates)
+    return {name: result[name] or 0 for name in COUNTER_FIELDS}
+
+
+def compute_daily(user_id) -> Dict[Any, int]:
+    from cocktails.models import CocktailRecipe
+
+    rows = (
+        CocktailRecipe.objects.filter(user_id=user_id)
+        .annotate(day=TruncDate('created_at'))
+        .values('day')
+        .annotate(created=Count('pk'))
+        .order_by()
+    )
+    return {row['day']: row['created'] for row in rows}
+
+
+@transaction.atomic
+def rebuild(user_id):
+    """Recalcule entièrement les statistiques et les cumuls journaliers d'un utilisateur"""
+    from cocktails.models import UserCocktailDailyStats, UserCocktailStats
+
+    stats, _ = UserCocktailStats.objects.update_or_create(user_id=user_id, defaults=compute(user_id))
+
+    UserCocktailDailyStats.objects.filter(user_id=user_id).delete()
+    UserCocktailDailyStats.objects.bulk_create(
+        UserCocktailDailyStats(user_id=user_id, day=day, created=created)
+        for day, created in compute_daily(user_id).items()
+    )
+    return stats
+
+
+def check(user_id) -> Dict[str, Any]:
+    """Différences entre les statistiques stockées et le calcul complet ({} si cohérent)"""
+    from cocktails.models import UserCocktailDailyStats, UserCocktailStats
+
+    expected = compute(user_id)
+    stats = UserCocktailStats.objects.filter(user_id=user_id).values(*COUNTER_FIELDS).first()
+    if stats is None:
+        return {'missing': True} if expected['total'] else {}
+
+    differences = {
+        name: {'stored': stats[name], 'expected': expected[name]}
+        for name in COUNTER_FIELDS
+        if stats[name] != expected[name]
+    }
+
+    stored_daily = {
+        row['day']: row['created']
+        for row in UserCocktailDailyStats.objects.filter(user_id=user_id).exclude(created=0).values('day', 'created')
+    }
+    if stored_daily != compute_daily(user_id):
+        differences['daily'] = True
+    return differences
+
+
+# ============================================================================
+# LECTURE
+# ============================================================================
+
+def get_stats(user):
+    """Ligne de statistiques de l'utilisateur (calculée une fois si absente)"""
+    from cocktails.models import UserCocktailStats
+
+    try:
+        return UserCocktailStats.objects.get(user=user)
+    except UserCocktailStats.DoesNotExist:
+        return rebuild(user.pk)
+
+
+def created_since(user, days: int) -> int:
+    """
+    Cocktails créés sur les `days` derniers jours calendaires, aujourd'hui compris (somme des cumuls journaliers)
+    Fenêtre en jours entiers (fuseau TIME_ZONE) et non plus glissante de days × 24 h : un cocktail créé
+    hier à 8 h compte dans les 7 derniers jours jusqu'à la fin du sixième jour suivant, quelle que soit l'heure.
+    C'est ce qui rend la valeur stable sur la journée (cache des réponses et ETag indexés par le jour)
+    """
+    from cocktails.models import UserCocktailDailyStats
+
+    since = timezone.localdate() - timedelta(days=days - 1)
+    total = UserCocktailDailyStats.objects.filter(user=user, day__gte=since).aggregate(total=Sum('created'))['total']
+    return total or 0
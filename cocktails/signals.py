@@ -0,0 +1,114 @@
+"""
+Signaux des modèles cocktails
+"""
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import CocktailRecipe, GenerationRequest
+from .services import ingredients, similarity, user_stats
+from .services.credit_governor import credit_governor
+from .services.image_derivatives import needs_derivatives, remember_image, schedule_derivatives
+from .services.image_store import image_store
+from .services.response_cache import response_cache
+from .services.similarity import similarity_index
+
+
+@receiver(post_save, sender=CocktailRecipe)
+def generate_image_variants(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Lance la génération des variantes d'image et de l'aperçu flou une fois la transaction validée"""
+    if raw:
+        return
+    if needs_derivatives(instance, created, update_fields):
+        image_url = instance.image_url
+        transaction.on_commit(lambda: schedule_derivatives(instance.pk, image_url))
+    remember_image(instance)
+
+
+@receiver(post_delete, sender=CocktailRecipe)
+def release_image(sender, instance, **kwargs):
+    """Libère l'image stockée quand plus aucun cocktail ne la référence"""
+    # Champ non chargé (only/defer) : la ligne n'existe plus, cleanup_media s'en chargera
+    if 'image_url' in instance.get_deferred_fields():
+        return
+    if instance.image_url:
+        transaction.on_commit(lambda: image_store.release(instance.image_url))
+
+
+@receiver(post_save, sender=CocktailRecipe)
+def update_similar_cocktails(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Les cocktails similaires montrent le nom et l'image : nouvelle version du corpus s'ils ont changé"""
+    if raw:
+        return
+    if similarity.shown_changed(instance, created, update_fields):
+        similarity_index.changed()
+    similarity.remember_shown(instance)
+
+
+@receiver(post_delete, sender=CocktailRecipe)
+def forget_similar_cocktail(sender, instance, **kwargs):
+    """Retire le cocktail des cocktails similaires proposés à tous les utilisateurs"""
+    similarity_index.discard([instance.pk])
+    similarity_index.changed([instance.pk])
+
+
+@receiver(post_save, sender=CocktailRecipe)
+def sync_ingredient_lines(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    """Recopie les ingrédients du cocktail dans le catalogue normalisé s'ils ont changé"""
+    # Déclaré avant update_user_stats, qui remplace les valeurs chargées (dont le propriétaire)
+    if raw or not ingredients.needs_sync(instance, created, update_fields):
+        return
+    ingredients.sync_recipe(instance)
+
+
+@receiver(post_save, sender=CocktailRecipe)
+def update_user_stats(sender, instance, created, raw=False, **kwargs):
+    """Répercute la création ou la modification du cocktail sur les statistiques de l'utilisateur"""
+    if raw:
+        return
+    if created:
+        user_stats.record_created(instance)
+    else:
+        user_stats.record_updated(instance)
+    user_stats.remember_values(instance)
+
+
+@receiver(post_delete, sender=CocktailRecipe)
+def update_user_stats_on_delete(sender, instance, **kwargs):
+    """Retire le cocktail supprimé des statistiques de l'utilisateur"""
+    if user_stats.is_paused():
+        return
+    user_stats.record_deleted(instance)
+
+
+@receiver(post_save, sender=CocktailRecipe)
+@receiver(post_save, sender=GenerationRequest)
+@receiver(post_delete, sender=GenerationRequest)
+def invalidate_cached_responses(sender, instance, raw=False, **kwargs):
+    """Nouvelle version des données de l'utilisateur : ses réponses en cache deviennent obsolètes"""
+    if raw:
+        return
+    response_cache.invalidate(instance.user_id)
+
+
+@receiver(post_delete, sender=CocktailRecipe)
+def invalidate_cached_responses_on_delete(sender, instance, **kwargs):
+    """Idem à la suppression ; les suppressions en masse invalident une seule fois pour le lot"""
+    if user_stats.is_paused():
+        return
+    response_cache.invalidate(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def reset_cached_responses(sender, instance, created, raw=False, **kwargs):
+    """Version des données propre à chaque nouveau compte"""
+    if created and not raw:
+        response_cache.reset(instance.pk)
+
+
+@receiver(pre_delete, sender=User)
+def fold_image_credit_usage(sender, instance, **kwargs):
+    """Consommation de crédits du compte supprimé reportée sur les lignes système (budget global inchangé)"""
+    credit_governor.fold_user(instance)
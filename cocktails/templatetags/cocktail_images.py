@@ -0,0 +1,17 @@
+from django import template
+
+from cocktails.services.image_derivatives import get_image_src, get_image_srcset
+
+register = template.Library()
+
+
+@register.filter
+def image_src(cocktail, size='card'):
+    """URL de la variante JPEG demandée (thumb, card, full)"""
+    return get_image_src(cocktail, size)
+
+
+@register.filter
+def image_srcset(cocktail, image_format='jpeg'):
+    """Attribut srcset de toutes les variantes d'un format (jpeg, webp)"""
+    return get_image_srcset(cocktail, image_format)
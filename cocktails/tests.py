@@ -1,3 +1,1850 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from . import views
+from .models import (
+    CocktailIngredient, CocktailRecipe, CocktailRecipeTag, GenerationRequest, ImageCreditUsage,
+    UserCocktailDailyStats, UserCocktailStats,
+)
+from .serializers import CocktailRecipeCreateSerializer
+from .services import ingredients, media_storage, search, similarity, user_stats
+from .services.credit_governor import PROVIDER_EXHAUSTED_KEY, credit_governor
+from .services.image_cache import image_cache
+from .services.image_derivatives import derivative_paths, generate_derivatives, get_image_srcset, media_url
+from .services.image_store import PLACEHOLDER_IMAGES, image_store
+from .services.image_streaming import iter_base64_artifact
+from .services.ollama_service import StabilityAIService
+from .services.response_cache import response_cache
+from .services.similarity import similarity_index
+
+
+RECIPE_TABLE = CocktailRecipe._meta.db_table
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    Vérifie via EXPLAIN que les requêtes des listes de cocktails utilisent un index
+    et ne trient pas la table (SQLite et PostgreSQL).
+    """
+
+    USERS = 40
+    RECIPES_PER_USER = 250
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create(
+            User(username=f"user{i}") for i in range(cls.USERS)
+        )
+        requests = GenerationRequest.objects.bulk_create(
+            GenerationRequest(user=user, user_prompt='prompt') for user in users
+        )
+
+        difficulties = ['easy', 'medium', 'hard']
+        alcohol_levels = ['none', 'low', 'medium', 'high']
+        CocktailRecipe.objects.bulk_create(
+            (
+                CocktailRecipe(
+                    user=user,
+                    generation_request=generation_request,
+                    name=f"Cocktail {i:04d}",
+                    description='Description',
+                    ingredients=[{'name': 'Rhum', 'quantity': '4 cl'}],
+                    difficulty_level=difficulties[i % 3],
+                    alcohol_content=alcohol_levels[i % 4],
+                    is_favorite=i % 10 == 0,
+                )
+                for user, generation_request in zip(users, requests)
+                for i in range(cls.RECIPES_PER_USER)
+            ),
+            batch_size=1000,
+        )
+        cls.user = users[0]
+        # bulk_create n'envoie pas de signaux : lignes d'ingrédients comme le ferait backfill_ingredients
+        ingredients.sync_recipes(list(CocktailRecipe.objects.only('pk', 'user_id', 'ingredients')))
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self.client.force_login(self.user)
+
+    # ------------------------------------------------------------------
+    # Outils
+    # ------------------------------------------------------------------
+
+    def _explain(self, sql):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+                return cursor.fetchone()[0]
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return [row[-1] for row in cursor.fetchall()]
+
+    def _postgres_nodes(self, plan):
+        nodes = [plan] if isinstance(plan, dict) else list(plan)
+        while nodes:
+            node = nodes.pop()
+            node = node.get('Plan', node)
+            yield node
+            nodes.extend(node.get('Plans', []))
+
+    def assertUsesIndexes(self, queries, allow_sort=False):
+        """
+        Chaque SELECT sur la table des cocktails passe par un index, sans tri de la table
+        allow_sort : tri autorisé (classement par pertinence des seuls résultats d'une recherche)
+        """
+        selects = [
+            query['sql'] for query in queries
+            if query['sql'].lstrip().upper().startswith('SELECT') and RECIPE_TABLE in query['sql']
+        ]
+        self.assertTrue(selects, "Aucune requête sur les cocktails capturée")
+
+        for sql in selects:
+            plan = self._explain(sql)
+            if connection.vendor == 'postgresql':
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                for node in self._postgres_nodes(plan):
+                    self.assertFalse(
+                        node['Node Type'] == 'Seq Scan' and node.get('Relation Name') == RECIPE_TABLE,
+                        f"Parcours séquentiel de la table:\n{sql}\n{plan}"
+                    )
+            else:
+                details = '\n'.join(plan)
+                for line in plan:
+                    if RECIPE_TABLE in line and line.startswith('SCAN'):
+                        self.assertIn('INDEX', line, f"Parcours complet de la table:\n{sql}\n{details}")
+                if not allow_sort:
+                    self.assertNotIn('TEMP B-TREE FOR ORDER BY', details, f"Tri de la table:\n{sql}\n{details}")
+
+    def _capture(self, client, url, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return context.captured_queries
+
+    # ------------------------------------------------------------------
+    # Endpoints
+    # ------------------------------------------------------------------
+
+    def test_history_view(self):
+        for params in [
+            {},
+            {'filter': 'favorites'},
+            {'filter': 'alcoholic'},
+            {'filter': 'non-alcoholic'},
+            {'sort': 'date_asc'},
+            {'sort': 'name_asc'},
+            {'filter': 'favorites', 'sort': 'name_desc', 'page': 2},
+        ]:
+            with self.subTest(**params):
+                self.assertUsesIndexes(self._capture(self.client, '/history/', **params))
+
+    def test_user_cocktail_history_api(self):
+        for params in [
+            {},
+            {'page': 3, 'page_size': 20},
+            {'difficulty': 'hard'},
+            {'alcohol_content': 'none'},
+        ]:
+            with self.subTest(**params):
+                self.assertUsesIndexes(self._capture(self.api, '/api/history/', **params))
+
+    def test_search_api(self):
+        for params in [
+            {'search': 'Cocktail 01'},
+            {'search': 'rhum', 'difficulty': 'hard', 'page': 2},
+        ]:
+            with self.subTest(**params):
+                self.assertUsesIndexes(self._capture(self.api, '/api/history/', **params), allow_sort=True)
+
+    def test_ingredient_filter_api(self):
+        # Les cocktails sont atteints par l'index (user, ingredient, recipe) : seul ce sous-ensemble est trié
+        for params in [
+            {'ingredients': 'rhum'},
+            {'ingredients': 'rhum', 'difficulty': 'hard'},
+        ]:
+            with self.subTest(**params):
+                self.assertUsesIndexes(self._capture(self.api, '/api/history/', **params), allow_sort=True)
+
+    def test_keyset_pages_api(self):
+        # Page profonde : la clé du curseur borne le parcours d'index, sans OFFSET ni tri
+        for params in [
+            {'ordering': 'recent'},
+            {'ordering': 'oldest'},
+            {'ordering': 'name'},
+            {'ordering': 'name_desc', 'difficulty': 'hard'},
+            {'ordering': 'recent', 'alcohol_content': 'none', 'count': 0},
+            {'ordering': 'ingredients_desc'},
+            {'ordering': 'recent', 'cost_tier': 1},
+        ]:
+            with self.subTest(**params):
+                cursor = self.api.get('/api/history/', {**params, 'page_size': 50}).json()['next_cursor']
+                queries = self._capture(self.api, '/api/history/', cursor=cursor, **params)
+                self.assertUsesIndexes(queries)
+                self.assertFalse(any('OFFSET' in query['sql'] for query in queries))
+
+    def test_user_favorites_api(self):
+        self.assertUsesIndexes(self._capture(self.api, '/api/favorites/'))
+
+    def test_makeable_api(self):
+        self.assertUsesIndexes(
+            self._capture(self.api, '/api/ingredients/makeable/', available='rhum'),
+            allow_sort=True
+        )
+
+    def test_user_stats_api(self):
+        self.assertUsesIndexes(self._capture(self.api, '/api/stats/'))
+
+    def test_cocktail_list_api(self):
+        self.assertUsesIndexes(self._capture(self.api, '/api/cocktails/'))
+
+
+class SearchTestCase(TestCase):
+    """Recherche plein texte : accents, ingrédients, prompt, classement et extraits"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='search')
+        generation_request = GenerationRequest.objects.create(
+            user=self.user, user_prompt='quelque chose de frais pour la plage'
+        )
+        self.margarita = CocktailRecipe.objects.create(
+            user=self.user, generation_request=generation_request,
+            name='Margarita épicée', description='Un classique <b>mexicain</b> relevé au piment',
+            ingredients=[{'nom': 'Téquila', 'quantite': '5 cl'}, {'nom': 'Citron vert', 'quantite': '3 cl'}],
+        )
+        self.mojito = CocktailRecipe.objects.create(
+            user=self.user, generation_request=generation_request,
+            name='Mojito', description='Menthe fraîche, rien à voir avec une margarita',
+            ingredients=[{'nom': 'Rhum blanc', 'quantite': '5 cl'}],
+        )
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def _search(self, query):
+        response = self.api.get('/api/history/', {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_accent_insensitive_prefix(self):
+        self.assertEqual([r['name'] for r in self._search('EPICE')], ['Margarita épicée'])
+        self.assertEqual([r['name'] for r in self._search('tequ')], ['Margarita épicée'])
+
+    def test_ingredients_and_prompt(self):
+        self.assertEqual([r['name'] for r in self._search('rhum')], ['Mojito'])
+        self.assertEqual(len(self._search('plage')), 2)
+
+    def test_rank_and_snippet(self):
+        results = self._search('margarita')
+        # Le nom pèse plus que la description
+        self.assertEqual([r['name'] for r in results], ['Margarita épicée', 'Mojito'])
+        self.assertGreater(results[0]['search_rank'], results[1]['search_rank'])
+        self.assertIn('<mark>', results[0]['search_snippet'])
+
+    def test_count_with_pages(self):
+        response = self.api.get('/api/history/', {'search': 'plage', 'page_size': 1, 'page': 2})
+        self.assertEqual((response.json()['count'], len(response.json()['results'])), (2, 1))
+        response = self.api.get('/api/history/', {'search': 'plage', 'page_size': 1, 'page': 3})
+        self.assertEqual((response.json()['count'], response.json()['results']), (2, []))
+
+    def test_snippet_is_escaped(self):
+        snippet = self._search('mexicain')[0]['search_snippet']
+        self.assertIn('&lt;b&gt;<mark>mexicain</mark>&lt;/b&gt;', snippet)
+
+    def test_index_follows_updates(self):
+        self.margarita.name = 'Paloma'
+        self.margarita.save()
+        self.assertEqual([r['name'] for r in self._search('paloma')], ['Paloma'])
+        self.mojito.delete()
+        self.assertEqual(self._search('rhum'), [])
+
+    def test_whole_corpus(self):
+        # Sans filtre utilisateur : mêmes règles que l'historique sur tout le queryset
+        other = User.objects.create(username='other')
+        CocktailRecipe.objects.create(
+            user=other, generation_request=GenerationRequest.objects.create(user=other, user_prompt='prompt'),
+            name='Paloma', description='Pamplemousse et téquila', ingredients=[{'nom': 'Téquila'}],
+        )
+        results = {recipe.name: recipe for recipe in search.search(CocktailRecipe.objects.all(), 'TEQU')}
+        self.assertEqual(sorted(results), ['Margarita épicée', 'Paloma'])
+        self.assertEqual([r['name'] for r in self._search('tequ')], ['Margarita épicée'])
+        snippets = search.highlights(results.values(), 'tequ')
+        self.assertIn('<mark>téquila</mark>', snippets[str(results['Paloma'].pk)])
+
+
+class PostgresSearchTestCase(TestCase):
+    """Branche PostgreSQL de la recherche : tsvector et ts_headline (SQL vérifié sur toute base, exécuté sur PostgreSQL)"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='search')
+        self.recipe = CocktailRecipe.objects.create(
+            user=self.user, generation_request=GenerationRequest.objects.create(user=self.user, user_prompt='plage'),
+            name='Margarita épicée', description='Un classique mexicain', ingredients=[{'nom': 'Téquila'}],
+        )
+
+    def test_query(self):
+        with mock.patch.object(search, 'backend', return_value='postgresql'):
+            queryset = search.search(CocktailRecipe.objects.filter(user=self.user), 'Téquila, épi!')
+        sql, params = queryset.query.sql_with_params()
+        self.assertIn(f'"{RECIPE_TABLE}"."search_vector" @@ to_tsquery(\'french_unaccent\', %s)', sql)
+        self.assertIn(f'ts_rank_cd("{RECIPE_TABLE}"."search_vector", to_tsquery(\'french_unaccent\', %s))', sql)
+        # Chaque mot est un préfixe, tous doivent être présents
+        self.assertEqual(params.count('téquila:* & épi:*'), 2)
+        self.assertEqual(queryset.query.order_by, ('-search_rank', '-created_at'))
+
+    def test_headline(self):
+        with mock.patch.object(search, 'backend', return_value='postgresql'):
+            with CaptureQueriesContext(connection) as context:
+                try:
+                    snippets = search.highlights([self.recipe], 'tequ')
+                except DatabaseError:
+                    # ts_headline() n'existe que sous PostgreSQL
+                    self.assertNotEqual(connection.vendor, 'postgresql')
+                    snippets = None
+        self.assertIn("ts_headline('french_unaccent'", context.captured_queries[-1]['sql'])
+        if connection.vendor == 'postgresql':
+            self.assertIn('<mark>', snippets[str(self.recipe.pk)])
+
+    @skipUnless(connection.vendor == 'postgresql', "tsvector : PostgreSQL seulement")
+    def test_vector_follows_updates(self):
+        results = list(search.search(CocktailRecipe.objects.filter(user=self.user), 'EPICE'))
+        self.assertEqual(results, [self.recipe])
+        self.recipe.name = 'Paloma'
+        self.recipe.save()
+        self.assertEqual(list(search.search(CocktailRecipe.objects.all(), 'epice')), [])
+        self.assertEqual(list(search.search(CocktailRecipe.objects.all(), 'plage')), [self.recipe])
+        self.assertEqual(search.rebuild_index(), 1)
+        self.assertEqual(list(search.search(CocktailRecipe.objects.all(), 'paloma')), [self.recipe])
+
+
+class QueryCountTestCase(TestCase):
+    """
+    Nombre de requêtes SQL de chaque endpoint de l'API : constant quelle que soit la taille de la page
+    (un N+1 sur une relation imbriquée fait échouer ces tests)
+    """
+
+    ENDPOINTS = [
+        ('/api/cocktails/', {}),
+        ('/api/cocktails/', {'page': 1}),
+        ('/api/history/', {}),
+        ('/api/history/', {'page': 1}),
+        ('/api/history/', {'search': 'cocktail'}),
+        ('/api/history/', {'ingredients': 'rhum'}),
+        ('/api/history/', {'expand': 'user,generation_request'}),
+        ('/api/favorites/', {}),
+        ('/api/favorites/', {'fields': 'id,name', 'expand': 'user'}),
+        ('/api/ingredients/', {}),
+        ('/api/ingredients/makeable/', {'available': 'rhum,citron vert'}),
+        ('/api/stats/', {}),
+        ('/api/generation-requests/', {}),
+    ]
+
+    def setUp(self):
+        self.user = User.objects.create(username='bar')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+        self._create(2)
+        # Hors mesure : création des statistiques matérialisées
+        self.api.get('/api/stats/')
+        # Les réponses mises en cache par l'échauffement ne doivent pas masquer les requêtes mesurées
+        response_cache.invalidate(self.user.pk)
+
+    def _create(self, count):
+        for i in range(count):
+            generation_request = GenerationRequest.objects.create(user=self.user, user_prompt='prompt')
+            CocktailRecipe.objects.create(
+                user=self.user, generation_request=generation_request,
+                name=f"Cocktail {i}", description='Description', is_favorite=True,
+                ingredients=[{'nom': 'Rhum', 'quantite': '4 cl'}, {'nom': 'Citron vert', 'quantite': '2 cl'}],
+            )
+
+    def _count_queries(self):
+        counts = {}
+        for url, params in self.ENDPOINTS:
+            with CaptureQueriesContext(connection) as context:
+                response = self.api.get(url, params)
+            self.assertEqual(response.status_code, 200, f"{url} {params}")
+            counts[(url, tuple(params.items()))] = len(context.captured_queries)
+        return counts
+
+    def test_constant_query_count(self):
+        small = self._count_queries()
+        self._create(8)
+        large = self._count_queries()
+        for key, count in small.items():
+            with self.subTest(endpoint=key):
+                self.assertEqual(large[key], count)
+
+    def test_list_query_budget(self):
+        self._create(8)
+        # Validateurs ETag, page, total (statistiques matérialisées)
+        with self.assertNumQueries(3):
+            self.api.get('/api/history/')
+        with self.assertNumQueries(3):
+            self.api.get('/api/cocktails/')
+        with self.assertNumQueries(2):
+            self.api.get('/api/favorites/', {'count': 0})
+
+    def test_detail_query_budget(self):
+        recipe = CocktailRecipe.objects.filter(user=self.user).first()
+        # Validateurs ETag, puis cocktail, utilisateur et demande de génération en une seule requête
+        with self.assertNumQueries(2):
+            response = self.api.get(f'/api/cocktails/{recipe.pk}/')
+        self.assertEqual(response.json()['generation_request']['user']['username'], 'bar')
+
+
+class RecipeAPITestCase(TestCase):
+    """Base des tests de l'API : utilisateur 'bar' authentifié, une demande de génération pour ses cocktails"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='bar')
+        self.generation_request = GenerationRequest.objects.create(user=self.user, user_prompt='prompt')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def _create(self, name, ingredients=(), user=None, **kwargs):
+        """Cocktail de l'utilisateur, ou d'un autre (user=) avec sa propre demande de génération"""
+        user = user or self.user
+        generation_request = (
+            self.generation_request if user == self.user
+            else GenerationRequest.objects.create(user=user, user_prompt='prompt')
+        )
+        kwargs.setdefault('description', 'Description')
+        return CocktailRecipe.objects.create(
+            user=user, generation_request=generation_request, name=name, ingredients=list(ingredients), **kwargs
+        )
+
+
+class ConditionalGetTestCase(RecipeAPITestCase):
+    """ETag / Last-Modified : 304 avant sérialisation, validateurs invalidés par chaque écriture"""
+
+    def setUp(self):
+        super().setUp()
+        self.recipes = [self._create(f"Cocktail {i}") for i in range(3)]
+        self.client.force_login(self.user)
+
+    def _revalidate(self, url, client=None, **params):
+        client = client or self.api
+        first = client.get(url, params)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('ETag', first)
+        self.assertIn('no-cache', first['Cache-Control'])
+        with CaptureQueriesContext(connection) as context:
+            second = client.get(url, params, HTTP_IF_NONE_MATCH=first['ETag'])
+        return first, second, context.captured_queries
+
+    def test_not_modified(self):
+        recipe = self.recipes[0]
+        for url, params in [
+            ('/api/cocktails/', {}),
+            (f'/api/cocktails/{recipe.pk}/', {}),
+            ('/api/history/', {'difficulty': 'medium'}),
+            ('/api/favorites/', {}),
+            ('/api/stats/', {}),
+        ]:
+            with self.subTest(url=url):
+                first, second, queries = self._revalidate(url, **params)
+                self.assertEqual(second.status_code, 304)
+                self.assertEqual(second['ETag'], first['ETag'])
+                # Seul le validateur est lu : ni la page, ni le cocktail
+                self.assertEqual(len(queries), 1)
+
+                since = self.api.get(url, params, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+                self.assertEqual(since.status_code, 304)
+
+    def test_writes_change_validators(self):
+        recipe = self.recipes[0]
+        etags = {url: self.api.get(url)['ETag'] for url in ['/api/history/', f'/api/cocktails/{recipe.pk}/']}
+
+        recipe.description = 'Nouvelle description'
+        recipe.save()
+        for url, etag in etags.items():
+            self.assertEqual(self.api.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # Suppression : le nombre change même si aucune date ne progresse
+        etag = self.api.get('/api/history/')['ETag']
+        CocktailRecipe.objects.filter(pk=self.recipes[1].pk).delete()
+        self.assertEqual(self.api.get('/api/history/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # La représentation dépend des paramètres
+        self.assertNotEqual(self.api.get('/api/history/', {'ordering': 'name'})['ETag'], etag)
+
+    def test_detail_page(self):
+        recipe = self.recipes[0]
+        first, second, queries = self._revalidate(f'/cocktail/{recipe.pk}/', client=self.client)
+        self.assertTrue(first['ETag'].startswith('W/'))
+        self.assertEqual(second.status_code, 304)
+        self.assertFalse(any('generation_request_id' in query['sql'] for query in queries))
+
+
+class ResponseCacheTestCase(RecipeAPITestCase):
+    """Cache des réponses par version des données : servi sans requête jusqu'à la prochaine écriture"""
+
+    def setUp(self):
+        super().setUp()
+        self.recipes = [self._create(f"Cocktail {i}") for i in range(3)]
+        self.client.force_login(self.user)
+
+    def test_cached_until_write(self):
+        self.assertEqual(self.api.get('/api/stats/').json()['cocktails']['total'], 3)
+        # Validateurs ETag seulement : compteurs lus dans le cache
+        with self.assertNumQueries(1):
+            self.assertEqual(self.api.get('/api/stats/').json()['cocktails']['total'], 3)
+
+        self._create('Nouveau')
+        self.assertEqual(self.api.get('/api/stats/').json()['cocktails']['total'], 4)
+
+    def test_bulk_writes_invalidate(self):
+        self.assertEqual(self.api.get('/api/favorites/').json()['favorites'], [])
+
+        ids = [str(recipe.pk) for recipe in self.recipes[:2]]
+        self.api.post('/api/cocktails/bulk/favorite/', {'ids': ids, 'is_favorite': True}, format='json')
+        self.assertEqual(len(self.api.get('/api/favorites/').json()['favorites']), 2)
+
+        self.api.post('/api/cocktails/bulk/delete/', {'ids': ids}, format='json')
+        self.assertEqual(self.api.get('/api/favorites/').json()['favorites'], [])
+        self.assertEqual(self.api.get('/api/stats/').json()['cocktails']['total'], 1)
+
+    def test_pages(self):
+        recipe = self.recipes[0]
+        self.assertContains(self.client.get('/history/'), 'Cocktail 0')
+        self.assertContains(self.client.get(f'/cocktail/{recipe.pk}/'), 'Cocktail 0')
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/history/')
+        # Session et utilisateur seulement : la liste et les compteurs viennent du cache
+        self.assertFalse(any('cocktails_' in query['sql'] for query in context.captured_queries))
+
+        recipe.name = 'Renommé'
+        recipe.save()
+        self.assertContains(self.client.get('/history/'), 'Renommé')
+        self.assertContains(self.client.get(f'/cocktail/{recipe.pk}/'), 'Renommé')
+
+        # Autre utilisateur : ni le cocktail ni la liste ne sont partagés
+        self.client.force_login(User.objects.create(username='baz'))
+        self.assertRedirects(self.client.get(f'/cocktail/{recipe.pk}/'), '/history/')
+        self.assertNotContains(self.client.get('/history/'), 'Renommé')
+
+    def test_card_fragments(self):
+        recipe = self.recipes[0]
+        page = self.client.get('/history/').content.decode()
+        # Grille et carousel : même fragment, deux variantes
+        self.assertEqual(page.count(f'data-cocktail-id="{recipe.pk}"'), 2)
+        self.assertIn('hover:-translate-y-2', page)
+
+        self.api.post('/api/cocktails/bulk/favorite/', {'ids': [str(recipe.pk)], 'is_favorite': True}, format='json')
+        page = self.client.get('/history/').content.decode()
+        self.assertEqual(len(re.findall(rf'data-cocktail-id="{recipe.pk}"\s+data-is-favorite="true"', page)), 2)
+
+    def test_metrics(self):
+        self.api.get('/api/stats/')
+        self.api.get('/api/stats/')
+        self.assertEqual(self.api.get('/api/cache/stats/').status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        metrics = self.api.get('/api/cache/stats/').json()
+        self.assertGreaterEqual(metrics['responses']['stats']['hits'], 1)
+        self.assertGreater(metrics['hit_rate'], 0)
+
+
+class HistoryCarouselTestCase(TestCase):
+    """Carousel mobile : première fenêtre dans la page, fenêtres suivantes via /history/slides/"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='bar')
+        generation_request = GenerationRequest.objects.create(user=self.user, user_prompt='prompt')
+        for i in range(25):
+            CocktailRecipe.objects.create(
+                user=self.user, generation_request=generation_request,
+                name=f"Cocktail {i:02d}", description='Description', ingredients=[], is_favorite=i % 2 == 0,
+            )
+        self.client.force_login(self.user)
+
+    def _slide_ids(self, html):
+        return re.findall(r'data-cocktail-id="([0-9a-f-]+)"', html)
+
+    def test_initial_window(self):
+        response = self.client.get('/history/', {'sort': 'name_asc', 'page': 2, 'page_size': 8})
+        self.assertEqual(len(response.context['carousel_slides']), views.CAROUSEL_WINDOW)
+        self.assertEqual([c.name for c in response.context['cocktails']], [f"Cocktail {i:02d}" for i in range(8, 16)])
+        self.assertEqual(response.context['cocktails'].paginator.num_pages, 4)
+        # Grille (8) + fenêtre du carousel (10), pas les 25 cocktails
+        self.assertEqual(len(self._slide_ids(response.content.decode())), 8 + views.CAROUSEL_WINDOW)
+        self.assertContains(response, 'id="total-slides">25<')
+
+    def test_windows_cover_history(self):
+        response = self.client.get('/history/', {'filter': 'favorites', 'sort': 'name_desc'})
+        seen = [c.pk for c in response.context['carousel_slides']]
+        cursor = response.context['carousel_next_cursor']
+        while cursor:
+            data = self.client.get('/history/slides/', {'filter': 'favorites', 'sort': 'name_desc', 'cursor': cursor}).json()
+            self.assertEqual(len(self._slide_ids(data['html'])), data['count'])
+            seen += [uuid.UUID(pk) for pk in self._slide_ids(data['html'])]
+            cursor = data['next_cursor']
+
+        expected = list(
+            CocktailRecipe.objects.filter(user=self.user, is_favorite=True)
+            .order_by('-name', '-id').values_list('pk', flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+        self.assertEqual(self.client.get('/history/slides/', {'cursor': 'invalide'}).status_code, 400)
+
+
+class SparseFieldsetTestCase(RecipeAPITestCase):
+    """?fields= et ?expand= : champs renvoyés, colonnes lues et jointures"""
+
+    def setUp(self):
+        super().setUp()
+        self.recipe = self._create(
+            'Mojito', [{'nom': 'Rhum'}], description='Frais',
+            music_ambiance='Salsa', image_prompt='Un mojito', is_favorite=True,
+        )
+
+    def _get(self, url, **params):
+        with CaptureQueriesContext(connection) as context:
+            response = self.api.get(url, params)
+        selects = [query['sql'] for query in context.captured_queries if RECIPE_TABLE in query['sql']]
+        return response, selects
+
+    def test_fields_restrict_columns(self):
+        for url in ['/api/cocktails/', '/api/history/', '/api/favorites/']:
+            with self.subTest(url=url):
+                response, selects = self._get(url, fields='id,name,image_src,is_favorite')
+                item = response.json().get('results', response.json().get('favorites'))[0]
+                self.assertEqual(set(item), {'id', 'name', 'image_src', 'is_favorite'})
+                page_sql = selects[-1]
+                self.assertIn('"image_url"', page_sql)
+                for column in ['"description"', '"ingredients"', '"music_ambiance"', 'JOIN']:
+                    self.assertNotIn(column, page_sql)
+
+    def test_expand_relations(self):
+        response, selects = self._get(
+            '/api/history/', expand='user,generation_request', fields='id,user,generation_request'
+        )
+        item = response.json()['results'][0]
+        self.assertEqual(item['user']['username'], 'bar')
+        self.assertEqual(item['generation_request']['user_prompt'], 'prompt')
+        self.assertIn('JOIN', selects[-1])
+
+        item = self.api.get('/api/history/').json()['results'][0]
+        self.assertNotIn('user', item)
+        self.assertIn('ingredients_count', item)
+
+    def test_detail_fields(self):
+        response, selects = self._get(f'/api/cocktails/{self.recipe.pk}/', fields='id,name,music_ambiance')
+        self.assertEqual(response.json(), {'id': str(self.recipe.pk), 'name': 'Mojito', 'music_ambiance': 'Salsa'})
+        self.assertNotIn('JOIN', selects[0])
+        self.assertIn('generation_request', self.api.get(f'/api/cocktails/{self.recipe.pk}/').json())
+
+    def test_unknown_fields(self):
+        for url, params in [
+            ('/api/cocktails/', {'fields': 'id,password'}),
+            ('/api/history/', {'expand': 'owner'}),
+            ('/api/favorites/', {'fields': 'music_ambiance'}),
+        ]:
+            with self.subTest(url=url, **params):
+                response = self.api.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(next(iter(params)), response.json())
+
+
+class BulkMutationTestCase(RecipeAPITestCase):
+    """Favoris, notes et suppressions en masse : une instruction par lot, statistiques cohérentes"""
+
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create(username='baz')
+        self.recipes = [
+            self._create(f"Cocktail {i}", [{'nom': 'Rhum'}], rating=[None, 2, 4][i % 3]) for i in range(6)
+        ]
+        self.foreign = self._create('Autre', [{'nom': 'Rhum'}], user=self.other)
+        user_stats.get_stats(self.user)
+
+    def _ids(self, recipes):
+        return [str(recipe.pk) for recipe in recipes]
+
+    def assertStatsConsistent(self):
+        self.assertEqual(user_stats.check(self.user.pk), {})
+        self.assertEqual(user_stats.check(self.other.pk), {})
+
+    def test_bulk_favorite(self):
+        before = CocktailRecipe.objects.get(pk=self.recipes[0].pk).updated_at
+        ids = self._ids(self.recipes[:4]) + [str(self.foreign.pk)]
+        with CaptureQueriesContext(connection) as context:
+            response = self.api.post(
+                '/api/cocktails/bulk/favorite/', {'ids': ids, 'is_favorite': True}, format='json'
+            )
+        self.assertEqual(response.json(), {'updated': 4, 'missing': [str(self.foreign.pk)]})
+        updates = [q['sql'] for q in context.captured_queries if q['sql'].startswith(f'UPDATE "{RECIPE_TABLE}"')]
+        self.assertEqual(len(updates), 1)
+        self.assertFalse(CocktailRecipe.objects.get(pk=self.foreign.pk).is_favorite)
+        self.assertGreater(CocktailRecipe.objects.get(pk=self.recipes[0].pk).updated_at, before)
+        self.assertEqual(user_stats.get_stats(self.user).favorites, 4)
+
+        # Cocktails déjà favoris : non comptés deux fois
+        response = self.api.post('/api/cocktails/bulk/favorite/', {'ids': ids, 'is_favorite': True}, format='json')
+        self.assertEqual(response.json()['updated'], 0)
+        self.api.post('/api/cocktails/bulk/favorite/', {'ids': ids[:1], 'is_favorite': False}, format='json')
+        self.assertEqual(user_stats.get_stats(self.user).favorites, 3)
+        self.assertStatsConsistent()
+
+    def test_bulk_rate(self):
+        ids = self._ids(self.recipes) + [str(self.foreign.pk)]
+        with CaptureQueriesContext(connection) as context:
+            response = self.api.post('/api/cocktails/bulk/rate/', {'ids': ids, 'rating': 4}, format='json')
+        self.assertEqual(response.json()['updated'], 4)
+        # Anciennes notes (aucune, 2) : un seul UPDATE quel que soit leur nombre
+        updates = [q['sql'] for q in context.captured_queries if q['sql'].startswith(f'UPDATE "{RECIPE_TABLE}"')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(set(CocktailRecipe.objects.filter(user=self.user).values_list('rating', flat=True)), {4})
+        self.assertIsNone(CocktailRecipe.objects.get(pk=self.foreign.pk).rating)
+        self.assertEqual(user_stats.get_stats(self.user).average_rating, 4)
+        self.assertStatsConsistent()
+
+        self.api.post('/api/cocktails/bulk/rate/', {'ids': ids[:2], 'rating': None}, format='json')
+        self.assertEqual(user_stats.get_stats(self.user).rated, 4)
+        self.assertStatsConsistent()
+
+        response = self.api.post('/api/cocktails/bulk/rate/', {'ids': ids, 'rating': 6}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_delete(self):
+        ids = self._ids(self.recipes[:3]) + [str(self.foreign.pk)]
+        response = self.api.post('/api/cocktails/bulk/delete/', {'ids': ids}, format='json')
+        self.assertEqual(response.json(), {'deleted': 3, 'missing': [str(self.foreign.pk)]})
+        self.assertEqual(CocktailRecipe.objects.filter(user=self.user).count(), 3)
+        self.assertTrue(CocktailRecipe.objects.filter(pk=self.foreign.pk).exists())
+        self.assertFalse(CocktailIngredient.objects.filter(recipe_id__in=ids[:3]).exists())
+        self.assertEqual(user_stats.get_stats(self.user).total, 3)
+        self.assertStatsConsistent()
+
+        self.assertEqual(self.api.post('/api/cocktails/bulk/delete/', {'ids': []}, format='json').status_code, 400)
+
+    def test_toggle_favorite(self):
+        recipe = self.recipes[0]
+        for url in [f'/api/cocktails/{recipe.pk}/toggle_favorite/', f'/api/cocktails/{recipe.pk}/favorite/']:
+            with self.subTest(url=url):
+                expected = not CocktailRecipe.objects.get(pk=recipe.pk).is_favorite
+                self.assertEqual(self.api.post(url).json()['is_favorite'], expected)
+        self.assertEqual(self.api.post(f'/api/cocktails/{self.foreign.pk}/toggle_favorite/').status_code, 404)
+        self.assertEqual(self.api.post(f'/api/cocktails/{self.foreign.pk}/rate/', {'rating': 3}).status_code, 404)
+        self.assertEqual(self.api.post(f'/api/cocktails/{recipe.pk}/rate/', {'rating': 3}).json()['rating'], 3)
+        self.assertStatsConsistent()
+
+    def test_single_ids(self):
+        # Identifiant invalide : 404 (et non 500) ; UUID en majuscules : même cocktail
+        for url in ['/api/cocktails/abc/toggle_favorite/', '/api/cocktails/abc/rate/']:
+            with self.subTest(url=url):
+                self.assertEqual(self.api.post(url, {'rating': 3}).status_code, 404)
+
+        recipe = self.recipes[0]
+        response = self.api.post(f'/api/cocktails/{str(recipe.pk).upper()}/rate/', {'rating': 5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(CocktailRecipe.objects.get(pk=recipe.pk).rating, 5)
+        response = self.api.post(f'/api/cocktails/{str(recipe.pk).upper()}/toggle_favorite/')
+        self.assertEqual(response.status_code, 200)
+        self.assertStatsConsistent()
+
+
+class UserStatsTestCase(RecipeAPITestCase):
+    """Statistiques matérialisées : deltas à chaque modification, cumuls 7/30 jours, vérification et réparation"""
+
+    def setUp(self):
+        super().setUp()
+        self.noon = timezone.localtime().replace(hour=12, minute=0, second=0, microsecond=0)
+
+    def _stored(self):
+        return UserCocktailStats.objects.filter(user=self.user).values(*user_stats.COUNTER_FIELDS).first()
+
+    def _daily(self):
+        return dict(UserCocktailDailyStats.objects.filter(user=self.user).exclude(created=0).values_list('day', 'created'))
+
+    def _assert_rebuilt_equal(self):
+        """Les deltas appliqués donnent exactement le calcul complet"""
+        stored, daily = self._stored(), self._daily()
+        self.assertEqual(user_stats.check(self.user.pk), {})
+        user_stats.rebuild(self.user.pk)
+        self.assertEqual((self._stored(), self._daily()), (stored, daily))
+
+    def _created_ago(self, days, name, **kwargs):
+        with mock.patch('django.utils.timezone.now', return_value=self.noon - timedelta(days=days)):
+            return self._create(name, **kwargs)
+
+    def test_incremental_deltas(self):
+        negroni = self._created_ago(10, 'Negroni', alcohol_content='high', difficulty_level='easy')
+        mojito = self._create('Mojito', alcohol_content='low', difficulty_level='medium', is_favorite=True, rating=4)
+        stats = self._stored()
+        self.assertEqual(
+            [stats[name] for name in ('total', 'favorites', 'alcohol_high', 'alcohol_low', 'rated', 'rating_sum')],
+            [2, 1, 1, 1, 1, 4],
+        )
+        self._assert_rebuilt_equal()
+
+        mojito.rating = 2
+        mojito.is_favorite = False
+        mojito.alcohol_content = 'none'
+        mojito.save()
+        stats = self._stored()
+        self.assertEqual(
+            [stats[name] for name in ('favorites', 'alcohol_low', 'alcohol_none', 'rated', 'rating_sum')],
+            [0, 0, 1, 1, 2],
+        )
+        self._assert_rebuilt_equal()
+
+        negroni.delete()
+        self.assertEqual((self._stored()['total'], self._stored()['alcohol_high']), (1, 0))
+        self.assertEqual(list(self._daily()), [timezone.localdate()])
+        self._assert_rebuilt_equal()
+
+    def test_rollups(self):
+        for days in (0, 6, 7, 29, 30):
+            self._created_ago(days, f'Cocktail {days}')
+        # Jours calendaires, aujourd'hui compris : J-6 compte dans la semaine, J-7 non
+        cocktails = self.api.get('/api/stats/').json()['cocktails']
+        self.assertEqual((cocktails['total'], cocktails['last_week'], cocktails['last_month']), (5, 2, 4))
+        self.assertEqual(
+            (user_stats.created_since(self.user, 7), user_stats.created_since(self.user, 30)), (2, 4)
+        )
+        self._assert_rebuilt_equal()
+
+    def test_check_and_fix(self):
+        self._create('Mojito', is_favorite=True)
+        self._create('Daiquiri', rating=5)
+        self.assertEqual(user_stats.check(self.user.pk), {})
+        UserCocktailStats.objects.filter(user=self.user).update(favorites=7, rating_sum=0)
+        UserCocktailDailyStats.objects.filter(user=self.user).update(created=9)
+
+        differences = user_stats.check(self.user.pk)
+        self.assertEqual(differences['favorites'], {'stored': 7, 'expected': 1})
+        self.assertEqual(differences['rating_sum'], {'stored': 0, 'expected': 5})
+        self.assertTrue(differences['daily'])
+        with self.assertRaises(CommandError):
+            call_command('rebuild_user_stats', check=True, stdout=io.StringIO())
+        self.assertEqual(self._stored()['favorites'], 7)
+
+        out = io.StringIO()
+        call_command('rebuild_user_stats', check=True, fix=True, stdout=out)
+        self.assertIn('1 incohérent(s) (corrigés)', out.getvalue())
+        self.assertEqual(user_stats.check(self.user.pk), {})
+        self.assertEqual(self._stored(), user_stats.compute(self.user.pk))
+        self.assertEqual(self._daily(), user_stats.compute_daily(self.user.pk))
+        call_command('rebuild_user_stats', check=True, stdout=out)
+
+
+class ExportTestCase(RecipeAPITestCase):
+    """Export en flux : formats, reprise par curseur, synchronisation incrémentale, gzip"""
+
+    def setUp(self):
+        super().setUp()
+        for i in range(12):
+            self._create(
+                f"Cocktail {i:02d}", [{'nom': 'Rhum', 'quantite': '4 cl'}], description='Frais, "citronné"\nlong'
+            )
+
+    def _export(self, **params):
+        response = self.api.get('/api/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def _ndjson(self, **params):
+        return [json.loads(line) for line in self._export(**params).splitlines()]
+
+    def test_ndjson(self):
+        rows = self._ndjson()
+        self.assertEqual(len(rows), 12)
+        self.assertEqual(rows[0]['ingredients'], [{'nom': 'Rhum', 'quantite': '4 cl'}])
+        self.assertEqual(
+            [(row['updated_at'], row['id']) for row in rows],
+            sorted((row['updated_at'], row['id']) for row in rows)
+        )
+
+    def test_csv(self):
+        rows = list(csv.DictReader(io.StringIO(self._export(type='csv'))))
+        self.assertEqual(len(rows), 12)
+        self.assertEqual(rows[0]['description'], 'Frais, "citronné"\nlong')
+        self.assertEqual(json.loads(rows[0]['ingredients'])[0]['nom'], 'Rhum')
+        self.assertEqual(rows[0]['rating'], '')
+
+    def test_resume_and_since(self):
+        rows = self._ndjson()
+        resumed = self._ndjson(cursor=rows[4]['cursor'])
+        self.assertEqual([row['id'] for row in resumed], [row['id'] for row in rows[5:]])
+
+        recipe = CocktailRecipe.objects.get(pk=rows[0]['id'])
+        recipe.is_favorite = True
+        recipe.save()
+        since = recipe.updated_at - timedelta(microseconds=1)
+        self.assertEqual([row['id'] for row in self._ndjson(since=since.isoformat())], [rows[0]['id']])
+
+    def test_gzip(self):
+        response = self.api.get('/api/export/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        content = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8')
+        self.assertEqual(len(content.splitlines()), 12)
+
+    def test_invalid_parameters(self):
+        for params in [{'cursor': 'abc'}, {'since': 'hier'}, {'type': 'xml'}]:
+            with self.subTest(**params):
+                self.assertEqual(self.api.get('/api/export/', params).status_code, 400)
+
+
+class ImportTestCase(TestCase):
+    """Import en masse : lots bulk_create, erreurs par ligne, ingrédients, tags et statistiques"""
+
+    def setUp(self):
+        self.user = User.objects.create(username='bar')
+        self.api = APIClient()
+        self.api.force_authenticate(self.user)
+
+    def _post(self, body, content_type='application/x-ndjson', **params):
+        url = '/api/import/' + (f"?{'&'.join(f'{k}={v}' for k, v in params.items())}" if params else '')
+        return self.api.generic('POST', url, body.encode('utf-8'), content_type=content_type)
+
+    def test_ndjson(self):
+        body = '\n'.join([
+            json.dumps({'name': 'Mojito', 'description': 'Frais', 'tags': ['Classique', 'Frais'],
+                        'ingredients': [{'nom': 'Rhum blanc', 'quantite': '5 cl'}, {'nom': 'Menthe'}],
+                        'is_favorite': True, 'rating': 5, 'user_prompt': 'Un classique cubain'}),
+            '{"name": ',
+            json.dumps({'name': 'Daiquiri', 'description': 'Acidulé', 'ingredients': [{'name': 'Rum'}]}),
+            json.dumps({'name': 'Punch', 'description': 'Fort', 'ingredients': [], 'difficulty_level': 'extreme'}),
+            '',
+            json.dumps({'name': 'Gin tonic', 'description': 'Amer', 'ingredients': [{'nom': 'Gin'}],
+                        'tags': ['Classique']}),
+        ])
+        with CaptureQueriesContext(connection) as context:
+            response = self._post(body)
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report['rows'], report['created'], report['failed']), (5, 3, 2))
+        self.assertEqual([error['line'] for error in report['errors']], [2, 4])
+        self.assertIn('difficulty_level', report['errors'][1]['errors'])
+
+        # Insertions groupées : pas une requête par cocktail
+        inserts = [
+            q['sql'] for q in context.captured_queries if q['sql'].startswith(f'INSERT INTO "{RECIPE_TABLE}"')
+        ]
+        self.assertEqual(len(inserts), 1)
+
+        mojito = CocktailRecipe.objects.get(user=self.user, name='Mojito')
+        self.assertEqual(mojito.generation_request.user_prompt, 'Un classique cubain')
+        self.assertEqual(CocktailRecipe.objects.get(name='Daiquiri').generation_request.context, 'import')
+        self.assertEqual(
+            list(mojito.ingredient_lines.values_list('ingredient__canonical_name', flat=True)),
+            ['rhum blanc', 'menthe']
+        )
+        self.assertEqual(CocktailRecipeTag.objects.filter(tag__name='Classique').count(), 2)
+        stats = user_stats.get_stats(self.user)
+        self.assertEqual((stats.total, stats.favorites, stats.rated), (3, 1, 1))
+        self.assertEqual(user_stats.check(self.user.pk), {})
+
+    def test_image_url_ignored(self):
+        # Chemin fourni par le fichier : ni enregistré ni transmis à la génération des variantes
+        body = json.dumps({'name': 'Mojito', 'description': 'Frais', 'ingredients': [{'nom': 'Rhum'}],
+                           'image_url': '../../settings.py'})
+        with mock.patch('cocktails.services.image_derivatives.schedule_derivatives') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self._post(body)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertIsNone(CocktailRecipe.objects.get(name='Mojito').image_url)
+        schedule.assert_not_called()
+
+    def test_csv_and_dry_run(self):
+        body = (
+            'name,description,ingredients,tags,preparation_time\n'
+            'Caipirinha,"Citron vert, cachaça","Cachaça: 5 cl; Citron vert: 1",Brésil,3\n'
+            'Sans nom,,,,\n'
+        )
+        response = self._post(body, 'text/csv', dry_run=1)
+        self.assertEqual((response.status_code, response.json()['failed']), (200, 1))
+        self.assertFalse(CocktailRecipe.objects.exists())
+
+        response = self._post(body, 'text/csv')
+        self.assertEqual(response.json()['errors'][0]['line'], 3)
+        recipe = CocktailRecipe.objects.get(name='Caipirinha')
+        self.assertEqual(recipe.ingredients[0], {'nom': 'Cachaça', 'quantite': '5 cl'})
+        self.assertEqual(recipe.preparation_time, 3)
+
+    def test_export_round_trip(self):
+        generation_request = GenerationRequest.objects.create(user=self.user, user_prompt='prompt')
+        CocktailRecipe.objects.create(
+            user=self.user, generation_request=generation_request, name='Negroni', description='Amer',
+            ingredients=[{'nom': 'Gin', 'quantite': '3 cl'}], is_favorite=True, rating=4,
+        )
+        other = User.objects.create(username='baz')
+        for export_format, content_type in [('ndjson', 'application/x-ndjson'), ('csv', 'text/csv')]:
+            with self.subTest(export_format=export_format):
+                exported = b''.join(self.api.get('/api/export/', {'type': export_format}).streaming_content)
+                client = APIClient()
+                client.force_authenticate(other)
+                response = client.generic('POST', '/api/import/', exported, content_type=content_type)
+                self.assertEqual(response.json()['failed'], 0)
+                copy = CocktailRecipe.objects.filter(user=other, name='Negroni').latest('created_at')
+                self.assertEqual(
+                    (copy.ingredients, copy.is_favorite, copy.rating),
+                    ([{'nom': 'Gin', 'quantite': '3 cl'}], True, 4)
+                )
+
+    def test_command(self):
+        path = os.path.join(tempfile.mkdtemp(), 'cocktails.ndjson')
+        with open(path, 'w', encoding='utf-8') as handle:
+            for i in range(7):
+                handle.write(json.dumps({'name': f'Cocktail {i}', 'description': 'D', 'ingredients': []}) + '\n')
+        out = io.StringIO()
+        call_command('import_cocktails', path, user='bar', batch_size=3, stdout=out)
+        self.assertIn('7 cocktail(s) importé(s)', out.getvalue())
+        self.assertEqual(user_stats.get_stats(self.user).total, 7)
+
+
+class KeysetPaginationTestCase(RecipeAPITestCase):
+    """Pagination par curseur : ordre stable malgré les insertions, aller-retour, curseurs invalides"""
+
+    def setUp(self):
+        super().setUp()
+        for i in range(25):
+            self._create(f"Cocktail {i:02d}")
+        # Dates identiques : seul id départage les cocktails
+        CocktailRecipe.objects.filter(user=self.user, name__lt='Cocktail 10').update(
+            created_at=CocktailRecipe.objects.filter(user=self.user).earliest('created_at').created_at
+        )
+
+    def _walk(self, ordering, cursor=None, key='next_cursor', url='/api/history/'):
+        seen = []
+        while True:
+            data = self.api.get(url, {'ordering': ordering, 'page_size': 4, 'cursor': cursor or ''}).json()
+            seen.append([item['id'] for item in data.get('results', data.get('favorites'))])
+            cursor = data[key]
+            if not cursor:
+                return seen, data
+
+    def test_walk_forward_and_back(self):
+        for ordering in ['recent', 'oldest', 'name', 'name_desc']:
+            with self.subTest(ordering=ordering):
+                pages, last = self._walk(ordering)
+                ids = [pk for page in pages for pk in page]
+                self.assertEqual(len(ids), 25)
+                self.assertEqual(len(set(ids)), 25)
+                self.assertEqual(last['count'], 25)
+
+                back = self.api.get('/api/history/', {
+                    'ordering': ordering, 'page_size': 4, 'cursor': last['previous_cursor'],
+                }).json()
+                self.assertEqual([item['id'] for item in back['results']], pages[-2])
+
+    def test_stable_under_inserts(self):
+        first = self.api.get('/api/history/', {'page_size': 10}).json()
+        # Nouveaux cocktails en tête de liste pendant la lecture : aucun doublon ni saut
+        for i in range(5):
+            self._create(f"Nouveau {i}")
+        second = self.api.get('/api/history/', {'page_size': 10, 'cursor': first['next_cursor']}).json()
+        first_ids = {item['id'] for item in first['results']}
+        self.assertFalse(first_ids & {item['id'] for item in second['results']})
+        self.assertEqual(second['count'], 30)
+
+        expected = list(
+            CocktailRecipe.objects.filter(user=self.user)
+            .exclude(pk__in=first_ids).exclude(name__startswith='Nouveau')
+            .order_by('-created_at', '-id').values_list('pk', flat=True)[:10]
+        )
+        self.assertEqual([item['id'] for item in second['results']], [str(pk) for pk in expected])
+
+    def test_count_is_optional(self):
+        data = self.api.get('/api/history/', {'count': 0}).json()
+        self.assertNotIn('count', data)
+        self.assertEqual(self.api.get('/api/history/', {'difficulty': 'medium'}).json()['count'], 25)
+
+    def test_invalid_cursor(self):
+        cursor = self.api.get('/api/history/', {'page_size': 4}).json()['next_cursor']
+        for params in [{'cursor': 'pas-un-curseur'}, {'cursor': cursor, 'ordering': 'name'}, {'ordering': 'prix'}]:
+            with self.subTest(**params):
+                self.assertEqual(self.api.get('/api/history/', params).status_code, 400)
+        self.assertEqual(self.api.get('/api/cocktails/', {'cursor': 'pas-un-curseur'}).status_code, 400)
+
+    def test_legacy_page_number(self):
+        data = self.api.get('/api/history/', {'page': 2, 'page_size': 10}).json()
+        self.assertEqual((data['page'], data['total_pages'], len(data['results'])), (2, 3, 10))
+        self.assertIn('next', self.api.get('/api/cocktails/', {'page': 1}).json())
+
+
+class IngredientCatalogueTestCase(RecipeAPITestCase):
+    """Catalogue normalisé : noms canoniques, quantités, synchronisation et filtres"""
+
+    def test_canonical_name(self):
+        self.assertEqual(ingredients.canonical_name('Feuilles de Menthe fraîche'), 'feuille de menthe fraiche')
+        self.assertEqual(ingredients.canonical_name('Rhum Blanc (Havana)'), 'rhum blanc')
+        self.assertEqual(ingredients.canonical_name('des Glaçons'), 'glacon')
+        self.assertEqual(ingredients.canonical_name('Lime'), 'citron vert')
+        self.assertEqual(ingredients.canonical_name('Ananas'), 'ananas')
+
+    def test_parse_quantity(self):
+        self.assertEqual(ingredients.parse_quantity('4 cl'), (Decimal('4'), 'cl', 40.0))
+        self.assertEqual(ingredients.parse_quantity('1,5 oz'), (Decimal('1.5'), 'oz', 45.0))
+        self.assertEqual(ingredients.parse_quantity('1/2'), (Decimal('0.50'), '', None))
+        self.assertEqual(ingredients.parse_quantity('2 c. à soupe'), (Decimal('2'), 'c. à soupe', 30.0))
+        self.assertEqual(ingredients.parse_quantity('3 feuilles'), (Decimal('3'), 'feuille', None))
+        self.assertEqual(ingredients.parse_quantity('À doser'), (None, '', None))
+
+    def test_lines_follow_recipe(self):
+        recipe = self._create('Mojito', [
+            {'nom': 'Rhum blanc', 'quantite': '5 cl'},
+            {'nom': 'Citron vert', 'quantité': '1/2'},
+            'Menthe',
+        ])
+        lines = list(recipe.ingredient_lines.values_list('ingredient__canonical_name', 'volume_ml'))
+        self.assertEqual(lines, [('rhum blanc', 50.0), ('citron vert', None), ('menthe', None)])
+
+        # Modification sans changement d'ingrédients : aucune réécriture
+        recipe = CocktailRecipe.objects.get(pk=recipe.pk)
+        line_ids = set(recipe.ingredient_lines.values_list('pk', flat=True))
+        recipe.is_favorite = True
+        recipe.save()
+        self.assertEqual(set(recipe.ingredient_lines.values_list('pk', flat=True)), line_ids)
+
+        recipe.ingredients.append({'nom': 'Eau gazeuse', 'quantite': '10 cl'})
+        recipe.save()
+        self.assertEqual(recipe.ingredient_lines.count(), 4)
+
+    def test_contains_filter(self):
+        self._create('Mojito', [{'nom': 'Rhum blanc'}, {'nom': 'Citron vert'}, {'nom': 'Menthe'}])
+        self._create('Daiquiri', [{'nom': 'Rhum ambré'}, {'nom': 'Jus de citron vert'}])
+        self._create('Gin tonic', [{'nom': 'Gin'}, {'nom': 'Tonic'}])
+
+        def names(query):
+            response = self.api.get('/api/history/', {'ingredients': query})
+            self.assertEqual(response.status_code, 200)
+            return sorted(r['name'] for r in response.json()['results'])
+
+        self.assertEqual(names('rhum, citron vert'), ['Daiquiri', 'Mojito'])
+        self.assertEqual(names('rum,lime,menthe'), ['Mojito'])
+        self.assertEqual(names('vodka'), [])
+
+    def test_makeable(self):
+        self._create('Mojito', [{'nom': 'Rhum blanc'}, {'nom': 'Citron vert'}, {'nom': 'Menthe'}])
+        self._create('Gin tonic', [{'nom': 'Gin'}, {'nom': 'Tonic'}])
+
+        response = self.api.get('/api/ingredients/makeable/', {'available': 'rhum,citron vert'})
+        self.assertEqual(response.json()['count'], 0)
+
+        response = self.api.get('/api/ingredients/makeable/', {'available': 'rhum,citron vert', 'max_missing': 1})
+        results = response.json()['results']
+        self.assertEqual([r['name'] for r in results], ['Mojito'])
+        self.assertEqual(results[0]['missing_ingredients'], ['Menthe'])
+
+        response = self.api.get('/api/ingredients/makeable/', {'available': 'gin,tonic,rhum'})
+        self.assertEqual([r['name'] for r in response.json()['results']], ['Gin tonic'])
+
+
+class IngredientsSummaryTestCase(RecipeAPITestCase):
+    """Nombre d'ingrédients et palier de coût : colonnes maintenues à la sauvegarde, filtres et tris sans le JSON"""
+
+    def setUp(self):
+        super().setUp()
+        self.recipes = [self._create(f"Cocktail {count}", count) for count in (2, 4, 7, 3)]
+
+    def _create(self, name, count):
+        return super()._create(name, [{'nom': f"Ingrédient {i}", 'quantite': '2 cl'} for i in range(count)])
+
+    def test_maintained_on_save(self):
+        recipe = self.recipes[0]
+        self.assertEqual((recipe.ingredients_count, recipe.cost_tier, recipe.estimated_cost), (2, 1, '€'))
+
+        recipe.ingredients += [{'nom': 'Sucre'}] * 4
+        recipe.save(update_fields=['ingredients'])
+        recipe = CocktailRecipe.objects.get(pk=recipe.pk)
+        self.assertEqual((recipe.ingredients_count, recipe.cost_tier, recipe.estimated_cost), (6, 3, '€€€'))
+
+    def test_filters_and_ordering(self):
+        def names(**params):
+            response = self.api.get('/api/history/', params)
+            self.assertEqual(response.status_code, 200)
+            return [item['name'] for item in response.json()['results']]
+
+        self.assertEqual(names(min_ingredients=3, max_ingredients=4, ordering='ingredients'), ['Cocktail 3', 'Cocktail 4'])
+        self.assertEqual(names(cost_tier=2), ['Cocktail 4'])
+        self.assertEqual(names(ordering='ingredients_desc', page_size=2), ['Cocktail 7', 'Cocktail 4'])
+
+        cursor = self.api.get('/api/cocktails/', {'ordering': 'ingredients_desc', 'page_size': 2}).json()['next_cursor']
+        response = self.api.get('/api/cocktails/', {'ordering': 'ingredients_desc', 'page_size': 2, 'cursor': cursor})
+        self.assertEqual([item['ingredients_count'] for item in response.json()['results']], [3, 2])
+        self.assertEqual(self.api.get('/api/cocktails/', {'cost_tier': 1}).json()['count'], 2)
+
+        self.assertEqual(self.api.get('/api/history/', {'min_ingredients': 'beaucoup'}).status_code, 400)
+
+    def test_lists_skip_ingredients_json(self):
+        for url in ['/api/history/', '/api/cocktails/', '/api/favorites/']:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as context:
+                    self.api.get(url, {'min_ingredients': 1} if url != '/api/favorites/' else {})
+                selects = [q['sql'] for q in context.captured_queries if RECIPE_TABLE in q['sql']]
+                self.assertTrue(selects)
+                self.assertFalse(any(f'"{RECIPE_TABLE}"."ingredients"' in sql for sql in selects))
+
+    def test_import(self):
+        body = json.dumps({'name': 'Importé', 'description': 'D', 'ingredients': [
+            {'nom': name} for name in ('Gin', 'Tonic', 'Citron', 'Glace', 'Concombre')
+        ]})
+        response = self.api.generic('POST', '/api/import/', body.encode('utf-8'), content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        recipe = CocktailRecipe.objects.get(name='Importé')
+        self.assertEqual((recipe.ingredients_count, recipe.cost_tier), (5, 2))
+
+
+class SimilarCocktailsTestCase(RecipeAPITestCase):
+    """Cocktails proches : cosinus sur les ingrédients du catalogue, parmi les cocktails de tous les utilisateurs"""
+
+    def setUp(self):
+        # Matrice propre au processus : reconstruite sur la base de ce test
+        similarity_index.reset()
+        super().setUp()
+
+        self.mojito = self._create('Mojito', ['Rhum blanc', 'Citron vert', 'Menthe', 'Sucre'])
+        self.daiquiri = self._create('Daiquiri', ['White rum', 'Lime', 'Sucre'])
+        self.punch = self._create('Punch', ['Rhum blanc', 'Ananas', 'Orange', 'Cannelle', 'Muscade', 'Sucre'])
+        self._create('Gin tonic', ['Gin', 'Tonic'])
+
+        self.other = User.objects.create(username='baz')
+        self.royal = self._create(
+            'Mojito royal', ['Rhum blanc', 'Citron vert', 'Menthe', 'Sucre', 'Sugar'], user=self.other,
+            description='Pour les 30 ans de Julie',
+        )
+
+    def _create(self, name, names, **kwargs):
+        return super()._create(name, [{'nom': name, 'quantite': '2 cl'} for name in names], **kwargs)
+
+    def _names(self, limit=similarity.SIMILAR_LIMIT):
+        recipes = dict(CocktailRecipe.objects.values_list('pk', 'name'))
+        return [recipes[match['recipe_id']] for match in similarity.similar(self.user, self.mojito.pk, limit)]
+
+    def test_ranking(self):
+        matches = similarity.similar(self.user, self.mojito.pk)
+        # Mojito royal d'un autre utilisateur : « Sucre » et « Sugar » ne comptent qu'une fois -> 4 / sqrt(16)
+        # Daiquiri : 3 ingrédients communs sur 4 et 3 (synonymes compris) -> 3 / sqrt(12)
+        self.assertEqual(
+            [match['recipe_id'] for match in matches], [self.royal.pk, self.daiquiri.pk, self.punch.pk]
+        )
+        self.assertEqual([match['shared'] for match in matches], [4, 3, 2])
+        self.assertEqual([match['similarity'] for match in matches], [1.0, 0.866, 0.408])
+        self.assertEqual([match['is_own'] for match in matches], [False, True, True])
+        self.assertEqual(self._names(limit=1), ['Mojito royal'])
+        self.assertIsNone(similarity.similar(self.user, self.royal.pk))
+
+    def test_privacy(self):
+        self.other.is_active = False
+        self.other.save()
+        self.assertEqual(self._names(), ['Daiquiri', 'Punch'])
+
+    def test_incremental_refresh(self):
+        self.assertEqual(self._names(), ['Mojito royal', 'Daiquiri', 'Punch'])
+
+        fraise = self._create('Mojito fraise', ['Rhum blanc', 'Citron vert', 'Menthe', 'Sucre', 'Fraise'], user=self.other)
+        self.punch.ingredients = [{'nom': 'Gin'}]
+        self.punch.save()
+        self.royal.delete()
+        self.assertEqual(self._names(), ['Mojito fraise', 'Daiquiri'])
+
+        # Fusion des cocktails modifiés dans la matrice : mêmes résultats
+        with mock.patch.object(similarity, 'COMPACT_THRESHOLD', 0):
+            self._create('Gimlet', ['Gin', 'Citron vert'])
+        self.assertEqual(self._names(), ['Mojito fraise', 'Daiquiri', 'Gimlet'])
+        self.assertEqual(similarity.similar(self.user, self.mojito.pk)[0]['recipe_id'], fraise.pk)
+
+    def test_worker_journal(self):
+        # Autre worker : sa matrice ne suit que le journal des versions du corpus
+        worker = similarity.SimilarityIndex()
+        worker.refresh()
+        target = set(CocktailIngredient.objects.filter(recipe=self.mojito).values_list('ingredient_id', flat=True))
+
+        def nearest():
+            return [recipe_id for recipe_id, _, _ in worker.nearest(target, 10, exclude={self.mojito.pk})]
+
+        # Cocktail vidé de ses ingrédients puis réécritures nombreuses ailleurs : il est bien retiré
+        self.royal.ingredients = []
+        self.royal.save()
+        for i in range(3):
+            self._create(f'Sour {i}', ['Whisky', 'Citron', 'Sucre'])
+        self.assertNotIn(self.royal.pk, nearest())
+        self.assertEqual(len(nearest()), 5)
+
+        # Journal expiré : reconstruction complète, mêmes résultats
+        worker_version = worker._version
+        self.daiquiri.delete()
+        worker.cache.delete(similarity.CHANGES_KEY.format(version=worker_version + 1))
+        self._create('Sour 3', ['Whisky', 'Citron', 'Sucre'])
+        with mock.patch.object(worker, '_build', wraps=worker._build) as build:
+            self.assertNotIn(self.daiquiri.pk, nearest())
+        build.assert_called_once()
+        self.assertEqual(worker._version, similarity_index.version())
+
+    def test_api(self):
+        response = self.api.get(f'/api/cocktails/{self.mojito.pk}/similar/')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([item['name'] for item in results], ['Mojito royal', 'Daiquiri', 'Punch'])
+        self.assertEqual(results[1]['shared_ingredients'], 3)
+        self.assertEqual([item['is_own'] for item in results], [False, True, True])
+        # Champs publics seulement pour tous les cocktails proposés
+        for field in ('description', 'rating', 'is_favorite', 'user', 'generation_request'):
+            self.assertNotIn(field, results[0])
+
+        # Nouveau cocktail d'un autre utilisateur : la réponse en cache et l'ETag sont écartés
+        etag = response['ETag']
+        self._create('Mojito fraise', ['Rhum blanc', 'Citron vert', 'Menthe', 'Sucre', 'Fraise'], user=self.other)
+        response = self.api.get(f'/api/cocktails/{self.mojito.pk}/similar/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Mojito fraise', [item['name'] for item in response.json()['results']])
+        response = self.api.get(f'/api/cocktails/{self.mojito.pk}/similar/', {'limit': 1})
+        self.assertEqual([item['name'] for item in response.json()['results']], ['Mojito royal'])
+
+        self.assertEqual(self.api.get(f'/api/cocktails/{self.royal.pk}/similar/').status_code, 404)
+        self.assertEqual(self.api.get('/api/cocktails/inconnu/similar/').status_code, 404)
+
+    def test_detail_page(self):
+        self.client.force_login(self.user)
+        response = self.client.get(f'/cocktail/{self.mojito.pk}/')
+        self.assertContains(response, 'Vous aimerez aussi')
+        self.assertEqual(
+            [item['cocktail'].name for item in response.context['similar_cocktails']],
+            ['Mojito royal', 'Daiquiri', 'Punch'],
+        )
+        self.assertContains(response, '87%')
+        # Cocktail d'un autre utilisateur : vignette sans lien ni description
+        self.assertNotContains(response, f'/cocktail/{self.royal.pk}/')
+        self.assertContains(response, f'/cocktail/{self.daiquiri.pk}/')
+        self.assertNotContains(response, 'Julie')
+
+        # La page dépend des cocktails de tous les utilisateurs : une création change son ETag
+        etag = response['ETag']
+        self.assertEqual(self.client.get(f'/cocktail/{self.mojito.pk}/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self._create('Mojito fraise', ['Rhum blanc', 'Citron vert', 'Menthe', 'Sucre', 'Fraise'], user=self.other)
+        response = self.client.get(f'/cocktail/{self.mojito.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Mojito fraise')
+
+    def test_corpus_version(self):
+        # Note et favori ne sont pas montrés aux autres utilisateurs : pages en cache et ETags conservés
+        version = similarity_index.version()
+        recipe = CocktailRecipe.objects.get(pk=self.punch.pk)
+        recipe.rating = 4
+        recipe.is_favorite = True
+        recipe.save()
+        self.assertEqual(similarity_index.version(), version)
+
+        recipe.name = 'Planteur'
+        recipe.save()
+        self.assertNotEqual(similarity_index.version(), version)
+        version = similarity_index.version()
+        recipe.delete()
+        self.assertNotEqual(similarity_index.version(), version)
+
+    @override_settings(MEDIA_ACCESS_POLICY='owner')
+    def test_private_images(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        with override_settings(MEDIA_ROOT=media_root.name):
+            path = image_store.save(b'\x89PNG\r\n\x1a\n' + b'\x03' * 64)
+            lqip = 'data:image/webp;base64,UklGRg=='
+            CocktailRecipe.objects.filter(pk=self.royal.pk).update(image_url=path, image_lqip=lqip)
+            own_path = image_store.save(b'\x89PNG\r\n\x1a\n' + b'\x04' * 64)
+            CocktailRecipe.objects.filter(pk=self.daiquiri.pk).update(image_url=own_path)
+
+            # Cocktail d'un autre utilisateur : aperçu flou seul, ni src ni srcset
+            results = self.api.get(f'/api/cocktails/{self.mojito.pk}/similar/').json()['results']
+            royal, daiquiri = results[0], results[1]
+            self.assertEqual((royal['image_src'], royal['image_srcset']), ('', {'webp': '', 'jpeg': ''}))
+            self.assertEqual(royal['image_lqip'], lqip)
+            self.assertIn(own_path, daiquiri['image_src'])
+
+            self.client.force_login(self.user)
+            response = self.client.get(f'/cocktail/{self.mojito.pk}/')
+            self.assertContains(response, lqip)
+            self.assertNotContains(response, path)
+            self.assertContains(response, own_path)
+            # Le fichier reste inaccessible à un autre utilisateur que son propriétaire
+            self.assertEqual(self.client.get(f'/media/{path}').status_code, 404)
+            self.assertEqual(self.client.get(f'/media/{own_path}').status_code, 200)
+
+
+@override_settings(CACHES={
+    **settings.CACHES,
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'image-cache-default'},
+    'stability_images': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'image-cache'},
+})
+class ImageCacheTestCase(TestCase):
+    """Cache des images Stability AI : une image remise est protégée du nettoyage, compteurs hors du cache des images"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.path = image_store.save(b'\x89PNG\r\n\x1a\n' + b'\x00' * 64)
+        self.target = image_store.media_root / self.path
+        old = time.time() - 3600
+        os.utime(self.target, (old, old))
+        self.key = image_cache.make_key('core', 'economy', 'Mojito', '1024x1024', None)
+        image_cache.set(self.key, self.path)
+
+    def test_hit_refreshes_mtime(self):
+        self.assertEqual(image_cache.get(self.key, credits=3), self.path)
+        self.assertGreater(self.target.stat().st_mtime, time.time() - 60)
+        # Aucun cocktail ne la référence encore : conservée pendant le délai de grâce
+        self.assertFalse(image_store.release(self.path))
+        self.assertTrue(self.target.exists())
+
+    def test_counters(self):
+        image_cache.get(self.key, credits=3)
+        self.target.unlink()
+        self.assertIsNone(image_cache.get(self.key))
+        self.assertEqual(image_cache.get_stats(), {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'credits_saved': 3.0})
+        self.assertIsNone(caches['stability_images'].get(self.key))
+        self.assertIsNone(caches['stability_images'].get('stability:stats:hits'))
+
+
+class ImageStreamTestCase(TestCase):
+    """Enregistrement en flux : extension reconnue même si le premier morceau est plus court que la signature"""
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_short_first_chunk(self):
+        images = {
+            'png': b'\x89PNG\r\n\x1a\n' + b'\x01' * 40,
+            'webp': b'RIFF\x24\x00\x00\x00WEBPVP8 ' + b'\x02' * 40,
+            'jpg': b'\xff\xd8\xff\xe0' + b'\x03' * 40,
+        }
+        for extension, data in images.items():
+            with self.subTest(extension=extension):
+                body = json.dumps({'artifacts': [{'base64': base64.b64encode(data).decode()}]}).encode()
+                # Réseau découpé finement : le premier bloc décodé fait 3 octets
+                chunks = [body[i:i + 7] for i in range(0, len(body), 7)]
+                path = image_store.save_stream(iter_base64_artifact(chunks))
+                self.assertTrue(path.endswith(f'.{extension}'))
+                self.assertEqual((image_store.media_root / path).read_bytes(), data)
+
+
+class ImageStoreTestCase(RecipeAPITestCase):
+    """Stockage adressé par contenu : chemins, dédoublonnage, libération et planification des variantes"""
+
+    PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _age(self, path, seconds=3600):
+        old = time.time() - seconds
+        os.utime(image_store.media_root / path, (old, old))
+
+    def test_content_addressed(self):
+        path = image_store.save(self.PNG)
+        digest = hashlib.sha256(self.PNG).hexdigest()
+        self.assertEqual(path, f"cocktail_images/{digest[:2]}/{digest[2:4]}/{digest}.png")
+        self.assertTrue(image_store.is_stored_path(path))
+        self.assertEqual((image_store.media_root / path).read_bytes(), self.PNG)
+        # Aucun fichier temporaire laissé dans le dossier d'écriture
+        self.assertEqual(list((image_store.media_root / 'cocktail_images' / '.staging').iterdir()), [])
+
+    def test_duplicate_shares_file(self):
+        path = image_store.save(self.PNG)
+        self._age(path)
+        self.assertEqual(image_store.save_stream([self.PNG[:5], self.PNG[5:]]), path)
+        files = [p for p in (image_store.media_root / 'cocktail_images').rglob('*.png')]
+        self.assertEqual(len(files), 1)
+        # Doublon : date rafraîchie, l'image est protégée du nettoyage pendant le délai de grâce
+        self.assertGreater(files[0].stat().st_mtime, time.time() - 60)
+
+    def test_release(self):
+        path = image_store.save(self.PNG)
+        self._age(path)
+        derivative = image_store.media_root / derivative_paths(path)[0]
+        derivative.parent.mkdir(parents=True)
+        derivative.write_bytes(b'variante')
+
+        recipe = self._create('Mojito', image_url=path)
+        self.assertFalse(image_store.release(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe.delete()
+        self.assertFalse((image_store.media_root / path).exists())
+        self.assertFalse(derivative.exists())
+
+    def test_release_grace_and_foreign_paths(self):
+        path = image_store.save(self.PNG)
+        self.assertFalse(image_store.release(path))
+        self.assertTrue((image_store.media_root / path).exists())
+        self.assertFalse(image_store.release('cocktail_images/placeholder_2ed8a5ba.jpg'))
+
+    @mock.patch('cocktails.signals.schedule_derivatives')
+    def test_scheduling(self, schedule):
+        def saved(recipe, **kwargs):
+            schedule.reset_mock()
+            with self.captureOnCommitCallbacks(execute=True):
+                recipe.save(**kwargs)
+            return [call.args for call in schedule.call_args_list]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = self._create('Mojito', image_url='cocktail_images/a.png')
+        self.assertEqual(schedule.call_args_list, [mock.call(recipe.pk, 'cocktail_images/a.png')])
+
+        # Génération échouée (variantes absentes) : pas de nouvelle tentative à chaque sauvegarde
+        recipe.is_favorite = True
+        self.assertEqual(saved(recipe), [])
+        self.assertEqual(saved(recipe, update_fields=['is_favorite']), [])
+        recipe = CocktailRecipe.objects.get(pk=recipe.pk)
+        self.assertEqual(saved(recipe), [])
+
+        recipe.image_url = 'cocktail_images/b.png'
+        self.assertEqual(saved(recipe), [(recipe.pk, 'cocktail_images/b.png')])
+
+        CocktailRecipe.objects.filter(pk=recipe.pk).update(image_variants={'card': {}}, image_lqip='data:')
+        recipe = CocktailRecipe.objects.get(pk=recipe.pk)
+        self.assertEqual(saved(recipe), [])
+        # Variantes effacées : régénération demandée
+        recipe.image_variants, recipe.image_lqip = {}, ''
+        self.assertEqual(
+            saved(recipe, update_fields=['image_variants', 'image_lqip']), [(recipe.pk, 'cocktail_images/b.png')]
+        )
+
+
+@override_settings(MEDIA_ACCESS_POLICY='owner')
+class ImageDerivativesTestCase(RecipeAPITestCase):
+    """Variantes WebP et JPEG par taille : fichiers écrits, enregistrées sur le cocktail, rendues en srcset"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (600, 600), (200, 40, 80)).save(buffer, 'PNG')
+        self.path = image_store.save(buffer.getvalue())
+        self.recipe = self._create('Mojito', image_url=self.path)
+
+    def test_build_derivatives(self):
+        variants = generate_derivatives(self.recipe.pk, self.path)
+        # Pas d'agrandissement au-delà de l'original
+        self.assertEqual({size: variant['width'] for size, variant in variants.items()},
+                         {'thumb': 256, 'card': 512, 'full': 600})
+        for variant in variants.values():
+            for format_key, pil_format in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+                with Image.open(image_store.media_root / variant[format_key]) as image:
+                    self.assertEqual((image.format, image.width), (pil_format, variant['width']))
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_variants, variants)
+        srcset = ', '.join(f"{media_url(variants[size]['webp'])} {variants[size]['width']}w"
+                           for size in ('thumb', 'card', 'full'))
+        self.assertEqual(get_image_srcset(self.recipe, 'webp'), srcset)
+
+        self.client.force_login(self.user)
+        response = self.client.get(f'/cocktail/{self.recipe.pk}/')
+        self.assertContains(response, f'srcset="{srcset}"')
+        self.assertContains(response, media_url(variants['card']['jpeg']))
+
+    def test_lqip(self):
+        generate_derivatives(self.recipe.pk, self.path)
+        self.recipe.refresh_from_db()
+        prefix = 'data:image/webp;base64,'
+        self.assertTrue(self.recipe.image_lqip.startswith(prefix))
+        with Image.open(io.BytesIO(base64.b64decode(self.recipe.image_lqip[len(prefix):]))) as preview:
+            self.assertEqual((preview.format, preview.size), ('WEBP', (16, 16)))
+        # Quelques centaines d'octets au plus : intégré tel quel dans les pages et l'API
+        self.assertLess(len(self.recipe.image_lqip), 400)
+        response = self.api.get(f'/api/cocktails/{self.recipe.pk}/')
+        self.assertEqual(response.json()['image_lqip'], self.recipe.image_lqip)
+
+    def test_placeholder_is_deterministic(self):
+        service = StabilityAIService()
+        path = service._generate_placeholder_image('Mojito')
+        self.assertIn(path.rsplit('/', 1)[-1], PLACEHOLDER_IMAGES)
+        self.assertEqual(service._generate_placeholder_image(' mojito '), path)
+        self.assertEqual(StabilityAIService()._generate_placeholder_image('Mojito'), path)
+        names = {service._generate_placeholder_image(f'Cocktail {i}') for i in range(50)}
+        self.assertGreater(len(names), 1)
+
+
+class CleanupMediaTestCase(RecipeAPITestCase):
+    """cleanup_media : orphelins et fichiers partiels, délai de grâce, variantes, placeholders, quarantaine"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.root = image_store.media_root
+
+        referenced = image_store.save(b'\x89PNG\r\n\x1a\n' + b'\x05' * 64)
+        self._create('Mojito', image_url=referenced)
+        orphan = f"cocktail_images/ab/cd/{'a' * 64}.png"
+        self.kept = [
+            referenced,
+            # Variante d'une image référencée (source retrouvée par source_candidates)
+            derivative_paths(referenced)[0],
+            'cocktail_images/placeholder_2ed8a5ba.jpg',
+            'cocktail_images/derivatives/placeholder_2ed8a5ba_thumb.webp',
+        ]
+        self.orphans = [orphan, derivative_paths(orphan)[1], 'cocktail_images/.staging/upload.part']
+        # Récents : une génération est peut-être en cours
+        self.recent = [f"cocktail_images/ef/01/{'b' * 64}.png", 'cocktail_images/.staging/recent.part']
+        for size, path in enumerate(self.kept + self.orphans + self.recent, start=10):
+            target = self.root / path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if not target.exists():
+                target.write_bytes(b'x' * size)
+            if path not in self.recent:
+                old = time.time() - 2 * 24 * 3600
+                os.utime(target, (old, old))
+        self.orphan_bytes = sum((self.root / path).stat().st_size for path in self.orphans)
+
+    def _cleanup(self, **options):
+        out = io.StringIO()
+        call_command('cleanup_media', stdout=out, **options)
+        return out.getvalue()
+
+    def _existing(self, paths):
+        return [path for path in paths if (self.root / path).exists()]
+
+    def test_dry_run(self):
+        output = self._cleanup(dry_run=True)
+        self.assertIn(f'{self.orphan_bytes} octets', output)
+        self.assertIn('2 orphelin(s), 1 fichier(s) partiel(s)', output)
+        self.assertEqual(self._existing(self.kept + self.orphans + self.recent), self.kept + self.orphans + self.recent)
+
+    def test_delete(self):
+        output = self._cleanup()
+        self.assertIn(f'✅ {self.orphan_bytes} octets', output)
+        self.assertEqual(self._existing(self.orphans), [])
+        self.assertEqual(self._existing(self.kept + self.recent), self.kept + self.recent)
+
+    def test_grace_period(self):
+        self._cleanup(older_than=24 * 3)
+        self.assertEqual(self._existing(self.orphans), self.orphans)
+
+    def test_quarantine(self):
+        quarantine = self.root / 'quarantaine'
+        self._cleanup(quarantine=str(quarantine))
+        self.assertEqual(self._existing(self.orphans), [])
+        self.assertTrue(all((quarantine / path).exists() for path in self.orphans))
+        self.assertEqual(self._existing(self.kept + self.recent), self.kept + self.recent)
+
+
+class MediaOwnershipTestCase(RecipeAPITestCase):
+    """Politique owner : un client ne peut pas s'attribuer l'image d'un autre en écrivant image_url"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        override = override_settings(MEDIA_ROOT=media_root.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        self.other = User.objects.create(username='baz')
+        self.path = image_store.save(b'\x89PNG\r\n\x1a\n' + b'\x02' * 64)
+        self._create('Privé', user=self.other, image_url=self.path)
+        self.client.force_login(self.user)
+
+    def _status(self):
+        return self.client.get(f'/media/{self.path}').status_code
+
+    def test_image_url_cannot_be_claimed(self):
+        self.assertEqual(self._status(), 404)
+
+        body = json.dumps({'name': 'Volé', 'description': 'x', 'ingredients': [{'nom': 'Rhum'}], 'image_url': self.path})
+        self.api.generic('POST', '/api/import/', body.encode(), content_type='application/x-ndjson')
+        serializer = CocktailRecipeCreateSerializer(data={
+            'name': 'Volé', 'description': 'x', 'ingredients': [{'nom': 'Rhum'}], 'image_url': self.path,
+        })
+        self.assertTrue(serializer.is_valid())
+        self.assertNotIn('image_url', serializer.validated_data)
+        own = self._create('Mojito')
+        self.api.patch(f'/api/cocktails/{own.pk}/', {'image_url': self.path}, format='json')
+
+        self.assertFalse(CocktailRecipe.objects.filter(user=self.user, image_url=self.path).exists())
+        self.assertEqual(CocktailRecipe.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(self._status(), 404)
+
+    def test_owner_access(self):
+        self.client.force_login(self.other)
+        self.assertEqual(self._status(), 200)
+
+
+class RemoteMediaTestCase(RecipeAPITestCase):
+    """Image absente du nœud, présente dans le stockage distant : même politique d'accès qu'en local"""
+
+    PNG = b'\x89PNG\r\n\x1a\n' + b'\x01' * 64
+
+    def setUp(self):
+        super().setUp()
+        media_root, remote_root = tempfile.TemporaryDirectory(), tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        self.addCleanup(remote_root.cleanup)
+        storages = {**settings.STORAGES, 'cocktail_images': {
+            'BACKEND': 'django.core.files.storage.FileSystemStorage',
+            'OPTIONS': {'location': remote_root.name, 'base_url': 'https://bucket.example/'},
+        }}
+        override = override_settings(MEDIA_ROOT=media_root.name, STORAGES=storages, MEDIA_ACCESS_POLICY='owner')
+        override.enable()
+        self.addCleanup(override.disable)
+
+        # Image générée sur un autre nœud : seule la copie distante existe
+        self.path = image_store.save(self.PNG)
+        media_storage.upload([self.path])
+        (image_store.media_root / self.path).unlink()
+        self._create('Mojito', image_url=self.path)
+        self.client.force_login(self.user)
+
+    def test_signed_redirect(self):
+        signed = 'https://bucket.example/image.png?X-Amz-Expires=300&X-Amz-Signature=abc'
+        with mock.patch.object(media_storage, 'signed_url', return_value=signed) as signer:
+            response = self.client.get(f'/media/{self.path}')
+        self.assertEqual((response.status_code, response['Location']), (302, signed))
+        signer.assert_called_once_with(self.path, settings.MEDIA_SIGNED_URL_EXPIRE)
+        self.assertTrue(response['Cache-Control'].startswith('private'))
+
+    def test_s3_signed_url(self):
+        # Signature calculée localement (aucun appel réseau), même avec un domaine CDN non signé
+        storages = {**settings.STORAGES, 'cocktail_images': {'BACKEND': 'storages.backends.s3.S3Storage', 'OPTIONS': {
+            'bucket_name': 'cocktails', 'access_key': 'key', 'secret_key': 'secret', 'region_name': 'eu-west-3',
+            'custom_domain': 'cdn.example', 'querystring_auth': False,
+        }}}
+        with self.settings(STORAGES=storages):
+            self.assertEqual(media_storage.url(self.path), f'https://cdn.example/{self.path}')
+            url = media_storage.signed_url(self.path, 300)
+        self.assertFalse(url.startswith('https://cdn.example/'))
+        self.assertIn(f'{self.path}?', url)
+        self.assertIn('X-Amz-Expires=300', url)
+        self.assertIn('X-Amz-Signature=', url)
+        self.assertIn('response-cache-control=private', url)
+
+    def test_served_without_signature(self):
+        # Stockage qui ne signe pas : jamais de redirection vers son URL permanente
+        response = self.client.get(f'/media/{self.path}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.PNG)
+
+    def test_other_user_and_public_policy(self):
+        self.client.force_login(User.objects.create(username='baz'))
+        self.assertEqual(self.client.get(f'/media/{self.path}').status_code, 404)
+        with self.settings(MEDIA_ACCESS_POLICY='public'):
+            response = self.client.get(f'/media/{self.path}')
+        self.assertEqual((response.status_code, response['Location']), (302, f'https://bucket.example/{self.path}'))
+
+
+@override_settings(STABILITY_AI_DAILY_CREDIT_BUDGET=10, STABILITY_AI_USER_DAILY_CREDIT_BUDGET=0)
+class CreditGovernorTestCase(TestCase):
+    """Budget de crédits : réservation atomique, une seule ligne système par jour, comptes supprimés"""
+
+    COSTS = {'quality': 6.5, 'balanced': 4, 'economic': 3}
+
+    def setUp(self):
+        self.user = User.objects.create(username='bar')
+
+    def _reserve(self, credits, user=None):
+        return credit_governor.reserve('balanced', user, {'balanced': credits})
+
+    def _spend(self, credits, user=None):
+        """Consommation déjà inscrite au registre du jour"""
+        usage, _ = ImageCreditUsage.objects.get_or_create(user=user, day=timezone.localdate())
+        usage.credits += Decimal(str(credits))
+        usage.images += 1
+        usage.save()
+
+    def test_single_system_row(self):
+        self._reserve(2)
+        self._reserve(1.5)
+        rows = ImageCreditUsage.objects.filter(user__isnull=True)
+        self.assertEqual(list(rows.values_list('credits', 'images')), [(Decimal('3.50'), 2)])
+
+    def test_reserve_and_refund(self):
+        first = credit_governor.reserve('quality', self.user, self.COSTS)
+        self.assertEqual((first.mode, first.credits), ('quality', Decimal('6.5')))
+        # Solde lu après la première réservation : 3,5 crédits restants
+        second = credit_governor.reserve('quality', self.user, self.COSTS)
+        self.assertEqual(second.mode, 'economic')
+        self.assertEqual(credit_governor.spent_today(), 9.5)
+        self.assertEqual(credit_governor.reserve('quality', self.user, self.COSTS).mode, 'placeholder')
+
+        credit_governor.refund(second)
+        credit_governor.refund(second)
+        self.assertEqual(credit_governor.spent_today(), 6.5)
+        self.assertEqual(ImageCreditUsage.objects.get(user=self.user).images, 1)
+
+    def test_mode_step_down(self):
+        costs = {'quality': 2, 'balanced': 1, 'economic': 0.5}
+        self.assertEqual((credit_governor.mode_cap(), credit_governor.choose_mode('quality', None, costs)),
+                         ('quality', 'quality'))
+        # Moitié du budget consommée : quality n'est plus autorisé, jamais plus cher que le mode demandé
+        self._spend(5)
+        self.assertEqual(credit_governor.mode_cap(), 'balanced')
+        self.assertEqual(credit_governor.choose_mode('quality', None, costs), 'balanced')
+        self.assertEqual(credit_governor.choose_mode('economic', None, costs), 'economic')
+        self._spend(3)
+        self.assertEqual(credit_governor.choose_mode('quality', None, costs), 'economic')
+        # Plafond economic mais crédits restants inférieurs au coût d'une image
+        self._spend(1.8)
+        self.assertEqual(credit_governor.mode_cap(), 'economic')
+        self.assertEqual(credit_governor.choose_mode('quality', None, costs), 'placeholder')
+        self._spend(0.2)
+        self.assertEqual(credit_governor.mode_cap(), 'placeholder')
+
+    @override_settings(STABILITY_AI_USER_DAILY_CREDIT_BUDGET=4)
+    def test_user_budget_and_provider_exhausted(self):
+        self._spend(2, self.user)
+        # Le budget le plus entamé (ici celui de l'utilisateur) fixe le plafond
+        self.assertEqual((credit_governor.mode_cap(), credit_governor.mode_cap(self.user)), ('quality', 'balanced'))
+        self.addCleanup(caches['default'].delete, PROVIDER_EXHAUSTED_KEY)
+        credit_governor.mark_provider_exhausted()
+        self.assertEqual(credit_governor.mode_cap(), 'placeholder')
+        self.assertEqual(credit_governor.choose_mode('quality', self.user, self.COSTS), 'placeholder')
+
+    def test_deleted_user(self):
+        self._reserve(2)
+        self._reserve(3, self.user)
+        self.user.delete()
+        rows = ImageCreditUsage.objects.all()
+        self.assertEqual(list(rows.values_list('user', 'credits', 'images')), [(None, Decimal('5.00'), 2)])
+        self.assertEqual(credit_governor.spent_today(), 5)
@@ -14,4 +14,5 @@ urlpatterns = [
     path('cocktail/<uuid:pk>/', views.cocktail_detail_view, name='cocktail_detail'),
     path('cocktail/<uuid:pk>/favorite/', views.toggle_favorite, name='toggle_favorite'),
     path('history/', views.cocktail_history_view, name='history'),
+    path('history/slides/', views.cocktail_history_slides, name='history_slides'),
 ]
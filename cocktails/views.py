@@ -3,15 +3,33 @@ from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import HttpResponse, JsonResponse
-from django.core.paginator import Paginator
+from django.core.paginator import Page, Paginator
+from django.template.loader import render_to_string
 from .forms import CustomUserCreationForm, CustomAuthenticationForm, CocktailGenerationForm
 from .models import CocktailRecipe, GenerationRequest
+from .services import bulk, user_stats
 from .services.ai_factory import AIServiceFactory
+from .services.conditional import conditional, recipe_page_validators
+from .services.pagination import InvalidCursor, ordered, paginate, parse_page_size
+from .services.response_cache import response_cache
+from .services.similarity import similar, similarity_index
 import json
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Tris de l'historique → tris de la pagination par curseur (id départage les égalités)
+HISTORY_ORDERINGS = {
+    'date_desc': 'recent',
+    'date_asc': 'oldest',
+    'name_asc': 'name',
+    'name_desc': 'name_desc',
+}
+# Diapositives du carousel mobile rendues avec la page, puis chargées par fenêtres de cette taille
+CAROUSEL_WINDOW = 10
+# Cocktails proches proposés sur la page de détail
+DETAIL_SIMILAR_LIMIT = 4
+
 def home(request):
     """Page d'accueil"""
     return render(request, 'home.html')
@@ -50,7 +68,7 @@ def generate_cocktail_view(request):
                     return render(request, 'cocktails/generate.html', {'form': form})
                 
                 # Générer le cocktail avec l'IA, en passant le choix de génération d'image
-                cocktail_data = ai_service.generate_cocktail_recipe(user_prompt, context, generate_image)
+                cocktail_data = ai_service.generate_cocktail_recipe(user_prompt, context, generate_image, user=request.user)
                 
                 # Créer le cocktail en base
                 cocktail = CocktailRecipe.objects.create(
@@ -120,64 +138,60 @@ def logout_view(request):
 @login_required
 def profile_view(request):
     """Vue du profil utilisateur"""
-    # Calculer les statistiques
-    total_cocktails = CocktailRecipe.objects.filter(user=request.user).count()
-    favorite_cocktails = CocktailRecipe.objects.filter(user=request.user, is_favorite=True).count()
+    # Statistiques matérialisées : une seule ligne lue
+    stats = user_stats.get_stats(request.user)
     
     context = {
-        'total_cocktails': total_cocktails,
-        'favorite_cocktails': favorite_cocktails,
+        'total_cocktails': stats.total,
+        'favorite_cocktails': stats.favorites,
     }
     return render(request, 'auth/profile.html', context)
 
 @login_required
+@conditional(recipe_page_validators)
 def cocktail_detail_view(request, pk):
     """Vue de détail d'un cocktail"""
-    try:
-        cocktail = CocktailRecipe.objects.get(pk=pk, user=request.user)
-        return render(request, 'cocktails/detail.html', {'cocktail': cocktail})
-    except CocktailRecipe.DoesNotExist:
+    # Cocktail en cache jusqu'à la prochaine écriture de l'utilisateur (introuvable compris)
+    cocktail = response_cache.get_or_compute(
+        request.user, 'detail', {'pk': str(pk)},
+        lambda: CocktailRecipe.objects.filter(pk=pk, user=request.user).first()
+    )
+    if cocktail is None:
         messages.error(request, "Cocktail non trouvé.")
         return redirect('cocktails:history')
+    
+    # « Vous aimerez aussi » : recalculé à la prochaine écriture de l'utilisateur ou du corpus
+    similar_cocktails = response_cache.get_or_compute(
+        request.user, 'similar',
+        {'pk': str(pk), 'limit': DETAIL_SIMILAR_LIMIT, 'page': 'detail', 'corpus': similarity_index.version()},
+        lambda: _similar_cocktails(request.user, pk)
+    )
+    return render(request, 'cocktails/detail.html', {
+        'cocktail': cocktail,
+        'similar_cocktails': similar_cocktails,
+    })
+
+def _similar_cocktails(user, pk):
+    """Cocktails proches avec leur score, colonnes publiques de la vignette seulement"""
+    matches = similar(user, pk, DETAIL_SIMILAR_LIMIT) or []
+    recipes = CocktailRecipe.objects.filter(
+        pk__in=[match['recipe_id'] for match in matches]
+    ).only('id', 'name', 'image_url', 'image_variants', 'image_lqip', 'ingredients_count').in_bulk()
+    return [
+        {
+            'cocktail': recipes[match['recipe_id']], 'similarity': match['similarity'],
+            'shared': match['shared'], 'is_own': match['is_own'],
+        }
+        for match in matches if match['recipe_id'] in recipes
+    ]
 
 @login_required
 def cocktail_history_view(request):
     """Vue de l'historique des cocktails avec filtres et pagination"""
-    # Récupérer tous les cocktails de l'utilisateur
-    cocktails_list = CocktailRecipe.objects.filter(user=request.user).order_by('-created_at')
-    
     # Récupérer les paramètres de filtre
     filter_type = request.GET.get('filter', 'all')
     sort_by = request.GET.get('sort', 'date_desc')
     
-    # Appliquer les filtres
-    filtered_cocktails = cocktails_list
-    if filter_type == 'favorites':
-        filtered_cocktails = cocktails_list.filter(is_favorite=True)
-    elif filter_type == 'alcoholic':
-        filtered_cocktails = cocktails_list.exclude(alcohol_content='none')
-    elif filter_type == 'non-alcoholic':
-        filtered_cocktails = cocktails_list.filter(alcohol_content='none')
-    # filter_type == 'all' : pas de filtrage supplémentaire
-    
-    # Appliquer le tri
-    if sort_by == 'date_asc':
-        filtered_cocktails = filtered_cocktails.order_by('created_at')
-    elif sort_by == 'name_asc':
-        filtered_cocktails = filtered_cocktails.order_by('name')
-    elif sort_by == 'name_desc':
-        filtered_cocktails = filtered_cocktails.order_by('-name')
-    # sort_by == 'date_desc' : ordre par défaut déjà appliqué
-    
-    # Statistiques totales (sur tous les cocktails, pas seulement filtrés)
-    total_cocktails = cocktails_list.count()
-    cocktails_with_alcohol = cocktails_list.exclude(alcohol_content='none').count()
-    cocktails_without_alcohol = cocktails_list.filter(alcohol_content='none').count()
-    favorite_cocktails = cocktails_list.filter(is_favorite=True).count()
-    
-    # Compter les cocktails filtrés
-    filtered_count = filtered_cocktails.count()
-    
     # Pagination dynamique basée sur la taille d'écran
     # Grande résolution (≥1536px) : 8 cartes par page (4×2 grille)
     # Résolution moyenne (<1536px) : 6 cartes par page (3×2 grille)
@@ -185,22 +199,32 @@ def cocktail_history_view(request):
     # Sécurité : limiter les valeurs possibles
     if page_size not in [6, 8]:
         page_size = 6
-    
-    paginator = Paginator(filtered_cocktails, page_size)
     page_number = request.GET.get('page', 1)
-    cocktails = paginator.get_page(page_number)
     
-    # Tous les cocktails non paginés pour le carousel mobile
-    all_filtered_cocktails = filtered_cocktails
+    # Page de la grille, première fenêtre du carousel et compteurs en cache jusqu'à la prochaine écriture :
+    # seuls les cocktails affichés sont chargés, quelle que soit la taille de l'historique
+    data = response_cache.get_or_compute(
+        request.user, 'history',
+        {'filter': filter_type, 'sort': sort_by, 'page': page_number, 'page_size': page_size},
+        lambda: _history_data(request.user, filter_type, sort_by, page_number, page_size)
+    )
+    
+    # Le total vient des statistiques matérialisées : pas de COUNT(*) pour les numéros de page
+    paginator = Paginator(_filtered_history(request.user, filter_type), page_size)
+    paginator.count = data['filtered_count']
+    cocktails = Page(data['page'], data['number'], paginator)
     
     context = {
         'cocktails': cocktails,
-        'all_cocktails': all_filtered_cocktails,  # Tous les cocktails pour le mobile
-        'total_cocktails': total_cocktails,
-        'filtered_count': filtered_count,
-        'cocktails_with_alcohol': cocktails_with_alcohol,
-        'cocktails_without_alcohol': cocktails_without_alcohol,
-        'favorite_cocktails': favorite_cocktails,
+        # Numéros autour de la page courante seulement (1 2 … 9 10 11 … 249 250)
+        'page_range': paginator.get_elided_page_range(cocktails.number),
+        'carousel_slides': data['slides'],  # Première fenêtre du carousel mobile
+        'carousel_next_cursor': data['next_cursor'],
+        'total_cocktails': data['total_cocktails'],
+        'filtered_count': data['filtered_count'],
+        'cocktails_with_alcohol': data['cocktails_with_alcohol'],
+        'cocktails_without_alcohol': data['cocktails_without_alcohol'],
+        'favorite_cocktails': data['favorite_cocktails'],
         'current_filter': filter_type,
         'current_sort': sort_by,
         'current_page_size': page_size,
@@ -208,22 +232,96 @@ def cocktail_history_view(request):
     
     return render(request, 'cocktails/history.html', context)
 
+def _filtered_history(user, filter_type):
+    """Cocktails de l'utilisateur selon le filtre de l'historique"""
+    cocktails_list = CocktailRecipe.objects.filter(user=user)
+    if filter_type == 'favorites':
+        return cocktails_list.filter(is_favorite=True)
+    if filter_type == 'alcoholic':
+        return cocktails_list.exclude(alcohol_content='none')
+    if filter_type == 'non-alcoholic':
+        return cocktails_list.filter(alcohol_content='none')
+    # filter_type == 'all' : pas de filtrage supplémentaire
+    return cocktails_list
+
+def _history_data(user, filter_type, sort_by, page_number, page_size):
+    """Page de la grille, première fenêtre du carousel et compteurs affichés"""
+    ordering = HISTORY_ORDERINGS.get(sort_by, 'recent')
+    filtered_cocktails = _filtered_history(user, filter_type)
+    
+    # Statistiques totales (sur tous les cocktails, pas seulement filtrés) : une seule ligne lue
+    stats = user_stats.get_stats(user)
+    
+    # Compter les cocktails filtrés
+    filtered_count = {
+        'favorites': stats.favorites,
+        'alcoholic': stats.alcoholic,
+        'non-alcoholic': stats.alcohol_none,
+    }.get(filter_type, stats.total)
+    
+    paginator = Paginator(ordered(filtered_cocktails, ordering), page_size)
+    paginator.count = filtered_count
+    page = paginator.get_page(page_number)
+    slides = paginate(filtered_cocktails, ordering=ordering, page_size=CAROUSEL_WINDOW)
+    
+    return {
+        'page': list(page.object_list),
+        'number': page.number,
+        'slides': slides.items,
+        'next_cursor': slides.next_cursor,
+        'total_cocktails': stats.total,
+        'filtered_count': filtered_count,
+        'cocktails_with_alcohol': stats.alcoholic,
+        'cocktails_without_alcohol': stats.alcohol_none,
+        'favorite_cocktails': stats.favorites,
+    }
+
+@login_required
+def cocktail_history_slides(request):
+    """
+    Fenêtre suivante du carousel mobile : ?filter=&sort=&cursor=&limit=
+    JSON avec le HTML des diapositives et le curseur de la fenêtre suivante (null à la fin)
+    """
+    filter_type = request.GET.get('filter', 'all')
+    sort_by = request.GET.get('sort', 'date_desc')
+    cursor = request.GET.get('cursor') or None
+    limit = parse_page_size(request.GET.get('limit'), default=CAROUSEL_WINDOW)
+    
+    try:
+        payload = response_cache.get_or_compute(
+            request.user, 'slides', {'filter': filter_type, 'sort': sort_by, 'cursor': cursor, 'limit': limit},
+            lambda: _history_slides(request.user, filter_type, sort_by, cursor, limit)
+        )
+    except InvalidCursor as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(payload)
+
+def _history_slides(user, filter_type, sort_by, cursor, limit):
+    page = paginate(
+        _filtered_history(user, filter_type),
+        ordering=HISTORY_ORDERINGS.get(sort_by, 'recent'),
+        cursor=cursor,
+        page_size=limit,
+    )
+    return {
+        'html': render_to_string('cocktails/partials/carousel_slides.html', {'carousel_slides': page.items}),
+        'count': len(page.items),
+        'next_cursor': page.next_cursor,
+    }
+
 @login_required 
 def toggle_favorite(request, pk):
     """Basculer le statut favori d'un cocktail"""
-    try:
-        cocktail = CocktailRecipe.objects.get(pk=pk, user=request.user)
-        cocktail.is_favorite = not cocktail.is_favorite
-        cocktail.save()
-        
-        if cocktail.is_favorite:
-            messages.success(request, f'"{cocktail.name}" ajouté aux favoris!')
-        else:
-            messages.info(request, f'"{cocktail.name}" retiré des favoris.')
-            
-        return JsonResponse({
-            'success': True, 
-            'is_favorite': cocktail.is_favorite
-        })
-    except CocktailRecipe.DoesNotExist:
+    cocktail = bulk.toggle_favorite(request.user, pk)
+    if cocktail is None:
         return JsonResponse({'success': False, 'error': 'Cocktail non trouvé'}, status=404)
+    
+    if cocktail['is_favorite']:
+        messages.success(request, f'"{cocktail["name"]}" ajouté aux favoris!')
+    else:
+        messages.info(request, f'"{cocktail["name"]}" retiré des favoris.')
+        
+    return JsonResponse({
+        'success': True, 
+        'is_favorite': cocktail['is_favorite']
+    })